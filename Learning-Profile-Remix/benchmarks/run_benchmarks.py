@@ -0,0 +1,495 @@
+"""
+Benchmark Suite
+Times the scoring, insights and database hot paths on synthetic profiles and
+gates regressions against a stored baseline
+
+Run with:
+    python benchmarks/run_benchmarks.py [--sizes 1000,100000,1000000] [--output results.json]
+    python benchmarks/run_benchmarks.py --compare baseline.json [--threshold 10]
+
+Per-call functions (calculate_scores, insights, charts, ...) are timed on a fixed
+sample of profiles since their cost does not depend on how many exist. Batch
+scoring and the database functions are timed against a temp SQLite file seeded
+with each requested number of profiles. Concurrent submissions are timed once
+per SQLite profile, and a roster upload is timed at ROSTER_ROWS students. The lookup queries are also run through the old DataFrame
+row path and the record path, with the peak memory of each. Band counts grouped in SQL
+over assessment_scores are timed against parsing the scores JSON in Python.
+"""
+
+import argparse
+import json
+import platform
+import random
+import secrets
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(APP_DIR))
+sys.path.append(str(APP_DIR.parent))
+
+import numpy as np
+import streamlit as st
+
+from assessment_assistant import AssessmentAssistant
+from utils import database, dedupe, rescoring
+from utils.batch_scoring import BAND_LABELS, QUESTION_IDS, batch_calculate_scores
+from utils.begin_products import get_begin_recommendations
+from utils.profiles import PROFILE_COUNT, PROFILE_TABLE, decode_profile, encode_bands
+from utils.export import EXPORT_FORMATS, export_assessments
+from utils.query_cache import DEFAULT_MAX_ENTRIES as DEFAULT_CACHE_ENTRIES
+from utils.questions import LIKERT_SCALE
+from utils.roster import generate_tokens, read_roster, validate_roster
+from utils.records import AssessmentRecord, AssignmentRecord, TeacherRecord
+from utils.response_codec import encode_matrix
+from utils.scoring import calculate_scores, get_personality_label
+from utils.storage import SQLiteStorage
+from utils.teacher_insights import get_teacher_insights
+from utils.visualization import create_radar_chart
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_THRESHOLD = 10.0
+SEED = 2024
+
+# Calls per-call benchmarks make; slow functions get fewer
+SAMPLE_CALLS = {
+    "calculate_scores": 20000,
+    "get_personality_label": 20000,
+    "get_teacher_insights": 2000,
+    "get_begin_recommendations": 2000,
+    "analyze_observation": 2000,
+    "create_radar_chart": 100,
+}
+
+# Calls made by each database lookup benchmark
+LOOKUP_CALLS = 100
+
+# Rows generated and inserted per seeding transaction
+SEED_CHUNK = 50000
+
+# Simulated parent sessions submitting at once, and submissions each
+CONCURRENT_SESSIONS = 8
+SAVES_PER_SESSION = 50
+
+# Students in the benchmark class roster upload
+ROSTER_ROWS = 10000
+
+# Benchmarks the compare mode fails on; the rest are reported only
+HOT_PATHS = {
+    "calculate_scores",
+    "get_personality_label",
+    "get_teacher_insights",
+    "batch_calculate_scores",
+    "save_assessment_result",
+    "get_assignment_by_token",
+    "get_previous_assessments",
+    "get_peer_percentiles",
+    "concurrent_saves_tuned",
+    "import_roster",
+}
+
+OBSERVATIONS = [
+    "{name} tells stories about her day and asks many questions during story time.",
+    "{name} plays quietly and prefers familiar activities, but likes new things with encouragement.",
+    "{name} shares toys, takes turns and is the first to try new puzzles.",
+    "{name} gives short answers and avoids new activities.",
+]
+
+_LIKERT_VALUES = np.array(sorted(LIKERT_SCALE.values()), dtype=np.int8)
+_SCORES_JSON = [json.dumps(decode_profile(code)) for code in range(PROFILE_COUNT)]
+_LABELS = [entry.personality_label for entry in PROFILE_TABLE]
+
+
+def random_matrix(rng: np.random.Generator, rows: int) -> np.ndarray:
+    """Complete synthetic assessments as an N x questions response matrix."""
+    return rng.choice(_LIKERT_VALUES, size=(rows, len(QUESTION_IDS)))
+
+
+def matrix_to_responses(matrix: np.ndarray) -> List[Dict[int, int]]:
+    return [dict(zip(QUESTION_IDS, row)) for row in matrix.tolist()]
+
+
+def timed(func: Callable[[], None], repeat: int = 1) -> float:
+    """Best wall time of repeat runs of func, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def peak_memory(func: Callable[[], None]) -> int:
+    """Peak bytes Python allocated while running func once."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def record(results: Dict[str, Dict], name: str, size: Optional[int], ops: int, seconds: float) -> None:
+    key = name if size is None else f"{name}@{size}"
+    results[key] = {
+        "name": name,
+        "size": size,
+        "ops": ops,
+        "seconds": seconds,
+        "per_op_us": seconds / ops * 1e6 if ops else 0.0,
+        "ops_per_second": ops / seconds if seconds else 0.0,
+        "hot": name in HOT_PATHS,
+    }
+    print(f"{key:<40} {ops:>9} ops {seconds:>9.3f}s {results[key]['per_op_us']:>12.1f} us/op")
+
+
+def bench_per_call(results: Dict[str, Dict], repeat: int) -> None:
+    """Time the single-profile functions on a fixed sample."""
+    rng = np.random.default_rng(SEED)
+    sample_size = max(SAMPLE_CALLS.values())
+    responses = matrix_to_responses(random_matrix(rng, sample_size))
+    scores = [calculate_scores(r) for r in responses]
+    ages = rng.integers(3, 7, size=sample_size).tolist()
+
+    def run(name, func):
+        calls = SAMPLE_CALLS[name]
+        record(results, name, None, calls, timed(lambda: func(calls), repeat))
+
+    run("calculate_scores", lambda n: [calculate_scores(r) for r in responses[:n]])
+    run("get_personality_label", lambda n: [get_personality_label(s) for s in scores[:n]])
+    run("get_teacher_insights", lambda n: [get_teacher_insights(s, "Sam", a) for s, a in zip(scores[:n], ages)])
+    run("get_begin_recommendations", lambda n: [get_begin_recommendations(s, a) for s, a in zip(scores[:n], ages)])
+
+    assistant = AssessmentAssistant()
+    observations = [OBSERVATIONS[i % len(OBSERVATIONS)].format(name="Sam") for i in range(sample_size)]
+    run("analyze_observation", lambda n: [assistant.analyze_observation(o, "Sam") for o in observations[:n]])
+    run("create_radar_chart", lambda n: [create_radar_chart(s) for s in scores[:n]])
+
+
+def seed_database(conn, size: int, rng: np.random.Generator) -> None:
+    """Fill a fresh database with size assessments, teachers and assignments."""
+    teachers = max(1, size // 25)
+    with conn.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO teachers (email, name, school, grade_level) VALUES (?, ?, ?, ?)",
+            [(f"teacher{t}@example.com", f"Teacher {t}", "Bench School", "K") for t in range(teachers)])
+
+    for start in range(0, size, SEED_CHUNK):
+        rows = min(SEED_CHUNK, size - start)
+        matrix = random_matrix(rng, rows)
+        codes = encode_bands(batch_calculate_scores(matrix).bands).tolist()
+        packed = encode_matrix(matrix)
+        ages = rng.integers(3, 7, size=rows).tolist()
+        assessments = [
+            (f"Child {start + i}", age, _SCORES_JSON[code], _LABELS[code], json.dumps(responses),
+             f"parent{(start + i) % max(1, size // 2)}@example.com", 1 + (start + i) % 12, 2025 - age, blob)
+            for i, (age, code, responses, blob) in enumerate(zip(ages, codes, matrix_to_responses(matrix), packed))
+        ]
+        assignments = [
+            (1 + (start + i) % teachers, f"parent{(start + i) % max(1, size // 2)}@example.com", f"Child {start + i}",
+             f"token-{start + i}", "completed" if i % 2 else "sent", start + i + 1 if i % 2 else None)
+            for i in range(rows)
+        ]
+        with conn.engine.begin() as connection:
+            connection.exec_driver_sql("""
+                INSERT INTO assessment_results
+                (child_name, age, scores, personality_label, raw_responses, email, birth_month, birth_year,
+                 raw_responses_packed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, assessments)
+            connection.exec_driver_sql("""
+                INSERT INTO profile_assignments
+                (teacher_id, parent_email, child_name, assignment_token, status, assessment_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, assignments)
+
+
+def bench_database(results: Dict[str, Dict], size: int) -> None:
+    """Time batch scoring and the database functions against size synthetic profiles."""
+    rng = np.random.default_rng(SEED + size)
+    picker = random.Random(SEED + size)
+
+    matrix = random_matrix(rng, size)
+    record(results, "batch_calculate_scores", size, size, timed(lambda: batch_calculate_scores(matrix)))
+    del matrix
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = st.connection(f"bench_{size}", type="sql", url=f"sqlite:///{Path(tmpdir) / 'bench.db'}")
+        database.configure_sqlite_connection(conn)
+        with mock.patch.object(database, "get_db_connection", return_value=conn):
+            storage = SQLiteStorage()
+            database.init_db()
+            record(results, "seed_database", size, size, timed(lambda: seed_database(conn, size, rng)))
+            # The seed writes assessment_results directly, so every row is unscored
+            record(results, "backfill_assessment_scores", size, size, timed(lambda: database.backfill_assessment_scores()))
+            bench_score_rollups(results, conn, size)
+            record(results, "rebuild_category_norms", size, size, timed(lambda: database.rebuild_category_norms()))
+            record(results, "rescore_assessments", size, size,
+                   timed(lambda: rescoring.rescore_assessments(restart=True, progress=None, storage=storage)))
+            record(results, "dedupe_assessments", size, size,
+                   timed(lambda: dedupe.dedupe_assessments(restart=True, progress=None, storage=storage)))
+
+            teachers = max(1, size // 25)
+            emails = [f"parent{picker.randrange(max(1, size // 2))}@example.com" for _ in range(LOOKUP_CALLS)]
+            tokens = [f"token-{picker.randrange(size)}" for _ in range(LOOKUP_CALLS)]
+            teacher_ids = [1 + picker.randrange(teachers) for _ in range(LOOKUP_CALLS)]
+            teacher_emails = [f"teacher{t - 1}@example.com" for t in teacher_ids]
+            responses = matrix_to_responses(random_matrix(rng, LOOKUP_CALLS))
+            scores = [calculate_scores(r) for r in responses]
+
+            def lookups(name, func, args):
+                record(results, name, size, len(args), timed(lambda: [func(arg) for arg in args]))
+
+            # The lookups below time the queries themselves; cache hits are timed separately
+            database.QUERY_CACHE.max_entries = 0
+
+            lookups("get_previous_assessments", lambda email: database.get_previous_assessments(email=email), emails)
+            lookups("get_assignment_by_token", database.get_assignment_by_token, tokens)
+            lookups("get_teacher_by_email", database.get_teacher_by_email, teacher_emails)
+            lookups("get_teacher_assignments", database.get_teacher_assignments, teacher_ids)
+            lookups("get_peer_percentiles", lambda r: database.get_peer_percentiles(r, age=5, birth_year=2020),
+                    responses)
+            lookups("get_admin_statistics", lambda _: database.get_admin_statistics(), range(5))
+            lookups("init_db_current", lambda _: database.init_db(), range(20))
+            lookups("save_assessment_result",
+                    lambda pair: database.save_assessment_result("Bench Child", 5, pair[1], get_personality_label(pair[1]),
+                                                                 pair[0], "bench@example.com", 1, 2020),
+                    list(zip(responses, scores)))
+            lookups("complete_assignment", lambda token: database.complete_assignment(token, 1), tokens)
+
+            database.QUERY_CACHE.max_entries = DEFAULT_CACHE_ENTRIES
+            database.QUERY_CACHE.clear()
+            [database.get_assignment_by_token(token) for token in tokens]
+            lookups("get_assignment_by_token_cached", database.get_assignment_by_token, tokens)
+
+            bench_row_decoding(results, conn, size, emails, tokens, teacher_emails, teacher_ids)
+
+            for export_format in EXPORT_FORMATS:
+                exports = []
+                name = f"export_{export_format}"
+                record(results, name, size, size, timed(lambda: exports.append(export_assessments(export_format, directory=tmpdir))))
+                results[f"{name}@{size}"]["file_bytes"] = Path(exports[0].path).stat().st_size
+                for export in exports:
+                    Path(export.path).unlink()
+
+
+def json_band_counts(conn, teacher_id=None):
+    """Band counts the way the dashboard had to before assessment_scores: parse every row's scores JSON."""
+    counts = {}
+    where, params = ("WHERE id IN (SELECT assessment_id FROM profile_assignments WHERE teacher_id = ?)",
+                     [teacher_id]) if teacher_id else ("", [])
+    for scores in database._query(conn, f"SELECT scores FROM assessment_results {where}", params)["scores"]:
+        for category, band in json.loads(scores).items():
+            counts.setdefault(category, dict.fromkeys(BAND_LABELS, 0))[band] += 1
+    return counts
+
+
+def bench_score_rollups(results: Dict[str, Dict], conn, size: int) -> None:
+    """Time band counts and trends grouped in SQL against parsing the scores JSON in Python."""
+    for name, func in (("band_counts_json", lambda: json_band_counts(conn)),
+                       ("get_band_counts", lambda: database.get_band_counts()),
+                       ("band_counts_teacher_json", lambda: json_band_counts(conn, teacher_id=1)),
+                       ("get_band_counts_teacher", lambda: database.get_band_counts(teacher_id=1)),
+                       ("get_category_trends", lambda: database.get_category_trends("month"))):
+        record(results, name, size, 1, timed(func))
+
+
+# The lookups' queries, by benchmark name: (sql, record type, JSON columns callers decode)
+ROW_QUERIES = {
+    "previous_assessments": ("""
+        SELECT *, datetime(created_at) as created_at_formatted FROM assessment_results
+        WHERE email = ? ORDER BY created_at DESC, id DESC LIMIT 51
+    """, AssessmentRecord, ("scores", "raw_responses")),
+    "assignment_by_token": ("""
+        SELECT pa.*, t.name as teacher_name, t.school, t.grade_level
+        FROM profile_assignments pa JOIN teachers t ON pa.teacher_id = t.id
+        WHERE pa.assignment_token = ?
+    """, AssignmentRecord, ()),
+    "teacher_by_email": ("SELECT * FROM teachers WHERE email = ?", TeacherRecord, ()),
+    "teacher_assignments": ("""
+        SELECT pa.*, ar.personality_label,
+               datetime(pa.assigned_at) as assigned_at_formatted,
+               datetime(pa.completed_at) as completed_at_formatted
+        FROM profile_assignments pa LEFT JOIN assessment_results ar ON pa.assessment_id = ar.id
+        WHERE pa.teacher_id = ? ORDER BY pa.assigned_at DESC, pa.id DESC LIMIT 51
+    """, AssignmentRecord, ()),
+}
+
+
+def bench_row_decoding(results: Dict[str, Dict], conn, size: int, emails, tokens, teacher_emails, teacher_ids) -> None:
+    """
+    Time each lookup query through a DataFrame and through records.
+
+    The DataFrame path is what the lookups did before records: read_sql_query,
+    to_dict('records'), then json.loads on the JSON columns as callers needed them.
+    """
+    args = {
+        "previous_assessments": emails,
+        "assignment_by_token": tokens,
+        "teacher_by_email": teacher_emails,
+        "teacher_assignments": teacher_ids,
+    }
+
+    for name, (sql, record_type, json_columns) in ROW_QUERIES.items():
+        def via_pandas(arg):
+            rows = database._query(conn, sql, [arg]).to_dict('records')
+            for row in rows:
+                for column in json_columns:
+                    row[column] = json.loads(row[column]) if row[column] else None
+            return rows
+
+        def via_records(arg):
+            return database._fetch_records(conn, record_type, sql, [arg])
+
+        for path, func in (("pandas", via_pandas), ("records", via_records)):
+            key_name = f"rows_{path}_{name}"
+            record(results, key_name, size, len(args[name]),
+                   timed(lambda: [func(arg) for arg in args[name]]))
+            peak_kib = peak_memory(lambda: func(args[name][0])) / 1024
+            results[f"{key_name}@{size}"]["peak_kib"] = peak_kib
+            print(f"{'':<40} peak {peak_kib:>9.1f} KiB per call")
+
+
+def bench_concurrent_saves(results: Dict[str, Dict], profile: str) -> None:
+    """
+    Time parent sessions submitting at once under one SQLite profile.
+
+    Each session is a thread sharing the pooled connection, as Streamlit sessions do.
+    Failed saves (e.g. "database is locked") are recorded alongside the timing.
+    """
+    rng = np.random.default_rng(SEED)
+    responses = matrix_to_responses(random_matrix(rng, SAVES_PER_SESSION))
+    scores = [calculate_scores(r) for r in responses]
+    failures = []
+
+    def session():
+        for r, s in zip(responses, scores):
+            if database.save_assessment_result("Bench Child", 5, s, get_personality_label(s), r,
+                                               "bench@example.com", 1, 2020) is None:
+                failures.append(1)
+
+    def run():
+        threads = [threading.Thread(target=session) for _ in range(CONCURRENT_SESSIONS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = st.connection(f"bench_concurrent_{profile}", type="sql", url=f"sqlite:///{Path(tmpdir) / 'bench.db'}")
+        database.configure_sqlite_connection(conn, profile)
+        with mock.patch.object(database, "get_db_connection", return_value=conn):
+            database.init_db()
+            name = f"concurrent_saves_{profile}"
+            record(results, name, CONCURRENT_SESSIONS, CONCURRENT_SESSIONS * SAVES_PER_SESSION, timed(run))
+            results[f"{name}@{CONCURRENT_SESSIONS}"]["failures"] = len(failures)
+        conn.engine.dispose()
+
+
+def bench_roster_import(results: Dict[str, Dict]) -> None:
+    """
+    Time a ROSTER_ROWS-student roster upload end to end: parse, validate, tokens and insert.
+
+    The same students created one create_assignment call at a time, as the
+    single-assignment form does, are timed for comparison.
+    """
+    lines = ["Parent Email,Student Name"] + [f"parent{i}@example.com,Student {i}" for i in range(ROSTER_ROWS)]
+    roster = "\n".join(lines).encode()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = st.connection("bench_roster", type="sql", url=f"sqlite:///{Path(tmpdir) / 'bench.db'}")
+        database.configure_sqlite_connection(conn)
+        with mock.patch.object(database, "get_db_connection", return_value=conn):
+            database.init_db()
+            teacher_id = database.create_teacher_account("teacher@example.com", "Bench Teacher")
+
+            def import_roster():
+                valid, _ = validate_roster(read_roster(roster, "roster.csv"))
+                valid = valid.assign(assignment_token=generate_tokens(len(valid)))
+                database.create_assignments(teacher_id, list(
+                    valid[["parent_email", "child_name", "assignment_token"]].itertuples(index=False, name=None)))
+
+            def one_at_a_time():
+                for i in range(ROSTER_ROWS):
+                    database.create_assignment(teacher_id, f"parent{i}@example.com", f"Student {i}",
+                                               secrets.token_urlsafe(32))
+
+            record(results, "import_roster", ROSTER_ROWS, ROSTER_ROWS, timed(import_roster))
+            record(results, "create_assignment_per_row", ROSTER_ROWS, ROSTER_ROWS, timed(one_at_a_time))
+        conn.engine.dispose()
+
+
+def run_benchmarks(sizes, repeat: int = 3) -> Dict:
+    results = {}
+    bench_per_call(results, repeat)
+    for profile in database.SQLITE_PROFILES:
+        bench_concurrent_saves(results, profile)
+    bench_roster_import(results)
+    for size in sizes:
+        bench_database(results, size)
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "sizes": list(sizes),
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Return the hot-path benchmarks whose time per op grew by more than threshold percent."""
+    regressions = []
+    for key, result in sorted(current["results"].items()):
+        base = baseline["results"].get(key)
+        if not base or not base["per_op_us"]:
+            continue
+        change = (result["per_op_us"] - base["per_op_us"]) / base["per_op_us"] * 100.0
+        failed = result["hot"] and change > threshold
+        print(f"{key:<40} {base['per_op_us']:>12.1f} -> {result['per_op_us']:>12.1f} us/op "
+              f"{change:>+8.1f}%{'  REGRESSION' if failed else ''}")
+        if failed:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scoring, insights and database hot paths.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated profile counts to seed the database with")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each per-call benchmark; the best is kept")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a stored results file")
+    parser.add_argument("--current", help="compare this results file instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="percent slowdown of a hot path that fails the comparison")
+    args = parser.parse_args()
+
+    if args.current:
+        current = json.loads(Path(args.current).read_text())
+    else:
+        current = run_benchmarks([int(size) for size in args.sizes.split(",") if size], repeat=args.repeat)
+        if args.output:
+            Path(args.output).write_text(json.dumps(current, indent=2))
+            print(f"Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} hot path(s) regressed by more than {args.threshold:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"No hot path regressed by more than {args.threshold:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
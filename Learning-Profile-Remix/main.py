@@ -7,14 +7,19 @@ import base64
 from datetime import datetime
 import re
 import json
+import uuid
 import os
 import pandas as pd
+from pathlib import Path
 from utils.questions import QUESTIONS, LIKERT_SCALE, CATEGORIES
-from utils.scoring import calculate_scores, generate_description, get_personality_label
+from utils.instruments import DEFAULT_INSTRUMENT_ID
+from utils.scoring import generate_description, RunningScores
+from utils.profiles import get_profile
 from utils.visualization import create_radar_chart
-from utils.database import (init_db, save_assessment_result, get_previous_assessments, get_admin_statistics,
-                             create_teacher_account, get_teacher_by_email, create_assignment, 
-                             get_assignment_by_token, get_teacher_assignments, complete_assignment)
+from utils.storage import get_storage
+from utils.write_behind import get_write_queue
+from utils.roster import read_roster, validate_roster, generate_tokens, links_csv
+from utils.export import EXPORT_FORMATS, export_assessments
 from utils.teacher_insights import get_teacher_insights
 from utils.helpers import title_case_name
 
@@ -25,9 +30,11 @@ st.set_page_config(
     layout="wide"
 )
 
-# Try to initialize database but continue if it fails
+# Once per process: migrate the schema and start the background writer, which first
+# replays saves left from a previous run. Reruns skip both; continue if they fail
 try:
-    init_db()
+    get_storage().ensure_schema()
+    get_write_queue()
 except Exception as e:
     st.error(f"Error initializing database: {str(e)}")
 
@@ -41,6 +48,8 @@ if 'page' not in st.session_state:
     st.session_state.page = 'welcome'
 if 'responses' not in st.session_state:
     st.session_state.responses = {}
+if 'running_scores' not in st.session_state:
+    st.session_state.running_scores = RunningScores()
 if 'scores' not in st.session_state:
     st.session_state.scores = None
 if 'child_info' not in st.session_state:
@@ -85,10 +94,27 @@ def validate_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return bool(re.match(pattern, email))
 
+def get_running_scores():
+    """Return the session's running scores, rebuilding them if responses were changed or reset elsewhere."""
+    running = st.session_state.get('running_scores')
+    if running is None or running.answers != st.session_state.responses:
+        running = RunningScores.from_responses(st.session_state.responses)
+        st.session_state.running_scores = running
+    return running
+
+def stored_responses(assessment):
+    """A stored assessment's answers keyed by question id like the quiz's, or {} if it has none this quiz can score."""
+    if (assessment.get('instrument_id') or DEFAULT_INSTRUMENT_ID) != DEFAULT_INSTRUMENT_ID:
+        return {}
+    try:
+        return {int(q_id): value for q_id, value in (assessment.get('raw_responses') or {}).items()}
+    except (TypeError, ValueError, AttributeError):
+        return {}
+
 def quiz_page():
     # Check if this is from a teacher assignment
     if st.session_state.assignment_token:
-        assignment = get_assignment_by_token(st.session_state.assignment_token)
+        assignment = get_storage().get_assignment_by_token(st.session_state.assignment_token)
         if assignment:
             st.markdown(f"""
             <div class="assignment-banner">
@@ -148,6 +174,15 @@ def quiz_page():
                 <div class="encouragement">{encouragement_messages[encouragement_idx]}</div>
             </div>
             """, unsafe_allow_html=True)
+
+            # Live preview of the bands for categories answered so far
+            answered_scores = get_running_scores().answered_scores()
+            if answered_scores:
+                preview_items = "".join(
+                    f'<span class="live-band {band.lower()}">{category_icons.get(category, "✏️")} {band}</span>'
+                    for category, band in answered_scores.items()
+                )
+                st.markdown(f'<div class="live-preview">{preview_items}</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
         child_name = st.session_state.child_info.get("name")
@@ -159,6 +194,7 @@ def quiz_page():
             if st.button("◂ previous", key="back_button", use_container_width=False):
                 # Remove the last response
                 last_question = max(st.session_state.responses.keys())
+                get_running_scores().remove(last_question)
                 del st.session_state.responses[last_question]
                 st.rerun()
             st.markdown('</div>', unsafe_allow_html=True)
@@ -202,8 +238,8 @@ def quiz_page():
                     with st.spinner("Generating your results..."):
                         try:
                             # Calculate scores first - always do this even if database fails
-                            st.session_state.scores = calculate_scores(st.session_state.responses)
-                            personality_label = get_personality_label(st.session_state.scores)
+                            st.session_state.scores = get_running_scores().scores()
+                            personality_label = get_profile(st.session_state.scores).personality_label
                             
                             # Save essential data to session state first - ensures we can show results
                             # even if database operations fail
@@ -213,9 +249,11 @@ def quiz_page():
                             # Ensure st.session_state.page is set to 'results' - critical step!
                             st.session_state.page = 'results'
                             
-                            # Try to save to database - but don't let database issues block showing results
+                            # Queue the save - the results page never waits on the database
                             try:
-                                result_id = save_assessment_result(
+                                write_queue = get_write_queue()
+                                result_id = write_queue.submit_assessment(
+                                    submission_key=st.session_state.get('submission_key'),
                                     child_name=child_name_display,
                                     age=st.session_state.child_info.get("age"),
                                     scores=st.session_state.scores,
@@ -226,19 +264,13 @@ def quiz_page():
                                     birth_year=st.session_state.child_info.get("birth_year")
                                 )
                                 
-                                if result_id:
-                                    print(f"Assessment saved with ID: {result_id}")
-                                    st.session_state.assessment_id = result_id
-                                    
-                                    # Complete assignment if this was from a teacher assignment
-                                    if st.session_state.assignment_token:
-                                        assignment_completed = complete_assignment(st.session_state.assignment_token, result_id)
-                                        if assignment_completed:
-                                            print(f"Assignment completed for token: {st.session_state.assignment_token}")
-                                        else:
-                                            print(f"Failed to complete assignment for token: {st.session_state.assignment_token}")
-                                else:
-                                    print("Assessment will continue without saving to database")
+                                # Provisional until the flusher writes it; nothing on the page needs the row id
+                                print(f"Assessment queued with provisional ID: {result_id}")
+                                
+                                # Complete assignment if this was from a teacher assignment
+                                if st.session_state.assignment_token:
+                                    write_queue.submit_completion(st.session_state.assignment_token, result_id)
+                                    print(f"Assignment completion queued for token: {st.session_state.assignment_token}")
                             except Exception as db_error:
                                 print(f"Database error: {str(db_error)}")
                                 # Continue to results page even if database save fails
@@ -346,6 +378,10 @@ def quiz_page():
 
                     # Auto-advance when option is selected
                     if response:
+                        if not st.session_state.responses:
+                            # A new quiz: its result is saved once however often it is submitted
+                            st.session_state.submission_key = uuid.uuid4().hex
+                        get_running_scores().record(question["id"], LIKERT_SCALE[response])
                         st.session_state.responses[question["id"]] = LIKERT_SCALE[response]
                         st.rerun()
                     break
@@ -374,11 +410,12 @@ def results_page():
         # Check if this is from a teacher assignment
         assignment_context = None
         if st.session_state.assignment_token:
-            assignment_context = get_assignment_by_token(st.session_state.assignment_token)
+            assignment_context = get_storage().get_assignment_by_token(st.session_state.assignment_token)
         
         # Header section with personality label
         try:
-            personality_label = get_personality_label(st.session_state.scores)
+            profile = get_profile(st.session_state.scores)
+            personality_label = profile.personality_label
             
             header_html = f"""
             <div class="results-header">
@@ -435,8 +472,8 @@ def results_page():
                 st.markdown('<h3 class="insights-title">Key Insights</h3>', unsafe_allow_html=True)
                 
                 # Get top strengths and areas for growth
-                strengths = [cat for cat, score in st.session_state.scores.items() if score == "High"]
-                growth_areas = [cat for cat, score in st.session_state.scores.items() if score == "Low"]
+                strengths = list(profile.strengths)
+                growth_areas = list(profile.growth_areas)
                 
                 if strengths:
                     strength_list = ", ".join(strengths[:2]) if len(strengths) > 1 else strengths[0]
@@ -473,6 +510,32 @@ def results_page():
                 </div>
                 """, unsafe_allow_html=True)
                 
+                # Where the child sits among peers, once the cohort is large enough; a report
+                # without the answers it was scored from has nothing to compare
+                try:
+                    birth_year = st.session_state.child_info.get("birth_year")
+                    cohort_type, percentiles = None, {}
+                    if st.session_state.responses:
+                        cohort_type, percentiles = get_storage().get_peer_percentiles(st.session_state.responses, child_age, birth_year)
+                    if percentiles:
+                        cohort_text = {
+                            "birth_year": f"children born in {birth_year}",
+                            "age": f"other {child_age}-year-olds",
+                            "all": "all children"
+                        }[cohort_type]
+                        percentile_list = ", ".join(f"{category} {round(value)}%" for category, value in percentiles.items())
+                        st.markdown(f"""
+                        <div class="insight-item peers">
+                            <div class="insight-icon">📊</div>
+                            <div class="insight-content">
+                                <h4>Compared with {cohort_text}</h4>
+                                <p>{percentile_list}</p>
+                            </div>
+                        </div>
+                        """, unsafe_allow_html=True)
+                except Exception as norms_error:
+                    print(f"Norms error: {str(norms_error)}")
+                
                 st.markdown('</div>', unsafe_allow_html=True)
             
             st.markdown('</div>', unsafe_allow_html=True)
@@ -889,28 +952,18 @@ def get_motivation_triggers(strengths):
         return f"{motivation_map.get(strengths[0])} and {motivation_map.get(strengths[1])}"
     return motivation_map.get(strengths[0])
 
+LEARNING_STYLE_DESCRIPTIONS = {
+    "developing": "Your child is still developing their learning preferences. They benefit from a varied approach that includes multiple ways of engaging with information.",
+    "social": "Your child thrives in social learning environments where they can discuss ideas, work with others, and express their thoughts verbally. They learn best through conversation and collaborative activities.",
+    "analytical": "Your child has an analytical learning style. They enjoy gathering information, asking questions, and solving problems methodically. They benefit from structured learning with clear objectives.",
+    "creative": "Your child has a creative, imaginative learning style. They enjoy open-ended activities that allow for exploration and coming up with unique solutions. Visual and hands-on learning approaches work well.",
+    "confident": "Your child learns best when they feel secure in their abilities. They're willing to take on challenges and learn from mistakes when in supportive environments that celebrate effort and progress.",
+    "balanced": "Your child has a balanced learning style that combines different approaches. They benefit from variety in learning methods and environments to keep them engaged and motivated."
+}
+
 def get_learning_style(scores):
     """Generate learning style description based on scores profile."""
-    strengths = [cat for cat, score in scores.items() if score == "High"]
-    developing = [cat for cat, score in scores.items() if score == "Medium"]
-    
-    if not strengths and not developing:
-        return "Your child is still developing their learning preferences. They benefit from a varied approach that includes multiple ways of engaging with information."
-    
-    if "Communication" in strengths and "Collaboration" in strengths:
-        return "Your child thrives in social learning environments where they can discuss ideas, work with others, and express their thoughts verbally. They learn best through conversation and collaborative activities."
-    
-    if "Content" in strengths and "Critical Thinking" in strengths:
-        return "Your child has an analytical learning style. They enjoy gathering information, asking questions, and solving problems methodically. They benefit from structured learning with clear objectives."
-    
-    if "Creative Innovation" in strengths:
-        return "Your child has a creative, imaginative learning style. They enjoy open-ended activities that allow for exploration and coming up with unique solutions. Visual and hands-on learning approaches work well."
-    
-    if "Confidence" in strengths:
-        return "Your child learns best when they feel secure in their abilities. They're willing to take on challenges and learn from mistakes when in supportive environments that celebrate effort and progress."
-    
-    # Default response
-    return "Your child has a balanced learning style that combines different approaches. They benefit from variety in learning methods and environments to keep them engaged and motivated."
+    return LEARNING_STYLE_DESCRIPTIONS[get_profile(scores).learning_style]
 
 def get_detailed_motivation(strengths):
     """Provide detailed motivation insights based on strengths."""
@@ -932,32 +985,8 @@ def get_detailed_motivation(strengths):
 
 def get_milestone_focus(scores):
     """Determine which milestone categories to focus on based on scores."""
-    # Return 2-3 categories to focus on - including both strengths and growth areas
-    strengths = [cat for cat, score in scores.items() if score == "High"]
-    growth_areas = [cat for cat, score in scores.items() if score == "Low"]
-    
-    focus_areas = []
-    # Add 1-2 strengths to build upon
-    if strengths:
-        focus_areas.extend(strengths[:2])
-    
-    # Add 1 growth area to develop
-    if growth_areas:
-        focus_areas.append(growth_areas[0])
-    
-    # If we don't have 3 areas yet, add from medium areas
-    if len(focus_areas) < 3:
-        medium_areas = [cat for cat, score in scores.items() if score == "Medium"]
-        focus_areas.extend(medium_areas[:3-len(focus_areas)])
-    
-    # If still not enough, add more from the remaining categories
-    all_categories = list(scores.keys())
-    while len(focus_areas) < 3 and all_categories:
-        if all_categories[0] not in focus_areas:
-            focus_areas.append(all_categories[0])
-        all_categories.pop(0)
-    
-    return focus_areas[:3]  # Return up to 3 focus areas
+    # 2-3 categories including both strengths and growth areas, precomputed per profile
+    return list(get_profile(scores).milestone_focus)
 
 def get_age_appropriate_milestones(category, age):
     """Get age-appropriate milestones for a category."""
@@ -1167,7 +1196,7 @@ def welcome_page():
                     if login_email and validate_email(login_email):
                         # Retrieve previous assessments from database
                         with st.spinner("Retrieving your previous assessments..."):
-                            previous_assessments = get_previous_assessments(email=login_email)
+                            previous_assessments = get_storage().get_previous_assessments(email=login_email)
                             
                         if previous_assessments:
                             st.session_state.user_email = login_email
@@ -1261,7 +1290,7 @@ def welcome_page():
                     # Try to retrieve previous assessments from database
                     try:
                         with st.spinner("Retrieving your previous assessments..."):
-                            previous_assessments = get_previous_assessments(email=login_email)
+                            previous_assessments = get_storage().get_previous_assessments(email=login_email)
                             
                         if previous_assessments and len(previous_assessments) > 0:
                             st.session_state.previous_assessments = previous_assessments
@@ -1573,6 +1602,7 @@ def welcome_page():
                         scores[category] = "Low"
                 
                 st.session_state.scores = scores
+                st.session_state.responses = {}
                 # Use URL parameter for navigation
                 st.query_params["page"] = "results"
                 st.rerun()
@@ -1595,7 +1625,7 @@ def teacher_register_page():
     
     if assignment_token:
         # Parent access via teacher assignment
-        assignment = get_assignment_by_token(assignment_token)
+        assignment = get_storage().get_assignment_by_token(assignment_token)
         if assignment:
             st.session_state.assignment_token = assignment_token
             st.success(f"Welcome! {assignment['teacher_name']} from {assignment['school']} has assigned this profile for {assignment['child_name']}.")
@@ -1614,7 +1644,7 @@ def teacher_register_page():
         
         if st.button("Login as Teacher", key="teacher_login_btn", use_container_width=True):
             if login_email and validate_email(login_email):
-                teacher = get_teacher_by_email(login_email)
+                teacher = get_storage().get_teacher_by_email(login_email)
                 if teacher:
                     st.session_state.teacher_user = teacher
                     st.success(f"Welcome back, {teacher['name']}!")
@@ -1644,10 +1674,10 @@ def teacher_register_page():
         
         if st.button("Create Teacher Account", key="create_teacher_btn", use_container_width=True):
             if teacher_name and teacher_email and validate_email(teacher_email):
-                teacher_id = create_teacher_account(teacher_email, teacher_name, school_name, grade_level)
+                teacher_id = get_storage().create_teacher_account(teacher_email, teacher_name, school_name, grade_level)
                 if teacher_id:
                     # Retrieve the created teacher account
-                    teacher = get_teacher_by_email(teacher_email)
+                    teacher = get_storage().get_teacher_by_email(teacher_email)
                     st.session_state.teacher_user = teacher
                     st.success(f"Welcome to Begin Learning Profile, {teacher_name}! Your teacher account has been created.")
                     st.query_params["page"] = "teacher_dashboard"
@@ -1679,6 +1709,81 @@ def teacher_register_page():
         4. **Collaborate** with parents using shared learning language
         """)
 
+def get_assignment_pages(teacher_id, status=None, page_size=10):
+    """
+    Assignments loaded so far for one dashboard list, kept in the session so reruns
+    don't refetch them. Holds the rows and the cursor for the next page.
+    """
+    key = f"assignment_pages_{teacher_id}_{status or 'all'}"
+    if key not in st.session_state:
+        rows, cursor = get_storage().get_teacher_assignments_page(teacher_id, page_size, status=status)
+        st.session_state[key] = {'rows': rows, 'cursor': cursor, 'page_size': page_size, 'status': status}
+    return st.session_state[key]
+
+def load_more_assignments(pages, teacher_id, key):
+    """Show a Load more button while there are more pages and append the next one when clicked."""
+    if pages['cursor'] and st.button("Load more", key=key):
+        rows, cursor = get_storage().get_teacher_assignments_page(teacher_id, pages['page_size'], pages['cursor'], pages['status'])
+        pages['rows'].extend(rows)
+        pages['cursor'] = cursor
+        st.rerun()
+
+def clear_assignment_pages(teacher_id):
+    """Forget loaded assignment pages so the lists reload from the first page."""
+    for key in [key for key in st.session_state if str(key).startswith(f"assignment_pages_{teacher_id}_")]:
+        del st.session_state[key]
+
+def roster_import(teacher_id):
+    """Upload a class roster, create an assignment per valid row and offer the links file."""
+    st.markdown("#### Import a Class Roster")
+    st.caption("CSV or XLSX with a parent email column and a student name column, one student per row.")
+    uploaded = st.file_uploader("Roster file", type=["csv", "xlsx"], key="roster_upload")
+    if uploaded is None:
+        return
+
+    try:
+        valid, rejected = validate_roster(read_roster(uploaded.getvalue(), uploaded.name))
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    st.markdown(f"**{len(valid)}** students ready to assign, **{len(rejected)}** rows with problems.")
+    if len(rejected):
+        st.dataframe(rejected, use_container_width=True)
+
+    # Tokens are drawn once per upload, so a second click or a rerun that
+    # interrupted the first can't create the roster again: its tokens are taken
+    roster_import = st.session_state.get('roster_import')
+    if roster_import is None or roster_import['upload'] != uploaded.file_id:
+        roster_import = {'upload': uploaded.file_id, 'tokens': generate_tokens(len(valid)), 'created': False}
+        st.session_state.roster_import = roster_import
+    valid = valid.assign(assignment_token=roster_import['tokens'])
+
+    if len(valid) and st.button(f"Create {len(valid)} Assignments", key="roster_import_btn",
+                                disabled=roster_import['created']) and not roster_import['created']:
+        storage = get_storage()
+        # Already saved by a run that was interrupted before it could record it
+        created = storage.get_assignment_by_token(roster_import['tokens'][0]) is not None
+        rows = list(valid[["parent_email", "child_name", "assignment_token"]].itertuples(index=False, name=None))
+        if created or storage.create_assignments(teacher_id, rows):
+            roster_import['created'] = True
+            clear_assignment_pages(teacher_id)
+            st.session_state.roster_links = (uploaded.name, links_csv(valid))
+            st.success(f"✅ Created {len(valid)} assignments.")
+        else:
+            st.error("Failed to create the assignments. Please try again.")
+    elif roster_import['created']:
+        st.info("The assignments for this file have been created. Upload a new roster to create more.")
+
+    if st.session_state.get('roster_links'):
+        roster_name, links = st.session_state.roster_links
+        st.download_button(
+            label="Download Assignment Links (CSV)",
+            data=links,
+            file_name=f"{Path(roster_name).stem}_assignment_links.csv",
+            mime="text/csv"
+        )
+
 def teacher_dashboard_page():
     """Teacher dashboard for managing assignments and viewing results"""
     if not st.session_state.teacher_user:
@@ -1724,8 +1829,9 @@ def teacher_dashboard_page():
                     import secrets
                     assignment_token = secrets.token_urlsafe(32)
                     
-                    assignment_id = create_assignment(teacher['id'], parent_email, child_name, assignment_token)
+                    assignment_id = get_storage().create_assignment(teacher['id'], parent_email, child_name, assignment_token)
                     if assignment_id:
+                        clear_assignment_pages(teacher['id'])
                         # Generate assignment URL
                         assignment_url = f"?token={assignment_token}"
                         
@@ -1736,10 +1842,16 @@ def teacher_dashboard_page():
                         st.error("Failed to create assignment. Please try again.")
                 else:
                     st.error("Please enter valid parent email and student name.")
+
+        roster_import(teacher['id'])
         
         # Recent assignments
         st.markdown("#### Recent Assignments")
-        assignments = get_teacher_assignments(teacher['id'], 10)
+        if st.button("Refresh", key="refresh_assignments"):
+            clear_assignment_pages(teacher['id'])
+            st.rerun()
+        assignment_pages = get_assignment_pages(teacher['id'])
+        assignments = assignment_pages['rows']
         
         if assignments:
             for assignment in assignments:
@@ -1763,13 +1875,15 @@ def teacher_dashboard_page():
                                 st.query_params["page"] = "teacher_results"
                                 st.query_params["assignment_id"] = str(assignment['id'])
                                 st.rerun()
+            load_more_assignments(assignment_pages, teacher['id'], "more_assignments")
         else:
             st.info("No assignments yet. Create your first assignment above!")
     
     with tab2:
         st.markdown("### Individual Student Results")
         
-        completed_assignments = [a for a in get_teacher_assignments(teacher['id']) if a['status'] == 'completed']
+        completed_pages = get_assignment_pages(teacher['id'], status='completed')
+        completed_assignments = completed_pages['rows']
         
         if completed_assignments:
             for assignment in completed_assignments:
@@ -1777,6 +1891,7 @@ def teacher_dashboard_page():
                     st.markdown("*Teacher-specific insights coming soon!*")
                     st.markdown(f"**Learning Profile:** {assignment['personality_label']}")
                     st.markdown(f"**Completed:** {assignment['completed_at_formatted']}")
+            load_more_assignments(completed_pages, teacher['id'], "more_completed_assignments")
         else:
             st.info("No completed assessments yet. Assignments will appear here once parents complete them.")
     
@@ -1802,9 +1917,11 @@ def teacher_results_page():
         st.rerun()
         return
     
-    # Get the assignment and assessment data
-    assignments = get_teacher_assignments(st.session_state.teacher_user['id'])
-    assignment = next((a for a in assignments if str(a['id']) == assignment_id), None)
+    # Get the assignment, teacher and submitted assessment in one lookup
+    try:
+        assignment = get_storage().get_assignment_results(st.session_state.teacher_user['id'], int(assignment_id))
+    except ValueError:
+        assignment = None
     
     if not assignment or assignment['status'] != 'completed':
         st.error("Assignment not found or not completed yet.")
@@ -1814,12 +1931,11 @@ def teacher_results_page():
     
     # Get the assessment data
     try:
-        assessment_data = get_previous_assessments(child_name=assignment['child_name'], limit=1)
-        if not assessment_data:
+        assessment = assignment['assessment']
+        if not assessment or not assessment['scores']:
             st.error("Assessment data not found.")
             return
         
-        assessment = assessment_data[0]
         child_name = assessment['child_name']
         child_age = assessment['age']
         scores = assessment['scores']
@@ -2048,7 +2164,9 @@ def profile_dashboard_page():
                             "birth_month": assessment.get('birth_month'),
                             "birth_year": assessment.get('birth_year')
                         }
-                        st.session_state.scores = assessment.get('scores')
+                        st.session_state.scores = dict(assessment.get('scores') or {})
+                        # The report compares this assessment's own answers with its peers, not the last quiz taken
+                        st.session_state.responses = stored_responses(assessment)
                         # Use URL parameter for navigation
                         st.query_params["page"] = "results"
                         st.rerun()
@@ -2099,7 +2217,7 @@ if url_page != st.session_state.page:
 query_params = st.query_params
 assignment_token = query_params.get("token")
 if assignment_token and not st.session_state.assignment_token:
-    assignment = get_assignment_by_token(assignment_token)
+    assignment = get_storage().get_assignment_by_token(assignment_token)
     if assignment:
         st.session_state.assignment_token = assignment_token
         # Redirect to the appropriate page based on assignment status
@@ -2133,7 +2251,7 @@ def admin_dashboard_page():
     # Get admin statistics from database
     try:
         with st.spinner("Loading statistics..."):
-            admin_stats = get_admin_statistics()
+            admin_stats = get_storage().get_admin_statistics()
         
         if not admin_stats:
             st.error("Unable to retrieve admin statistics from the database.")
@@ -2148,6 +2266,13 @@ def admin_dashboard_page():
         
         with tab1:
             st.subheader("Overview")
+            queue_status = get_write_queue().status()
+            if queue_status['last_error']:
+                st.warning(f"{queue_status['pending']} submissions are waiting to be saved: {queue_status['last_error']}")
+            if queue_status['dead_letters']:
+                st.error(f"{queue_status['dead_letters']} submissions were rejected by the database and set aside in "
+                         f"{queue_status['dead_letter_path']}" + (f": {queue_status['dead_letter_error']}"
+                                                                  if queue_status['dead_letter_error'] else ""))
             # Key metrics in columns
             col1, col2, col3 = st.columns(3)
             
@@ -2174,7 +2299,28 @@ def admin_dashboard_page():
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.info("No recent activity data available.")
-        
+
+            # Band split per category, counted in the database from assessment_scores
+            st.subheader("Category Bands (This Month)")
+            band_counts = get_storage().get_band_counts(since=datetime.now().strftime("%Y-%m-01"))
+            if band_counts:
+                band_data = pd.DataFrame([
+                    {'category': category, 'band': band, 'count': count}
+                    for category, counts in band_counts.items()
+                    for band, count in counts.items()
+                ])
+                fig = px.bar(
+                    band_data,
+                    x='category',
+                    y='count',
+                    color='band',
+                    labels={'count': 'Assessments', 'category': 'Category', 'band': 'Band'},
+                    title="Assessments Per Band"
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("No assessments this month.")
+
         with tab2:
             st.subheader("Recent Assessments")
             if admin_stats['latest_assessments']:
@@ -2187,27 +2333,44 @@ def admin_dashboard_page():
         with tab3:
             st.subheader("Data Export")
             
-            if admin_stats['all_assessments']:
-                all_assessments_df = pd.DataFrame(admin_stats['all_assessments'])
-                
-                # Provide CSV download option
-                csv = all_assessments_df.to_csv(index=False)
+            st.info(f"{admin_stats['total_assessments']} assessments available for export.")
+            export_format = st.selectbox("Format", list(EXPORT_FORMATS),
+                                         format_func=lambda name: EXPORT_FORMATS[name].label)
+
+            # The table is streamed to a temp file in chunks; session state keeps only the
+            # file's path and a preview, and a new export or logging out removes the file
+            if st.button("Prepare Export"):
+                previous = st.session_state.get('admin_export')
+                try:
+                    with st.spinner("Exporting assessments..."):
+                        st.session_state.admin_export = export_assessments(export_format)
+                    if previous:
+                        previous.discard()
+                except Exception as e:
+                    st.error(f"Error exporting assessments: {e}")
+
+            export = st.session_state.get('admin_export')
+            if export and export.size:
+                export_type = EXPORT_FORMATS[export.export_format]
                 current_date = datetime.now().strftime("%Y%m%d")
-                
                 st.download_button(
-                    label="Download All Assessment Data (CSV)",
-                    data=csv,
-                    file_name=f"begin_learning_assessments_{current_date}.csv",
-                    mime="text/csv"
+                    label=f"Download All Assessment Data ({export_type.label}, {export.size / 1024:,.0f} KiB)",
+                    data=export.download_data(),
+                    file_name=f"begin_learning_assessments_{current_date}{export_type.suffix}",
+                    mime=export_type.mime
                 )
-                
-                st.dataframe(all_assessments_df, use_container_width=True)
-            else:
-                st.info("No assessment data available for export.")
+                if export.rows:
+                    st.caption(f"{export.rows} assessments exported; showing the first {len(export.preview)}.")
+                    st.dataframe(export.preview, use_container_width=True)
+                else:
+                    st.info("No assessment data available for export.")
         
         # Logout option
         if st.button("Logout"):
             st.session_state.admin_authenticated = False
+            if st.session_state.get('admin_export'):
+                st.session_state.admin_export.discard()
+                st.session_state.admin_export = None
             st.rerun()
             
         # Return to home
@@ -0,0 +1,95 @@
+import unittest
+import sys
+import json
+import random
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from utils import database
+from utils.batch_scoring import batch_calculate_scores, responses_to_matrix, QUESTION_IDS
+from utils.instruments import INSTRUMENTS, DEFAULT_INSTRUMENT_ID, compile_instrument, get_instrument, register_instrument
+from utils.questions import QUESTIONS, CATEGORIES, LIKERT_SCALE
+from utils.scoring import calculate_scores
+
+class TestBatchScoring(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        values = list(LIKERT_SCALE.values())
+        self.responses = []
+        for _ in range(500):
+            # Mix complete, partial and empty assessments
+            answered = rng.sample(QUESTION_IDS, rng.randint(0, len(QUESTION_IDS)))
+            self.responses.append({q_id: rng.choice(values) for q_id in answered})
+
+    def test_matches_single_profile_scoring(self):
+        """Batch results are identical to calculate_scores for every row"""
+        batch = batch_calculate_scores(self.responses).to_dicts()
+        expected = [calculate_scores(r) for r in self.responses]
+        self.assertEqual(batch, expected)
+
+    def test_matrix_input(self):
+        """A response matrix scores the same as the equivalent dicts"""
+        matrix = responses_to_matrix(self.responses)
+        from_matrix = batch_calculate_scores(matrix)
+        from_dicts = batch_calculate_scores(self.responses)
+        np.testing.assert_array_equal(from_matrix.bands, from_dicts.bands)
+        np.testing.assert_array_equal(from_matrix.averages, from_dicts.averages)
+
+    def test_averages(self):
+        """Averages are per-category means and NaN when a category is unanswered"""
+        result = batch_calculate_scores([{1: 5, 2: 4, 5: 1}])
+        self.assertEqual(result.averages[0, 0], 4.5)
+        self.assertEqual(result.averages[0, 1], 1.0)
+        self.assertTrue(np.isnan(result.averages[0, 2]))
+
+    def test_invalid_values(self):
+        """Invalid Likert values are rejected like calculate_scores does"""
+        with self.assertRaises(ValueError):
+            batch_calculate_scores([{1: 10}])
+        with self.assertRaises(ValueError):
+            batch_calculate_scores(np.full((2, len(QUESTION_IDS)), 3))
+        with self.assertRaises(ValueError):
+            batch_calculate_scores(np.zeros((2, 5)))
+
+class TestInstruments(unittest.TestCase):
+    def setUp(self):
+        # A second version of the bank with stricter bands and only the first two categories
+        categories = dict(list(CATEGORIES.items())[:2])
+        questions = [q for q in QUESTIONS if q["category"] in categories]
+        self.strict = register_instrument(compile_instrument(
+            "test-strict", "Strict test bank", questions, categories, LIKERT_SCALE,
+            low_threshold=3.0, medium_threshold=4.5))
+
+    def tearDown(self):
+        INSTRUMENTS.pop("test-strict", None)
+
+    def test_registry(self):
+        """Instruments are looked up by id and ids cannot be reused"""
+        self.assertIs(get_instrument(), get_instrument(DEFAULT_INSTRUMENT_ID))
+        self.assertIs(get_instrument("test-strict"), self.strict)
+        with self.assertRaises(ValueError):
+            get_instrument("missing")
+        with self.assertRaises(ValueError):
+            register_instrument(self.strict)
+
+    def test_mixed_instruments(self):
+        """Stored rows are grouped by instrument and each group is scored with its own bank and thresholds"""
+        raw_responses = json.dumps({q_id: 4 for q_id in QUESTION_IDS})
+        rows = [(None, raw_responses, None), ("test-strict", raw_responses, None), (DEFAULT_INSTRUMENT_ID, raw_responses, None)]
+        matrices = database.response_matrices(rows)
+        self.assertEqual(set(matrices), {DEFAULT_INSTRUMENT_ID, "test-strict"})
+
+        default_rows, default_matrix = matrices[DEFAULT_INSTRUMENT_ID]
+        self.assertEqual(default_rows.tolist(), [0, 2])
+        default_scores = batch_calculate_scores(default_matrix, get_instrument(DEFAULT_INSTRUMENT_ID))
+        self.assertEqual(default_scores.to_dicts()[0], {category: "High" for category in CATEGORIES})
+
+        strict_rows, strict_matrix = matrices["test-strict"]
+        self.assertEqual(strict_rows.tolist(), [1])
+        self.assertEqual(batch_calculate_scores(strict_matrix, self.strict).to_dicts(),
+                         [{category: "Medium" for category in self.strict.question_bank.categories}])
+
+if __name__ == '__main__':
+    unittest.main()
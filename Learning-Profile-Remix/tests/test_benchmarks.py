@@ -0,0 +1,23 @@
+import unittest
+import sys
+import json
+import subprocess
+import tempfile
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).parent.parent / "benchmarks" / "run_benchmarks.py"
+
+class TestBenchmarks(unittest.TestCase):
+    def test_smoke(self):
+        """The benchmark suite runs end to end at a small size, so the compare gate stays usable"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = Path(tmpdir) / "bench.json"
+            run = subprocess.run([sys.executable, str(BENCHMARKS), "--sizes", "100", "--repeat", "1",
+                                  "--output", str(output)], cwd=tmpdir, capture_output=True, text=True)
+            self.assertEqual(run.returncode, 0, run.stderr[-2000:])
+            results = json.loads(output.read_text())["results"]
+        for name in ("batch_calculate_scores", "rescore_assessments", "dedupe_assessments", "export_csv"):
+            self.assertIn(f"{name}@100", results)
+
+if __name__ == '__main__':
+    unittest.main()
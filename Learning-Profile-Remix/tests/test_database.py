@@ -0,0 +1,394 @@
+import unittest
+import sys
+import json
+import random
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import streamlit as st
+
+from utils import database
+from utils.batch_scoring import BAND_LABELS, QUESTION_IDS, batch_calculate_scores
+from utils.scoring import calculate_scores
+
+class TestSQLiteProfile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmpdir.name) / "profile.db"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def connect(self, profile):
+        conn = st.connection(f"test_profile_{profile}_{id(self)}", type="sql", url=f"sqlite:///{self.db_path}")
+        return database.configure_sqlite_connection(conn, profile)
+
+    def test_tuned_profile(self):
+        """The tuned profile's pragmas are in effect on pooled connections"""
+        conn = self.connect("tuned")
+        with mock.patch.object(database, "get_db_connection", return_value=conn):
+            health = database.get_db_health()
+        self.assertTrue(health["ok"])
+        self.assertEqual(health["journal_mode"], "wal")
+        self.assertEqual(health["synchronous"], 1)
+        self.assertEqual(health["busy_timeout"], 5000)
+        self.assertEqual(health["cache_size"], -65536)
+        conn.engine.dispose()
+
+    def test_safe_profile(self):
+        """The safe profile keeps the rollback journal and full syncs"""
+        conn = self.connect("safe")
+        with mock.patch.object(database, "get_db_connection", return_value=conn):
+            health = database.get_db_health()
+        self.assertEqual(health["journal_mode"], "delete")
+        self.assertEqual(health["synchronous"], 2)
+        conn.engine.dispose()
+
+    def test_profile_selection(self):
+        """The profile comes from the environment unless one is named"""
+        with mock.patch.dict("os.environ", {database.SQLITE_PROFILE_ENV: "safe"}):
+            self.assertIs(database.get_sqlite_profile(), database.SQLITE_PROFILES["safe"])
+            self.assertIs(database.get_sqlite_profile("tuned"), database.SQLITE_PROFILES["tuned"])
+        with self.assertRaises(ValueError):
+            database.get_sqlite_profile("fastest")
+
+    def test_concurrent_saves(self):
+        """Sessions saving at once all succeed"""
+        conn = self.connect("tuned")
+        responses = {q_id: 4 for q_id in QUESTION_IDS}
+        ids = []
+
+        def session():
+            for _ in range(20):
+                ids.append(database.save_assessment_result("Child", 5, {}, "Learning Explorer", responses,
+                                                           None, 1, 2020))
+
+        with mock.patch.object(database, "get_db_connection", return_value=conn):
+            database.init_db()
+            threads = [threading.Thread(target=session) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            stored = database.get_admin_statistics()["total_assessments"]
+        self.assertNotIn(None, ids)
+        self.assertEqual(stored, 120)
+        conn.engine.dispose()
+
+class TestAdminStatistics(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "stats.db"
+        self.conn = st.connection(f"test_stats_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def scanned(self):
+        """The statistics computed the slow way, straight from the tables"""
+        query = lambda sql: int(database._query(self.conn, sql).iloc[0, 0])
+        return {
+            'total_assessments': query("SELECT COUNT(*) FROM assessment_results"),
+            'total_teachers': query("SELECT COUNT(*) FROM teachers"),
+            'total_assignments': query("SELECT COUNT(*) FROM profile_assignments"),
+            'unique_children': query("SELECT COUNT(DISTINCT child_name) FROM assessment_results"),
+            'unique_accounts': query("SELECT COUNT(DISTINCT email) FROM assessment_results"),
+        }
+
+    def assert_counters_match(self):
+        stats = database.get_admin_statistics()
+        self.assertEqual({name: stats[name] for name in database.STAT_COUNTERS}, self.scanned())
+        return stats
+
+    def test_triggers_track_writes(self):
+        """Counters follow inserts, updates and deletes"""
+        teacher_id = database.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        for index in range(6):
+            database.create_assignment(teacher_id, f"parent{index}@example.com", f"Child {index}", f"token-{index}")
+            database.save_assessment_result(f"Child {index % 4}", 5, {}, "Learning Explorer", {1: 4},
+                                            f"parent{index % 3}@example.com" if index else None, 1, 2020)
+        stats = self.assert_counters_match()
+        self.assertEqual(stats['unique_children'], 4)
+        self.assertEqual(stats['unique_accounts'], 3)
+
+        database._execute(self.conn, "UPDATE assessment_results SET child_name = 'Child 9', email = NULL WHERE id = 2")
+        database._execute(self.conn, "DELETE FROM assessment_results WHERE id IN (1, 4)")
+        database._execute(self.conn, "DELETE FROM profile_assignments WHERE id = 1")
+        self.assert_counters_match()
+
+    def test_daily_activity(self):
+        """The chart gets one row per day for the last two weeks, including quiet days"""
+        database.save_assessment_result("Sam", 5, {}, "Learning Explorer", {1: 4}, None, 1, 2020)
+        database._execute(self.conn, "INSERT INTO assessment_results (child_name, created_at) VALUES ('Old', '2020-01-01 09:00:00')")
+        daily = database.get_admin_statistics()['daily_assessments']
+        self.assertEqual(len(daily), database.ACTIVITY_DAYS)
+        self.assertEqual(daily[-1]['count'], 1)
+        self.assertEqual(sum(day['count'] for day in daily), 1)
+
+    def test_rebuild_matches_triggers(self):
+        """Rebuilding from the tables gives the counts the triggers kept"""
+        for index in range(5):
+            database.save_assessment_result(f"Child {index % 2}", 5, {}, "Learning Explorer", {1: 4},
+                                            "parent@example.com", 1, 2020)
+        before = database.get_admin_statistics()
+        self.assertTrue(database.rebuild_admin_statistics())
+        self.assertEqual(database.get_admin_statistics(), before)
+
+class TestSchemaVersion(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmpdir.name) / "schema.db"
+        self.conn = database.configure_sqlite_connection(
+            st.connection(f"test_schema_{id(self)}", type="sql", url=f"sqlite:///{self.db_path}"))
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.conn.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def versions(self):
+        return database._query(self.conn, "SELECT version FROM schema_version ORDER BY version")["version"].tolist()
+
+    def test_fresh_database(self):
+        """A new database gets every migration, once"""
+        self.assertTrue(database.init_db())
+        self.assertTrue(database.init_db())
+        self.assertEqual(self.versions(), [version for version, _, _ in database.MIGRATIONS])
+
+    def test_current_database_skips_migrations(self):
+        """Once current, init_db runs no migration"""
+        database.init_db()
+        migration = mock.Mock()
+        with mock.patch.object(database, "MIGRATIONS", database.MIGRATIONS + ((99, "test", migration),)):
+            database.init_db()
+            database.init_db()
+        migration.assert_called_once()
+        self.assertEqual(self.versions()[-1], 99)
+
+    def test_unversioned_database(self):
+        """A database from before versioning is upgraded in place and keeps its rows"""
+        database._execute(self.conn, "CREATE TABLE assessment_results (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                     "child_name TEXT, age INTEGER, scores TEXT, personality_label TEXT, "
+                                     "raw_responses TEXT, email TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, "
+                                     "birth_month INTEGER, birth_year INTEGER)")
+        database._execute(self.conn, "INSERT INTO assessment_results (child_name, email) VALUES ('Sam', 'a@example.com')")
+        self.assertTrue(database.init_db())
+        self.assertEqual(database.get_admin_statistics()['total_assessments'], 1)
+        columns = database._query(self.conn, "PRAGMA table_info(assessment_results)")["name"].tolist()
+        self.assertIn("raw_responses_packed", columns)
+
+    def test_failed_migration_rolls_back(self):
+        """A migration that fails leaves no version recorded and is retried next time"""
+        database.init_db()
+        broken = ((99, "broken", mock.Mock(side_effect=RuntimeError("boom"))),)
+        with mock.patch.object(database, "MIGRATIONS", database.MIGRATIONS + broken), \
+                mock.patch.object(database.st, "error"):
+            self.assertFalse(database.init_db())
+        self.assertNotIn(99, self.versions())
+
+    def test_migration_integrity_error(self):
+        """A constraint the migration itself violates fails init_db rather than passing for a concurrent startup"""
+        database.init_db()
+        violating = lambda connection: connection.exec_driver_sql("INSERT INTO schema_version (version) VALUES (1)")
+        with mock.patch.object(database, "MIGRATIONS", database.MIGRATIONS + ((99, "violating", violating),)), \
+                mock.patch.object(database.st, "error") as error:
+            self.assertFalse(database.init_db())
+        self.assertIn("UNIQUE constraint failed", error.call_args[0][0])
+        self.assertNotIn(99, self.versions())
+
+    def test_concurrent_startup(self):
+        """Processes starting together apply each migration exactly once"""
+        database.init_db()
+        calls = []
+        migration = lambda connection: calls.append(connection.exec_driver_sql("SELECT 1").fetchone())
+        results = []
+        with mock.patch.object(database, "MIGRATIONS", database.MIGRATIONS + ((99, "test", migration),)):
+            threads = [threading.Thread(target=lambda: results.append(database.init_db())) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results, [True] * 6)
+        self.assertEqual(len(calls), 1)
+
+    def test_ensure_schema_runs_once(self):
+        """Reruns reuse the startup result; a failed startup is retried"""
+        database.ensure_schema.clear()
+        with mock.patch.object(database, "init_db", side_effect=[False, True]) as init_db:
+            with self.assertRaises(RuntimeError):
+                database.ensure_schema()
+            self.assertEqual(database.ensure_schema(), database.SCHEMA_VERSION)
+            self.assertEqual(database.ensure_schema(), database.SCHEMA_VERSION)
+        self.assertEqual(init_db.call_count, 2)
+        database.ensure_schema.clear()
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "pages.db"
+        self.conn = st.connection(f"test_pages_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+
+        self.teacher_id = database.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        self.other_teacher_id = database.create_teacher_account("other@example.com", "Mr. Chen")
+        for index in range(23):
+            database.save_assessment_result(f"Child {index}", 5, {}, "Learning Explorer", {1: 4},
+                                            "parent@example.com", 1, 2020)
+            database.create_assignment(self.teacher_id, "parent@example.com", f"Child {index}", f"token-{index}")
+            if index % 3 == 0:
+                database.complete_assignment(f"token-{index}", index + 1)
+        # Most rows share a timestamp, so the id tie-break decides the order
+        database._execute(self.conn, "UPDATE assessment_results SET created_at = '2025-09-01 08:00:00' WHERE id > 3")
+        database._execute(self.conn, "UPDATE assessment_results SET created_at = '2025-08-01 08:00:00' WHERE id <= 3")
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def collect(self, fetch):
+        rows, cursor, pages = [], None, 0
+        while True:
+            page, cursor = fetch(cursor)
+            rows.extend(page)
+            pages += 1
+            if cursor is None:
+                return rows, pages
+
+    def test_assessment_pages(self):
+        """Pages walk every row once, newest first, with ties broken by id"""
+        rows, pages = self.collect(lambda cursor: database.get_assessments_page(
+            email="parent@example.com", page_size=5, cursor=cursor))
+        self.assertEqual(pages, 5)
+        self.assertEqual([row['id'] for row in rows], list(range(23, 0, -1)))
+
+    def test_assignment_pages(self):
+        """Assignment pages can be limited to one status"""
+        rows, _ = self.collect(lambda cursor: database.get_teacher_assignments_page(
+            self.teacher_id, page_size=4, cursor=cursor, status='completed'))
+        self.assertEqual(len(rows), 8)
+        self.assertTrue(all(row['status'] == 'completed' for row in rows))
+        self.assertEqual(database.get_teacher_assignments_page(self.other_teacher_id), ([], None))
+
+    def test_page_size_cap(self):
+        """Page sizes are clamped and a bad cursor is rejected"""
+        with mock.patch.object(database, "MAX_PAGE_SIZE", 10):
+            rows, cursor = database.get_assessments_page(email="parent@example.com", page_size=1000)
+        self.assertEqual(len(rows), 10)
+        self.assertIsNotNone(cursor)
+        with self.assertRaises(ValueError):
+            database.decode_cursor("not a cursor")
+        self.assertEqual(database.get_assessments_page(email="parent@example.com", cursor="bad"), ([], None))
+
+    def test_assignment_results(self):
+        """An assignment comes back with its teacher and its own assessment, only for its teacher"""
+        database.save_assessment_result("Child 0", 6, {"Communication": "High"}, "Social Butterfly", {1: 5},
+                                        "other-parent@example.com", 1, 2019)
+        database.complete_assignment("token-0", 24)
+
+        result = database.get_assignment_results(self.teacher_id, 1)
+        self.assertEqual(result['assignment_token'], "token-0")
+        self.assertEqual(result['teacher_name'], "Ms. Rivera")
+        self.assertEqual(result['personality_label'], "Social Butterfly")
+        self.assertEqual(result['assessment']['id'], 24)
+        self.assertEqual(result['assessment']['age'], 6)
+        self.assertEqual(result['assessment']['scores'], {"Communication": "High"})
+
+        self.assertIsNone(database.get_assignment_results(self.teacher_id, 2)['assessment'])
+        self.assertIsNone(database.get_assignment_results(self.other_teacher_id, 1))
+
+class TestScoreRollups(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "rollups.db"
+        self.conn = st.connection(f"test_rollups_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+
+        picker = random.Random(7)
+        self.responses = [{q_id: picker.choice([1, 2, 4, 5]) for q_id in QUESTION_IDS} for _ in range(40)]
+        oak = database.create_teacher_account("oak@example.com", "Ms. Rivera", "Oak")
+        pine = database.create_teacher_account("pine@example.com", "Mr. Chen", "Pine")
+        for index, responses in enumerate(self.responses):
+            scores = calculate_scores(responses)
+            result_id = database.save_assessment_result(f"Child {index}", 5, scores, "Learning Explorer", responses,
+                                                        "parent@example.com", 1, 2020)
+            teacher_id = oak if index % 4 == 0 else pine if index % 4 == 1 else None
+            if teacher_id:
+                database.create_assignment(teacher_id, "parent@example.com", f"Child {index}", f"token-{index}")
+                database.complete_assignment(f"token-{index}", result_id)
+        self.oak = oak
+        database._execute(self.conn, "UPDATE assessment_results SET created_at = '2025-08-15 08:00:00' WHERE id <= 10")
+        database._execute(self.conn, "UPDATE assessment_results SET created_at = '2025-09-15 08:00:00' WHERE id > 10")
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def json_band_counts(self, where="", params=()):
+        """The old way: parse every row's scores JSON and count in Python"""
+        counts = {}
+        for scores in database._query(self.conn, f"SELECT scores FROM assessment_results {where}", params)["scores"]:
+            for category, band in json.loads(scores).items():
+                counts.setdefault(category, dict.fromkeys(BAND_LABELS, 0))[band] += 1
+        return counts
+
+    def test_band_counts_match_json(self):
+        """SQL rollups agree with parsing the stored scores"""
+        self.assertEqual(database.get_band_counts(), self.json_band_counts())
+        self.assertEqual(database.get_band_counts(since="2025-09-01", until="2025-10-01"),
+                         self.json_band_counts("WHERE id > 10"))
+
+    def test_teacher_and_school_filters(self):
+        oak_ids = "WHERE id IN (SELECT assessment_id FROM profile_assignments WHERE teacher_id = ?)"
+        self.assertEqual(database.get_band_counts(teacher_id=self.oak), self.json_band_counts(oak_ids, [self.oak]))
+        self.assertEqual(database.get_band_counts(school="Oak"), database.get_band_counts(teacher_id=self.oak))
+        self.assertEqual(database.get_band_counts(school="Elm"), {})
+        oak_total = sum(database.get_band_counts(school="Oak", since="2025-09-01")["Communication"].values())
+        self.assertEqual(oak_total, len(range(12, 40, 4)))
+
+    def test_trends(self):
+        """Monthly rows carry the count, mean average and band split of each category"""
+        trends = database.get_category_trends("month")
+        self.assertEqual(sorted({row['period'] for row in trends}), ["2025-08", "2025-09"])
+        august = {row['category']: row for row in trends if row['period'] == "2025-08"}
+        batch = batch_calculate_scores(self.responses[:10])
+        for position, category in enumerate(batch.categories):
+            row = august[category]
+            self.assertEqual(row['assessments'], 10)
+            self.assertAlmostEqual(row['average'], batch.averages[:, position].mean())
+            self.assertEqual(row['low'] + row['medium'] + row['high'], 10)
+            self.assertEqual(row['high'], int((batch.bands[:, position] == 2).sum()))
+        with self.assertRaises(ValueError):
+            database.get_category_trends("week")
+
+    def test_migration_backfills_scores(self):
+        """Upgrading a version 1 database scores its stored assessments"""
+        before = database.get_band_counts()
+        database._execute(self.conn, "DROP TABLE assessment_scores")
+        database._execute(self.conn, "DELETE FROM schema_version WHERE version >= 2")
+        self.assertTrue(database.init_db())
+        self.assertEqual(database.get_band_counts(), before)
+        self.assertEqual(database.get_category_trends("month")[0]['period'], "2025-08")
+
+        database._execute(self.conn, "DELETE FROM assessment_scores WHERE assessment_id IN (3, 4)")
+        self.assertEqual(database.backfill_assessment_scores(chunk_size=7), 2)
+        self.assertEqual(database.get_band_counts(), before)
+
+    def test_deleted_assessment_leaves_rollups(self):
+        database._execute(self.conn, "DELETE FROM assessment_results WHERE id = 1")
+        self.assertEqual(database.get_band_counts(), self.json_band_counts())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import sys
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import streamlit as st
+
+from utils import database, dedupe
+from utils.batch_scoring import CATEGORY_NAMES, QUESTION_IDS
+from utils.scoring import calculate_scores
+
+class TestDedupe(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "dedupe.db"
+        self.conn = st.connection(f"test_dedupe_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+
+        rng = random.Random(5)
+        teacher_id = database.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        self.kept = []
+        self.repeated = {}
+        for index in range(12):
+            responses = {q_id: rng.choice([1, 2, 4, 5]) for q_id in QUESTION_IDS}
+            ids = [self.save(f"Child {index}", responses) for _ in range(1 + index % 3)]
+            self.kept.append(ids[0])
+            self.repeated.update((repeat_id, ids[0]) for repeat_id in ids[1:])
+        # The assignment was completed with a repeat
+        self.repeat_id, self.repeat_of = max(self.repeated.items())
+        database.create_assignment(teacher_id, "parent@example.com", "Child", "token-1")
+        database.complete_assignment("token-1", self.repeat_id)
+
+        # Same answers an hour later, and two keyed submissions, are separate assessments
+        responses = {q_id: 4 for q_id in QUESTION_IDS}
+        later_id = self.save("Later", responses)
+        self.kept.append(self.save("Later", responses))
+        database._execute(self.conn, "UPDATE assessment_results SET created_at = datetime(created_at, '-1 hour') "
+                                     "WHERE id = ?", [later_id])
+        self.kept.append(later_id)
+        self.kept.extend(self.save("Keyed", responses, submission_key=key) for key in ("first", "second"))
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def save(self, child_name, responses, submission_key=None):
+        return database.save_assessment_result(child_name, 5, calculate_scores(responses), "Learning Explorer",
+                                               responses, "parent@example.com", 1, 2020,
+                                               submission_key=submission_key)
+
+    def stored_ids(self):
+        return database._query(self.conn, "SELECT id FROM assessment_results ORDER BY id")["id"].tolist()
+
+    def norms(self):
+        return database._query(self.conn, "SELECT * FROM category_norms WHERE count > 0 ORDER BY 1, 2, 3, 4").values.tolist()
+
+    def test_keeps_earliest_of_each(self):
+        """Repeats are deleted along with their scores, norms and statistics, and assignments move to the kept row"""
+        stats = dedupe.dedupe_assessments(chunk_size=5, progress=None)
+        self.assertEqual(stats["removed"], len(self.repeated))
+        self.assertEqual(self.stored_ids(), sorted(self.kept))
+
+        self.assertEqual(database.get_assignment_by_token("token-1")["assessment_id"], self.repeat_of)
+        self.assertEqual(database.get_admin_statistics()["total_assessments"], len(self.kept))
+        scored = database._query(self.conn, "SELECT COUNT(DISTINCT assessment_id) AS n FROM assessment_scores")
+        self.assertEqual(scored["n"][0], len(self.kept))
+        norms = self.norms()
+        database.rebuild_category_norms()
+        self.assertEqual(norms, self.norms())
+        self.assertEqual(len(database.get_cohort_histograms("all", 0)), len(CATEGORY_NAMES))
+
+        # A second run has nothing left to remove
+        self.assertEqual(dedupe.dedupe_assessments(chunk_size=5, progress=None)["removed"], 0)
+
+    def test_dry_run(self):
+        stats = dedupe.dedupe_assessments(dry_run=True, progress=None)
+        self.assertEqual(stats["removed"], len(self.repeated))
+        self.assertEqual(len(self.stored_ids()), len(self.kept) + len(self.repeated))
+
+    def test_resumes_from_checkpoint(self):
+        """An interrupted run picks up after the last committed chunk"""
+        def interrupt(stats):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            dedupe.dedupe_assessments(chunk_size=4, progress=interrupt)
+        first = len(self.kept) + len(self.repeated) - len(self.stored_ids())
+
+        stats = dedupe.dedupe_assessments(chunk_size=4, progress=None)
+        self.assertEqual(first + stats["removed"], len(self.repeated))
+        self.assertEqual(self.stored_ids(), sorted(self.kept))
+
+    def test_runs_on_selected_backend(self):
+        """The job goes through the storage DATABASE_URL selects rather than the local SQLite file"""
+        storage = mock.Mock()
+        storage.dedupe_assessments.return_value = {"removed": 0}
+        with mock.patch.object(dedupe, "open_storage", return_value=storage):
+            self.assertEqual(dedupe.dedupe_assessments(chunk_size=5, progress=None), {"removed": 0})
+        storage.dedupe_assessments.assert_called_once_with(chunk_size=5, window_minutes=dedupe.DUPLICATE_WINDOW_MINUTES,
+                                                           restart=False, dry_run=False, progress=None)
+        self.assertEqual(len(self.stored_ids()), len(self.kept) + len(self.repeated))
+
+if __name__ == '__main__':
+    unittest.main()
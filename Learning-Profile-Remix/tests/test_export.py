@@ -0,0 +1,112 @@
+import unittest
+import sys
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pandas as pd
+import streamlit as st
+
+from utils import database
+from utils.batch_scoring import CATEGORY_NAMES
+from utils import export as export_module
+from utils.export import category_columns, export_assessments
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "export.db"
+        self.conn = st.connection(f"test_export_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def seed(self, count):
+        for index in range(count):
+            scores = {category: "High" if index % 2 else "Low" for category in CATEGORY_NAMES}
+            database.save_assessment_result(f"Child {index}", 5, scores, "Learning Explorer", {1: 4},
+                                            None if index % 3 else "parent@example.com", 1, 2020)
+
+    def export(self, export_format):
+        return export_assessments(export_format, chunk_size=4, directory=self.tmpdir.name)
+
+    def test_csv(self):
+        """Chunks are written under one header, with a column per category"""
+        self.seed(10)
+        result = self.export("csv")
+        exported = pd.read_csv(result.path)
+        self.assertEqual(result.rows, 10)
+        self.assertEqual(exported["id"].tolist(), list(range(1, 11)))
+        self.assertNotIn("scores", exported.columns)
+        self.assertEqual(exported[CATEGORY_NAMES[0]].tolist()[:2], ["Low", "High"])
+        self.assertEqual(len(result.preview), 10)
+
+    def test_jsonl(self):
+        self.seed(5)
+        result = self.export("jsonl")
+        with open(result.path, encoding="utf-8") as exported:
+            rows = [json.loads(line) for line in exported]
+        self.assertEqual([row["child_name"] for row in rows], [f"Child {index}" for index in range(5)])
+        self.assertIsNone(rows[1]["email"])
+        self.assertEqual(rows[1][CATEGORY_NAMES[-1]], "High")
+
+    def test_parquet(self):
+        """Chunks with and without NULLs share one schema"""
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        self.seed(9)
+        database._execute(self.conn, "UPDATE assessment_results SET age = NULL, scores = NULL WHERE id > 4")
+        result = self.export("parquet")
+        exported = pd.read_parquet(result.path)
+        self.assertEqual(len(exported), 9)
+        self.assertEqual(list(exported.columns[-len(category_columns()):]), category_columns())
+        self.assertTrue(exported["age"].iloc[5:].isna().all())
+        self.assertTrue(exported[CATEGORY_NAMES[0]].iloc[5:].isna().all())
+
+    def test_empty(self):
+        """An empty table still gives a file with the header"""
+        result = self.export("csv")
+        self.assertEqual(result.rows, 0)
+        self.assertIn(CATEGORY_NAMES[0], pd.read_csv(result.path).columns)
+
+    def test_download_and_discard(self):
+        """The download reads the file when asked, deferred where Streamlit can, and discard removes it"""
+        self.seed(3)
+        result = self.export("csv")
+        with open(result.path, "rb") as exported:
+            contents = exported.read()
+        self.assertEqual(result.size, len(contents))
+        with mock.patch.object(export_module, "DEFERRED_DOWNLOADS", True):
+            read = result.download_data()
+            self.assertTrue(callable(read))
+            self.assertEqual(read(), contents)
+        with mock.patch.object(export_module, "DEFERRED_DOWNLOADS", False):
+            self.assertEqual(result.download_data(), contents)
+        result.discard()
+        self.assertFalse(os.path.exists(result.path))
+        self.assertEqual(result.size, 0)
+        result.discard()
+
+    def test_failure_removes_file(self):
+        """A failed export leaves no partial file behind"""
+        def chunks():
+            yield from database.iter_assessment_chunks(4)
+            raise RuntimeError("database went away")
+        self.seed(5)
+        with self.assertRaises(RuntimeError):
+            export_assessments("csv", directory=self.tmpdir.name, chunks=chunks())
+        self.assertEqual([name for name in os.listdir(self.tmpdir.name) if name.startswith("assessments_")], [])
+        with self.assertRaises(ValueError):
+            export_assessments("xml")
+
+if __name__ == '__main__':
+    unittest.main()
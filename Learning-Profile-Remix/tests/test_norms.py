@@ -0,0 +1,77 @@
+import unittest
+import sys
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import streamlit as st
+
+from utils import database
+from utils.batch_scoring import batch_calculate_scores, QUESTION_IDS
+from utils.norms import NORM_BIN_COUNT, averages_to_bins, percentile_from_histogram
+
+class TestNormBins(unittest.TestCase):
+    def test_bins(self):
+        """Averages map to 0.25-wide bins, with 5.0 in the top bin and NaN unbinned"""
+        bins = averages_to_bins(np.array([1.0, 1.24, 2.5, 3.75, 5.0, np.nan]))
+        self.assertEqual(bins.tolist(), [0, 0, 6, 11, NORM_BIN_COUNT - 1, -1])
+
+    def test_percentile(self):
+        """Percentiles use the mid-rank of the average's bin"""
+        counts = np.zeros(NORM_BIN_COUNT, dtype=np.int64)
+        counts[0] = 50
+        counts[NORM_BIN_COUNT - 1] = 50
+        self.assertEqual(percentile_from_histogram(counts, 1.0), 25.0)
+        self.assertEqual(percentile_from_histogram(counts, 5.0), 75.0)
+        self.assertIsNone(percentile_from_histogram(np.zeros(NORM_BIN_COUNT), 3.0))
+
+class TestNormsDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "norms.db"
+        conn = st.connection(f"test_norms_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=conn)
+        self.patcher.start()
+        database.init_db()
+
+        rng = random.Random(3)
+        self.responses = [{q_id: rng.choice([1, 2, 4, 5]) for q_id in QUESTION_IDS} for _ in range(50)]
+        for index, responses in enumerate(self.responses):
+            database.save_assessment_result(f"Child {index}", 5, {}, "Learning Explorer", responses,
+                                            None, 1, 2020 + index % 2)
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def test_incremental_matches_rebuild(self):
+        """Histograms kept on save equal a full rebuild from the table"""
+        before = {key: database.get_cohort_histograms(*key) for key in [("all", 0), ("age", 5), ("birth_year", 2021)]}
+        self.assertEqual(database.rebuild_category_norms(chunk_size=7), len(self.responses))
+        for key, histograms in before.items():
+            after = database.get_cohort_histograms(*key)
+            self.assertEqual(set(after), set(histograms))
+            for category in histograms:
+                np.testing.assert_array_equal(after[category], histograms[category])
+
+    def test_peer_percentiles(self):
+        """Percentiles come from the narrowest cohort with enough assessments"""
+        cohort_type, percentiles = database.get_peer_percentiles(self.responses[0], age=5, birth_year=2020)
+        self.assertEqual(cohort_type, "age")
+        self.assertEqual(len(percentiles), 6)
+        for value in percentiles.values():
+            self.assertTrue(0 <= value <= 100)
+
+        # A child with all top answers is at or above everyone's bins
+        top = {q_id: 5 for q_id in QUESTION_IDS}
+        _, top_percentiles = database.get_peer_percentiles(top, age=5)
+        averages = batch_calculate_scores(self.responses).averages
+        for col, value in enumerate(top_percentiles.values()):
+            below = (averages[:, col] < 4.75).sum()
+            self.assertGreaterEqual(value, 100.0 * below / len(self.responses))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+import sys
+import csv
+import io
+import json
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils import database
+from utils.batch_scoring import QUESTION_IDS
+
+try:
+    from utils import postgres_storage
+    from utils.postgres_storage import PostgresStorage
+except ImportError:
+    postgres_storage = None
+
+RESPONSES = {q_id: (1, 2, 4, 5)[q_id % 4] for q_id in QUESTION_IDS}
+
+
+class FakeCursor:
+    """Records the statements run on it and answers fetches from queued results."""
+
+    def __init__(self, fetchone=(), fetchall=()):
+        self.executed = []
+        self.copied = []
+        self.fetchone_results = list(fetchone)
+        self.fetchall_results = list(fetchall)
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.fetchone_results.pop(0) if self.fetchone_results else None
+
+    def fetchall(self):
+        return self.fetchall_results.pop(0) if self.fetchall_results else []
+
+    def copy_expert(self, sql, source):
+        self.copied.append((sql, source.read()))
+
+
+@unittest.skipIf(postgres_storage is None, "psycopg2 is not installed")
+class TestPostgresSQL(unittest.TestCase):
+    """The statements the bulk paths build, checked without a server; tests/test_storage_contract.py runs them on one."""
+
+    def setUp(self):
+        self.values_calls = []
+        patcher = mock.patch.object(postgres_storage.psycopg2.extras, "execute_values", side_effect=self.execute_values)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def execute_values(self, cursor, sql, rows, template=None, fetch=False):
+        rows = list(rows)
+        self.values_calls.append((sql, rows, template))
+        return [(index + 1,) for index in range(len(rows))] if fetch else None
+
+    def storage(self, cursor):
+        """A PostgresStorage whose every transaction runs on cursor, without a pool."""
+        storage = PostgresStorage.__new__(PostgresStorage)
+        storage.url = "postgresql://test"
+
+        @contextmanager
+        def transaction(cursor_factory=None):
+            yield cursor
+
+        storage._transaction = transaction
+        return storage
+
+    def assertValuesMatch(self, sql, rows, template):
+        """Every row, and the template if given, has one value per column VALUES %s is read into."""
+        self.assertEqual(sql.count("%s"), 1, sql)
+        aliased = re.search(r"AS v \(([^)]*)\)", sql)
+        if aliased:
+            columns = aliased.group(1).split(",")
+        else:
+            columns = re.search(r"INSERT INTO \w+(?: AS \w+)?\s*\(([^)]*)\)\s*VALUES %s", sql).group(1).split(",")
+        self.assertTrue(rows)
+        for row in rows:
+            self.assertEqual(len(row), len(columns), (sql, row))
+        if template:
+            self.assertEqual(template.count("%s"), len(columns), template)
+
+    def test_copy_rows(self):
+        """COPY names the columns, NULLs go as unquoted empty fields and text is CSV quoted"""
+        cursor = FakeCursor()
+        postgres_storage._copy_rows(cursor, "category_norms", ("cohort_type", "cohort_value", "count"),
+                                    [("age", None, 3), ("all", 'a, "b"', 0)])
+        ((sql, data),) = cursor.copied
+        self.assertEqual(sql, "COPY category_norms (cohort_type, cohort_value, count) FROM STDIN WITH (FORMAT csv)")
+        self.assertEqual(data, 'age,,3\r\nall,"a, ""b""",0\r\n')
+        self.assertEqual(list(csv.reader(io.StringIO(data))), [["age", "", "3"], ["all", 'a, "b"', "0"]])
+
+    def test_insert_assessments(self):
+        """Assessment, norms and score rows fit the columns they are inserted into"""
+        prepared = [database._assessment_row("Sam", 5, {}, "Learning Explorer", RESPONSES, "parent@example.com", 3,
+                                             2020, submission_key=key) for key in ("first", "second")]
+        ids = self.storage(FakeCursor())._insert_assessments(FakeCursor(), prepared)
+        self.assertEqual(ids, [1, 2])
+        self.assertEqual(len(self.values_calls), 3)
+        for sql, rows, template in self.values_calls:
+            self.assertValuesMatch(sql, rows, template)
+        # Norms bins two identical assessments share are summed into one row each
+        norm_rows = self.values_calls[1][1]
+        self.assertEqual(len(norm_rows), len({row[:4] for row in norm_rows}))
+        self.assertTrue(all(row[4] == 2 for row in norm_rows))
+
+    def test_rescore_updates(self):
+        """A rescored chunk writes its score, label and score-row updates and the checkpoint"""
+        rows = [(1, json.dumps({"Communication": "Low"}), "Old Label", None, json.dumps(RESPONSES), None)]
+        cursor = FakeCursor(fetchall=[rows, []])
+        stats = self.storage(cursor).rescore_assessments(chunk_size=10)
+        self.assertEqual((stats["processed"], stats["updated"]), (1, 1))
+        self.assertEqual(len(self.values_calls), 2)
+        for sql, rows, template in self.values_calls:
+            self.assertValuesMatch(sql, rows, template)
+        checkpoints = [params for sql, params in cursor.executed if "INSERT INTO job_checkpoints" in sql]
+        self.assertEqual(checkpoints, [(database.RESCORE_JOB, 1)])
+
+    def test_remove_duplicates(self):
+        """Removing duplicates takes their bins out of the norms and moves assignments to the kept rows"""
+        cursor = FakeCursor(fetchall=[[(5, 2020, None, json.dumps(RESPONSES), None)]])
+        postgres_storage._remove_duplicates(cursor, [(7, 3)])
+        self.assertEqual(len(self.values_calls), 2)
+        for sql, rows, template in self.values_calls:
+            self.assertValuesMatch(sql, rows, template)
+        self.assertEqual(self.values_calls[1][1], [(7, 3)])
+        self.assertEqual(cursor.executed[-1], ("DELETE FROM assessment_results WHERE id = ANY(%s)", ([7],)))
+
+    def test_backfill_packed_responses(self):
+        """Packed blobs are written against the ids they were read from"""
+        cursor = FakeCursor(fetchall=[[(4, None, json.dumps(RESPONSES), None)], []])
+        self.assertEqual(self.storage(cursor).backfill_packed_responses(chunk_size=10), 1)
+        ((sql, rows, template),) = self.values_calls
+        self.assertValuesMatch(sql, rows, template)
+        self.assertEqual(rows[0][1], 4)
+        self.assertIsInstance(rows[0][0], bytes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import streamlit as st
+
+from utils import database
+from utils.query_cache import QueryCache
+
+class TestQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = QueryCache(max_entries=2, ttl=10.0, clock=lambda: self.now)
+        self.loads = 0
+
+    def load(self, value="value"):
+        def load():
+            self.loads += 1
+            return value
+        return load
+
+    def test_hits_and_ttl(self):
+        """Entries are served until their TTL runs out"""
+        self.cache.get_or_load("a", self.load())
+        self.cache.get_or_load("a", self.load())
+        self.now = 10.5
+        self.cache.get_or_load("a", self.load())
+        self.assertEqual(self.loads, 2)
+        self.assertEqual((self.cache.stats()['hits'], self.cache.stats()['misses']), (1, 2))
+
+    def test_lru_eviction(self):
+        """The least recently used entry goes first"""
+        self.cache.get_or_load("a", self.load())
+        self.cache.get_or_load("b", self.load())
+        self.cache.get_or_load("a", self.load())
+        self.cache.get_or_load("c", self.load())
+        self.cache.get_or_load("a", self.load())
+        self.cache.get_or_load("b", self.load())
+        self.assertEqual(self.loads, 4)
+        self.assertEqual(self.cache.stats()['evictions'], 2)
+
+    def test_tag_invalidation(self):
+        """Invalidating a tag drops only the entries carrying it"""
+        self.cache.get_or_load("a", self.load(), [("assignment", "t1")])
+        self.cache.get_or_load("b", self.load(), [("assignment", "t2")])
+        self.cache.invalidate(("assignment", "t1"))
+        self.cache.get_or_load("a", self.load())
+        self.cache.get_or_load("b", self.load())
+        self.assertEqual(self.loads, 3)
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+
+    def test_no_store_across_invalidation(self):
+        """A result loaded while a write invalidated the cache is not stored"""
+        def load():
+            self.cache.invalidate(("assignment", "t1"))
+            return "stale"
+        self.assertEqual(self.cache.get_or_load("a", load), "stale")
+        self.cache.get_or_load("a", self.load())
+        self.assertEqual(self.loads, 1)
+
+    def test_errors_not_cached(self):
+        """A failed load is retried on the next call"""
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_load("a", mock.Mock(side_effect=RuntimeError))
+        self.assertEqual(self.cache.get_or_load("a", self.load()), "value")
+
+    def test_disabled(self):
+        """max_entries=0 stores nothing"""
+        self.cache.max_entries = 0
+        self.cache.get_or_load("a", self.load())
+        self.cache.get_or_load("a", self.load())
+        self.assertEqual(self.loads, 2)
+
+class TestCachedLookups(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "cache.db"
+        self.conn = st.connection(f"test_cache_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+        self.teacher_id = database.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        database.create_assignment(self.teacher_id, "parent@example.com", "Sam", "token-1")
+        database.create_assignment(self.teacher_id, "parent@example.com", "Alex", "token-2")
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def queries(self, call):
+        """Number of queries a call sends to the database."""
+        with mock.patch.object(database, "_fetch_records", wraps=database._fetch_records) as fetch:
+            call()
+        return fetch.call_count
+
+    def test_token_lookup_cached(self):
+        """Repeated token lookups are served from the cache until the assignment is completed"""
+        self.assertEqual(self.queries(lambda: database.get_assignment_by_token("token-1")), 1)
+        self.assertEqual(self.queries(lambda: database.get_assignment_by_token("token-1")), 0)
+        self.assertEqual(self.queries(lambda: database.get_assignment_by_token("token-2")), 1)
+
+        result_id = database.save_assessment_result("Sam", 5, {}, "Learning Explorer", {1: 4},
+                                                    "parent@example.com", 1, 2020)
+        self.assertEqual(self.queries(lambda: database.get_assignment_by_token("token-1")), 0)
+        database.complete_assignment("token-1", result_id)
+        self.assertEqual(database.get_assignment_by_token("token-1")['status'], 'completed')
+        # Only the completed assignment was dropped
+        self.assertEqual(self.queries(lambda: database.get_assignment_by_token("token-2")), 0)
+
+    def test_missing_token_then_created(self):
+        """A token looked up before its assignment exists is found once it is created"""
+        self.assertIsNone(database.get_assignment_by_token("token-3"))
+        database.create_assignment(self.teacher_id, "parent@example.com", "Kai", "token-3")
+        self.assertEqual(database.get_assignment_by_token("token-3")['child_name'], "Kai")
+
+    def test_lists_follow_writes(self):
+        """Assessment and assignment lists reload after the writes that change them"""
+        database.get_previous_assessments(email="parent@example.com")
+        rows, _ = database.get_teacher_assignments_page(self.teacher_id, status='completed')
+        self.assertEqual(rows, [])
+        rows.append("not cached")
+
+        database.save_pending_writes(
+            [("pending:1", dict(child_name="Sam", age=5, scores={}, personality_label="Learning Explorer",
+                                raw_responses={1: 4}, email="parent@example.com", birth_month=1, birth_year=2020))],
+            [("token-1", "pending:1")])
+        self.assertEqual(len(database.get_previous_assessments(email="parent@example.com")), 1)
+        rows, _ = database.get_teacher_assignments_page(self.teacher_id, status='completed')
+        self.assertEqual([row['assignment_token'] for row in rows], ["token-1"])
+        self.assertEqual(database.get_assignment_results(self.teacher_id, rows[0]['id'])['assessment']['id'], 1)
+
+    def test_health_reports_counters(self):
+        database.get_assignment_by_token("token-1")
+        database.get_assignment_by_token("token-1")
+        stats = database.get_db_health()['query_cache']
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import unittest
+import sys
+import os
+import re
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import streamlit as st
+from sqlalchemy import event
+
+from utils import database
+from utils.batch_scoring import CATEGORY_NAMES, QUESTION_IDS
+
+# Rows in the synthetic database; QUERY_PLAN_ROWS=10000 gives a quick local run
+ROWS = int(os.environ.get("QUERY_PLAN_ROWS", 1000000))
+
+# Tables that are read in full by design: a handful of named counters
+SMALL_TABLES = {"stat_counters"}
+
+# A walk in primary key order that stops after LIMIT rows reads no more than that
+PK_ORDER_LIMIT = re.compile(r"ORDER BY (\w+\.)?id( DESC| ASC)? LIMIT \d+\s*$", re.IGNORECASE)
+
+class TestQueryPlans(unittest.TestCase):
+    """Every statement the database functions run must use an index, never a full scan."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.db_path = Path(cls.tmpdir.name) / "plans.db"
+        cls.conn = st.connection(f"test_plans_{id(cls)}", type="sql", url=f"sqlite:///{cls.db_path}")
+        cls.patcher = mock.patch.object(database, "get_db_connection", return_value=cls.conn)
+        cls.patcher.start()
+        database.init_db()
+        cls.seed()
+
+        # Record every statement sent to SQLite, with its parameters filled in
+        cls.statements = []
+        event.listen(cls.conn.engine, "connect",
+                     lambda dbapi_connection, _: dbapi_connection.set_trace_callback(cls.statements.append))
+        cls.conn.engine.dispose()
+
+    @classmethod
+    def seed(cls):
+        """Fill the tables with generated rows in SQL, with the stats triggers off until the end."""
+        db = sqlite3.connect(cls.db_path)
+        for name in database.STATS_TRIGGERS:
+            db.execute(f"DROP TRIGGER {name}")
+        packed = "x'" + "00" * 9 + "'"
+        # Score rows for a sample of assessments and categories are enough for the planner
+        categories = " UNION ALL ".join(f"SELECT '{category}' AS category" for category in CATEGORY_NAMES[:2])
+        db.executescript(f"""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {ROWS // 25})
+            INSERT INTO teachers (email, name) SELECT 'teacher' || i || '@example.com', 'Teacher ' || i FROM n;
+
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {ROWS})
+            INSERT INTO assessment_results
+                (child_name, age, scores, personality_label, raw_responses, email, created_at, birth_month, birth_year,
+                 raw_responses_packed)
+            SELECT 'Child ' || i, 3 + i % 4, '{{}}', 'Learning Explorer', '{{}}', 'parent' || (i % {ROWS // 2}) || '@example.com',
+                   datetime('now', '-' || (i % 400) || ' days'), 1 + i % 12, 2019 + i % 4, {packed}
+            FROM n;
+
+            INSERT INTO assessment_scores (assessment_id, category, average, band, created_at)
+            SELECT a.id, c.category, 1 + a.id % 5, a.id % 3, a.created_at FROM assessment_results a, ({categories}) c
+            WHERE a.id % 4 = 0;
+
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {ROWS})
+            INSERT INTO profile_assignments (teacher_id, parent_email, child_name, assignment_token, status, assessment_id)
+            SELECT 1 + i % {ROWS // 25}, 'parent' || i || '@example.com', 'Child ' || i, 'token-' || i,
+                   CASE WHEN i % 2 THEN 'completed' ELSE 'sent' END, CASE WHEN i % 2 THEN i END
+            FROM n;
+
+            ANALYZE;
+        """)
+        for name, body in database.STATS_TRIGGERS.items():
+            db.execute(f"CREATE TRIGGER {name} {body}")
+        db.commit()
+        db.close()
+        database.rebuild_admin_statistics()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.engine.dispose()
+        cls.patcher.stop()
+        cls.tmpdir.cleanup()
+
+    def full_scans(self, statement):
+        """Plan steps of one statement that read a whole table or sort outside an index."""
+        db = sqlite3.connect(self.db_path)
+        try:
+            plan = db.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+        finally:
+            db.close()
+        bounded = PK_ORDER_LIMIT.search(statement) is not None
+        problems = []
+        for _, _, _, detail in plan:
+            if detail == "SCAN CONSTANT ROW":
+                continue
+            if detail.startswith("SCAN ") and detail.split()[1] not in SMALL_TABLES and not bounded:
+                problems.append(detail)
+            elif detail.startswith("USE TEMP B-TREE FOR ORDER BY"):
+                problems.append(detail)
+        return problems
+
+    def assert_indexed(self, call):
+        """Run one database call and check the plan of every query it sent."""
+        del self.statements[:]
+        # A cache hit would send no statement to check
+        database.QUERY_CACHE.clear()
+        call()
+        checked = [s for s in self.statements
+                   if s.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "INSERT")]
+        self.assertTrue(checked, "no statements were recorded")
+        for statement in checked:
+            self.assertEqual(self.full_scans(statement), [], statement)
+
+    def test_assessment_lookups(self):
+        self.assert_indexed(lambda: database.get_previous_assessments(email="parent7@example.com"))
+        self.assert_indexed(lambda: database.get_previous_assessments(child_name="Child 7"))
+        cursor = database.encode_cursor("2025-09-01 08:00:00", 500)
+        self.assert_indexed(lambda: database.get_assessments_page(email="parent7@example.com", cursor=cursor))
+        self.assert_indexed(lambda: database.get_assessments_page(child_name="Child 7", cursor=cursor))
+
+    def test_teacher_lookups(self):
+        self.assert_indexed(lambda: database.get_teacher_by_email("teacher3@example.com"))
+        self.assert_indexed(lambda: database.get_teacher_assignments(3))
+        cursor = database.encode_cursor("2025-09-01 08:00:00", 500)
+        self.assert_indexed(lambda: database.get_teacher_assignments_page(3, cursor=cursor, status="completed"))
+        self.assert_indexed(lambda: database.get_assignment_results(3, 78))
+
+    def test_assignment_lookups(self):
+        self.assert_indexed(lambda: database.get_assignment_by_token("token-42"))
+        self.assert_indexed(lambda: database.complete_assignment("token-44", 44))
+
+    def test_writes(self):
+        responses = {q_id: 4 for q_id in QUESTION_IDS}
+        self.assert_indexed(lambda: database.save_assessment_result("Sam", 5, {}, "Learning Explorer", responses,
+                                                                    "parent7@example.com", 1, 2020))
+        self.assert_indexed(lambda: database.save_pending_writes(
+            [("pending:1", dict(child_name="Sam", age=5, scores={}, personality_label="Learning Explorer",
+                                raw_responses=responses, email=None, birth_month=1, birth_year=2020))],
+            [("token-46", "pending:1")]))
+        self.assert_indexed(lambda: database.create_assignments(3, [("new@example.com", "New", "token-new")]))
+
+    def test_dashboards(self):
+        self.assert_indexed(database.get_admin_statistics)
+        self.assert_indexed(lambda: database.get_cohort_histograms("age", 5))
+        self.assert_indexed(lambda: next(database.iter_assessment_chunks(1000)))
+        self.assert_indexed(lambda: database.get_peer_percentiles({q_id: 4 for q_id in QUESTION_IDS}, age=5, birth_year=2020))
+
+    def test_score_rollups(self):
+        self.assert_indexed(lambda: database.get_band_counts(since="2025-09-01", until="2025-10-01"))
+        self.assert_indexed(lambda: database.get_band_counts(teacher_id=3))
+        self.assert_indexed(lambda: database.get_band_counts(school="Oak Elementary", since="2025-09-01"))
+        self.assert_indexed(lambda: database.get_category_trends("day", since="2025-09-01", teacher_id=3))
+
+    def test_scan_detection(self):
+        """The harness itself flags an unindexed filter and sort"""
+        self.assertTrue(self.full_scans("SELECT * FROM assessment_results WHERE personality_label = 'x'"))
+        self.assertTrue(self.full_scans("SELECT * FROM profile_assignments WHERE teacher_id = 1 ORDER BY child_name"))
+
+if __name__ == '__main__':
+    unittest.main()
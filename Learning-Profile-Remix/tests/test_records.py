@@ -0,0 +1,102 @@
+import unittest
+import sys
+import json
+import dataclasses
+import tempfile
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pandas as pd
+import streamlit as st
+
+from utils import database
+from utils.records import AssessmentRecord, AssignmentRecord, TeacherRecord, decode_json_column
+
+class TestRecords(unittest.TestCase):
+    def test_from_row(self):
+        """JSON columns are decoded when the record is built and unknown columns are ignored"""
+        row = {"id": 3, "child_name": "Sam", "scores": '{"Communication": "High"}',
+               "raw_responses": '{"1": 4}', "raw_responses_packed": b"\x00", "extra": 1}
+        record = AssessmentRecord.from_row(row)
+        self.assertEqual(record.scores, {"Communication": "High"})
+        self.assertEqual(record.raw_responses, {"1": 4})
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_bad_json(self):
+        """Unreadable or missing JSON falls back to the column's default"""
+        self.assertEqual(AssessmentRecord.from_row({"id": 1, "scores": "{not json"}).scores, {})
+        self.assertIsNone(AssessmentRecord.from_row({"id": 1, "raw_responses": None}).raw_responses)
+        self.assertEqual(decode_json_column("", []), [])
+
+    def test_prefix(self):
+        """Joined columns can be read under a prefix"""
+        record = AssessmentRecord.from_row({"ar_id": 7, "ar_age": 5, "id": 1}, prefix="ar_")
+        self.assertEqual((record.id, record.age), (7, 5))
+
+    def test_frozen(self):
+        """Records can't be changed after they are built, since cached ones are shared; values can be given by keyword"""
+        record = AssignmentRecord.from_row({"id": 1, "teacher_id": 2, "parent_email": "parent@example.com",
+                                            "child_name": "Sam", "assignment_token": "token-1",
+                                            "personality_label": "Stale"}, personality_label="Social Butterfly")
+        self.assertEqual(record.personality_label, "Social Butterfly")
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            record.personality_label = "Learning Explorer"
+
+    def test_dict_access(self):
+        """Records answer the dict-style access the pages use"""
+        teacher = TeacherRecord(id=1, email="teacher@example.com", name="Ms. Rivera")
+        self.assertEqual(teacher["name"], "Ms. Rivera")
+        self.assertEqual(teacher.get("school", "Unknown"), None)
+        self.assertEqual(teacher.get("missing", "Unknown"), "Unknown")
+        self.assertIn("email", teacher)
+        with self.assertRaises(KeyError):
+            teacher["missing"]
+        frame = pd.DataFrame([teacher, teacher])
+        self.assertEqual(list(frame.columns), teacher.keys())
+
+class TestDatabaseRecords(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "records.db"
+        self.conn = st.connection(f"test_records_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def test_lookups_return_records(self):
+        """Lookups return records with scores already decoded, decoding each row once"""
+        teacher_id = database.create_teacher_account("teacher@example.com", "Ms. Rivera", "Oak School")
+        database.create_assignment(teacher_id, "parent@example.com", "Sam", "token-1")
+        for _ in range(3):
+            database.save_assessment_result("Sam", 5, {"Communication": "High"}, "Social Butterfly", {1: 4},
+                                            "parent@example.com", 1, 2020)
+
+        with mock.patch("utils.records.json.loads", wraps=json.loads) as loads:
+            assessments = database.get_previous_assessments(email="parent@example.com")
+            self.assertEqual(loads.call_count, 6)
+            self.assertEqual(assessments[0]["scores"]["Communication"], "High")
+            self.assertEqual(assessments[0].get("raw_responses"), {"1": 4})
+            self.assertEqual(loads.call_count, 6)
+        self.assertIsInstance(assessments[0], AssessmentRecord)
+
+        self.assertEqual(database.get_teacher_by_email("teacher@example.com")["school"], "Oak School")
+        self.assertIsNone(database.get_teacher_by_email("nobody@example.com"))
+        assignment = database.get_assignment_by_token("token-1")
+        self.assertIsInstance(assignment, AssignmentRecord)
+        self.assertEqual(assignment["teacher_name"], "Ms. Rivera")
+        # NULLs come back as None rather than a DataFrame's NaN
+        self.assertIsNone(assignment["completed_at"])
+
+        database.complete_assignment("token-1", assessments[0]["id"])
+        results = database.get_assignment_results(teacher_id, assignment["id"])
+        self.assertEqual(results["personality_label"], "Social Butterfly")
+        self.assertEqual(results["assessment"]["scores"], {"Communication": "High"})
+        self.assertIs(database.get_assignment_results(teacher_id, assignment["id"]), results)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import sys
+import json
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import streamlit as st
+
+from utils import database, rescoring
+from utils.batch_scoring import QUESTION_IDS
+from utils.scoring import calculate_scores, get_personality_label
+
+class TestRescoring(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "rescore.db"
+        self.conn = st.connection(f"test_rescore_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+
+        rng = random.Random(11)
+        self.responses = [{q_id: rng.choice([1, 2, 4, 5]) for q_id in QUESTION_IDS} for _ in range(40)]
+        for responses in self.responses:
+            # Stale scores, as if thresholds had changed since the rows were saved
+            database.save_assessment_result("Child", 5, {"Communication": "Low"}, "Stale", responses, None, 1, 2020)
+        database._execute(self.conn, "INSERT INTO assessment_results (raw_responses) VALUES ('not json')")
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def stored_rows(self):
+        return database._query(self.conn, "SELECT scores, personality_label FROM assessment_results WHERE scores IS NOT NULL ORDER BY id")
+
+    def test_rescore_matches_calculate_scores(self):
+        """Every decodable row ends up with calculate_scores output and its label"""
+        stats = rescoring.rescore_assessments(chunk_size=9, progress=None)
+        self.assertEqual(stats["processed"], 41)
+        self.assertEqual(stats["updated"], 40)
+        self.assertEqual(stats["skipped"], 1)
+
+        rows = self.stored_rows()
+        for responses, (_, row) in zip(self.responses, rows.iterrows()):
+            expected = calculate_scores(responses)
+            self.assertEqual(json.loads(row["scores"]), expected)
+            self.assertEqual(row["personality_label"], get_personality_label(expected))
+
+        # A second run has nothing left to change
+        self.assertEqual(rescoring.rescore_assessments(chunk_size=9, progress=None)["updated"], 0)
+
+    def test_resumes_from_checkpoint(self):
+        """An interrupted run picks up after the last committed chunk"""
+        calls = []
+
+        def interrupt(stats):
+            calls.append(stats["last_id"])
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            rescoring.rescore_assessments(chunk_size=10, progress=interrupt)
+
+        stats = rescoring.rescore_assessments(chunk_size=10, progress=None)
+        self.assertEqual(stats["processed"], 21)
+        self.assertEqual(stats["updated"], 20)
+        labels = self.stored_rows()["personality_label"]
+        self.assertNotIn("Stale", set(labels))
+
+    def test_stale_averages_without_band_change(self):
+        """Score rows whose averages are out of date are rewritten even when the bands and label still match"""
+        rescoring.rescore_assessments(chunk_size=9, progress=None)
+        expected = database._query(self.conn, "SELECT * FROM assessment_scores ORDER BY assessment_id, category")
+        stale_ids = [2, 11, 30]
+        database._execute(self.conn, "UPDATE assessment_scores SET average = average + 0.01 "
+                                     "WHERE average IS NOT NULL AND assessment_id IN (2, 11)")
+        database._execute(self.conn, "DELETE FROM assessment_scores WHERE assessment_id = 30")
+        results = self.stored_rows()
+
+        stats = rescoring.rescore_assessments(chunk_size=9, progress=None)
+        self.assertEqual(stats["updated"], len(stale_ids))
+        self.assertTrue(results.equals(self.stored_rows()))
+        restored = database._query(self.conn, "SELECT * FROM assessment_scores ORDER BY assessment_id, category")
+        self.assertTrue(expected.equals(restored))
+        self.assertEqual(rescoring.rescore_assessments(chunk_size=9, progress=None)["updated"], 0)
+
+    def test_unregistered_instrument(self):
+        """Rows of an instrument that is no longer registered are skipped instead of failing the job"""
+        database._execute(self.conn, "INSERT INTO assessment_results (instrument_id, raw_responses) VALUES (?, ?)",
+                          ["retired-v0", json.dumps(self.responses[0])])
+        stats = rescoring.rescore_assessments(chunk_size=9, progress=None)
+        self.assertEqual((stats["updated"], stats["skipped"]), (40, 2))
+        self.assertEqual(database.rebuild_category_norms(), 40)
+        self.assertEqual(database.backfill_packed_responses(), 0)
+        self.assertEqual(database.backfill_assessment_scores(), 0)
+
+        # Upgrading past the scores migration scores the rest
+        database._execute(self.conn, "DROP TABLE assessment_scores")
+        database._execute(self.conn, "DELETE FROM schema_version WHERE version >= 2")
+        self.assertTrue(database.init_db())
+        scored = database._query(self.conn, "SELECT COUNT(DISTINCT assessment_id) AS n FROM assessment_scores")
+        self.assertEqual(scored["n"][0], 40)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import sys
+import random
+import tempfile
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import streamlit as st
+
+from utils import database
+from utils.batch_scoring import QUESTION_IDS, responses_to_matrix
+from utils.response_codec import packed_size, encode_matrix, decode_matrix, encode_responses, decode_responses
+
+class TestResponseCodec(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(5)
+        self.responses = []
+        for _ in range(200):
+            answered = rng.sample(QUESTION_IDS, rng.randint(0, len(QUESTION_IDS)))
+            self.responses.append({q_id: rng.choice([1, 2, 4, 5]) for q_id in answered})
+
+    def test_round_trip(self):
+        """Packed responses decode back to the same answers, in 9 bytes for 24 questions"""
+        self.assertEqual(packed_size(len(QUESTION_IDS)), 9)
+        for responses in self.responses:
+            blob = encode_responses(responses)
+            self.assertEqual(len(blob), 9)
+            self.assertEqual(decode_responses(blob), responses)
+
+    def test_vectorized_decode(self):
+        """A whole result set decodes to the response matrix in one call"""
+        matrix = responses_to_matrix(self.responses)
+        decoded = decode_matrix(encode_matrix(matrix), len(QUESTION_IDS))
+        np.testing.assert_array_equal(decoded, matrix)
+        self.assertEqual(decode_matrix([], len(QUESTION_IDS)).shape, (0, len(QUESTION_IDS)))
+
+    def test_invalid_input(self):
+        """Out-of-scale answers and wrongly sized blobs are rejected"""
+        with self.assertRaises(ValueError):
+            encode_responses({1: 9})
+        with self.assertRaises(ValueError):
+            decode_matrix([b"\x00" * 8], len(QUESTION_IDS))
+
+class TestPackedStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "packed.db"
+        self.conn = st.connection(f"test_packed_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+
+        rng = random.Random(8)
+        self.responses = [{q_id: rng.choice([1, 2, 4, 5]) for q_id in QUESTION_IDS[:rng.randint(1, 24)]} for _ in range(30)]
+        for responses in self.responses:
+            database.save_assessment_result("Child", 5, {}, "Learning Explorer", responses, None, 1, 2020)
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def stored_packed(self):
+        return database._query(self.conn, "SELECT raw_responses_packed FROM assessment_results ORDER BY id")["raw_responses_packed"].tolist()
+
+    def test_save_writes_packed_copy(self):
+        """Saved assessments carry a packed copy matching their JSON"""
+        for responses, blob in zip(self.responses, self.stored_packed()):
+            self.assertEqual(decode_responses(blob), responses)
+
+    def test_backfill(self):
+        """Rows saved as JSON only are packed by the backfill, unreadable rows stay NULL"""
+        database._execute(self.conn, "UPDATE assessment_results SET raw_responses_packed = NULL")
+        database._execute(self.conn, "INSERT INTO assessment_results (raw_responses) VALUES ('not json')")
+
+        self.assertEqual(database.backfill_packed_responses(chunk_size=7), len(self.responses))
+        packed = self.stored_packed()
+        self.assertIsNone(packed[-1])
+        for responses, blob in zip(self.responses, packed):
+            self.assertEqual(decode_responses(blob), responses)
+        self.assertEqual(database.backfill_packed_responses(chunk_size=7), 0)
+
+    def test_mixed_rows_decode_alike(self):
+        """Packed and JSON-only rows produce the same matrix rows"""
+        database._execute(self.conn, "UPDATE assessment_results SET raw_responses_packed = NULL WHERE id % 2 = 0")
+        rows = database._query(self.conn, """
+            SELECT instrument_id, raw_responses, raw_responses_packed FROM assessment_results ORDER BY id
+        """).itertuples(index=False)
+        ((row_indexes, matrix),) = database.response_matrices([tuple(row) for row in rows]).values()
+        self.assertEqual(row_indexes.tolist(), list(range(len(self.responses))))
+        np.testing.assert_array_equal(matrix, responses_to_matrix(self.responses))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,17 @@
 import unittest
 import sys
 from pathlib import Path
+from unittest import mock
 sys.path.append(str(Path(__file__).parent.parent))
 
+from streamlit.testing.v1 import AppTest
+
+from utils import storage as storage_module, write_behind
+from utils.batch_scoring import QUESTION_IDS
 from utils.questions import QUESTIONS
+from utils.records import AssessmentRecord
 from utils.scoring import calculate_scores, get_personality_label, generate_description
+from utils.narrative import build_narrative, narrative_to_markdown
 
 class TestResultsPage(unittest.TestCase):
     def setUp(self):
@@ -100,6 +107,87 @@ class TestResultsPage(unittest.TestCase):
         success = generate_description(scores, None, 4)
         self.assertTrue(success)
 
+class TestNarrative(unittest.TestCase):
+    def setUp(self):
+        self.scores = {
+            "Communication": "High",
+            "Collaboration": "High",
+            "Content": "Medium",
+            "Critical Thinking": "Medium",
+            "Creative Innovation": "Low",
+            "Confidence": "Low"
+        }
+
+    def test_sections_and_names(self):
+        """The narrative has one section per band present, with the name filled in"""
+        narrative = build_narrative(self.scores, "Maya", 5)
+        self.assertEqual([s.kind for s in narrative.sections], ["strengths", "developing", "growth"])
+        self.assertEqual(narrative.sections[0].heading, "Maya's Superpowers!")
+        self.assertIn("Let's explore how Maya can grow", narrative.sections[2].sentences[0])
+        self.assertEqual([c for c, _ in narrative.sections[0].activities], ["Communication", "Collaboration"])
+
+        unnamed = build_narrative(self.scores)
+        self.assertEqual(unnamed.sections[0].heading, "Your child's Superpowers!")
+        self.assertIn("how your child can grow", unnamed.sections[2].sentences[0])
+        self.assertEqual(unnamed.sections[0].activities, ())
+
+    def test_cached_template_is_name_independent(self):
+        """Different names share a template but never leak into each other"""
+        first = narrative_to_markdown(build_narrative(self.scores, "Ava", 4))
+        second = narrative_to_markdown(build_narrative(self.scores, "Leo", 4))
+        self.assertNotIn("Leo", first)
+        self.assertEqual(first.replace("Ava", "Leo"), second)
+
+    def test_invalid_scores(self):
+        """Invalid scores raise ValueError"""
+        with self.assertRaises(ValueError):
+            build_narrative({})
+        with self.assertRaises(ValueError):
+            build_narrative({"Communication": "Invalid"})
+
+class TestStoredReport(unittest.TestCase):
+    """Opening a saved assessment from the profile dashboard"""
+
+    def setUp(self):
+        self.storage = mock.Mock()
+        self.storage.get_peer_percentiles.return_value = ("all", {"Communication": 90.0})
+        for patcher in (mock.patch.object(storage_module, "get_storage", return_value=self.storage),
+                        mock.patch.object(write_behind, "get_write_queue")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def open_report(self, raw_responses):
+        """Open the dashboard with one stored assessment, after a different quiz in this session, and view its report."""
+        record = AssessmentRecord(id=1, child_name="Sam", age=5, scores={"Communication": "High"},
+                                  personality_label="Learning Explorer", raw_responses=raw_responses,
+                                  email="parent@example.com", birth_month=3, birth_year=2020)
+        app = AppTest.from_file(str(Path(__file__).parent.parent / "main.py"), default_timeout=30)
+        app.query_params["page"] = "profile_dashboard"
+        app.session_state.user_email = "parent@example.com"
+        app.session_state.previous_assessments = [record]
+        app.session_state.responses = {q_id: 1 for q_id in QUESTION_IDS}
+        app.run()
+        app.button(key="view_report_0").click().run()
+        self.assertFalse(app.exception)
+        return app
+
+    def peer_panels(self, app):
+        return [m.value for m in app.markdown if "Compared with" in m.value]
+
+    def test_percentiles_from_stored_answers(self):
+        """The peer comparison is computed from the report's own answers, not the session's last quiz"""
+        stored = {str(q_id): 5 for q_id in QUESTION_IDS}
+        app = self.open_report(stored)
+        self.storage.get_peer_percentiles.assert_called_once_with(
+            {q_id: 5 for q_id in QUESTION_IDS}, 5, 2020)
+        self.assertEqual(len(self.peer_panels(app)), 1)
+
+    def test_no_stored_answers(self):
+        """A report saved without its answers shows no peer comparison"""
+        app = self.open_report(None)
+        self.storage.get_peer_percentiles.assert_not_called()
+        self.assertEqual(self.peer_panels(app), [])
+
 class TestCapitalization(unittest.TestCase):
     def test_name_replacement(self):
         """Test proper capitalization of 'Your child' in questions"""
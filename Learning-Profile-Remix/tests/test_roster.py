@@ -0,0 +1,91 @@
+import unittest
+import sys
+import io
+import tempfile
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pandas as pd
+import streamlit as st
+
+from utils import database
+from utils.roster import (TOKEN_LENGTH, generate_tokens, links_csv, normalize_columns, read_roster,
+                          validate_roster)
+
+ROSTER = b"""Student Name,Parent Email
+Sam,sam.parent@example.com
+Alex,not-an-email
+,kai.parent@example.com
+Sam,sam.parent@example.com
+ Mia , mia.parent@example.org
+"""
+
+class TestRoster(unittest.TestCase):
+    def test_validate(self):
+        """Bad emails, missing names and repeated rows are rejected with their line numbers"""
+        valid, rejected = validate_roster(read_roster(ROSTER, "class.csv"))
+        self.assertEqual(valid["child_name"].tolist(), ["Sam", "Mia"])
+        self.assertEqual(valid["parent_email"].tolist(), ["sam.parent@example.com", "mia.parent@example.org"])
+        self.assertEqual(rejected["row"].tolist(), [3, 4, 5])
+        self.assertEqual(rejected["error"].tolist(),
+                         ["Invalid parent email", "Missing student name", "Duplicate of an earlier row"])
+
+    def test_columns(self):
+        """Header aliases are recognised and a missing column is reported"""
+        roster = pd.DataFrame({"EMAIL": ["a@example.com"], "Student": ["Sam"], "Notes": ["x"]})
+        self.assertEqual(list(normalize_columns(roster).columns), ["parent_email", "child_name"])
+        with self.assertRaises(ValueError):
+            normalize_columns(pd.DataFrame({"Student": ["Sam"]}))
+
+    def test_file_types(self):
+        with self.assertRaises(ValueError):
+            read_roster(ROSTER, "class.pdf")
+
+    def test_tokens(self):
+        """Bulk tokens are unique, URL-safe and all the same length"""
+        tokens = generate_tokens(1000)
+        self.assertEqual(len(set(tokens)), 1000)
+        self.assertTrue(all(len(token) == TOKEN_LENGTH for token in tokens))
+        self.assertTrue(all("=" not in token and "/" not in token and "+" not in token for token in tokens))
+        self.assertEqual(generate_tokens(0), [])
+
+    def test_links_file(self):
+        assignments = pd.DataFrame({"parent_email": ["a@example.com"], "child_name": ["Sam"],
+                                    "assignment_token": ["abc"]})
+        links = pd.read_csv(io.BytesIO(links_csv(assignments)))
+        self.assertEqual(links["assignment_link"].tolist(), ["?token=abc"])
+
+class TestCreateAssignments(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "roster.db"
+        self.conn = st.connection(f"test_roster_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+        self.teacher_id = database.create_teacher_account("teacher@example.com", "Ms. Rivera")
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def test_bulk_insert(self):
+        """Every row is created in one go and the ids match the rows"""
+        database.create_assignment(self.teacher_id, "first@example.com", "First", "token-0")
+        rows = [(f"parent{i}@example.com", f"Child {i}", token) for i, token in enumerate(generate_tokens(30))]
+        ids = database.create_assignments(self.teacher_id, rows)
+        self.assertEqual(ids, list(range(2, 32)))
+        self.assertEqual(database.get_assignment_by_token(rows[4][2])['id'], ids[4])
+        self.assertEqual(database.get_admin_statistics()['total_assignments'], 31)
+
+    def test_all_or_nothing(self):
+        """A clashing token rolls back the whole roster"""
+        database.create_assignment(self.teacher_id, "first@example.com", "First", "taken")
+        rows = [("a@example.com", "A", "fresh"), ("b@example.com", "B", "taken")]
+        with mock.patch.object(database.st, "error"):
+            self.assertEqual(database.create_assignments(self.teacher_id, rows), [])
+        self.assertIsNone(database.get_assignment_by_token("fresh"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,11 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils.scoring import calculate_scores, get_personality_label
-from utils.questions import QUESTIONS
+import random
+
+from utils.scoring import calculate_scores, get_personality_label, RunningScores
+from utils.questions import QUESTIONS, CATEGORIES, QUESTION_BANK
+from utils.profiles import PROFILE_TABLE, PROFILE_COUNT, encode_profile, decode_profile, get_profile
 
 class TestScoring(unittest.TestCase):
     def setUp(self):
@@ -86,5 +89,83 @@ class TestScoring(unittest.TestCase):
         with self.assertRaises(ValueError):
             get_personality_label({"Communication": "Invalid"})
 
+class TestRunningScores(unittest.TestCase):
+    def test_matches_calculate_scores(self):
+        """Running scores agree with calculate_scores after every answer and undo"""
+        rng = random.Random(7)
+        responses = {}
+        running = RunningScores()
+        for _ in range(300):
+            if responses and rng.random() < 0.3:
+                q_id = max(responses)
+                running.remove(q_id)
+                del responses[q_id]
+            else:
+                q_id = rng.choice(QUESTION_BANK.ids)
+                value = rng.choice([1, 2, 4, 5])
+                running.record(q_id, value)
+                responses[q_id] = value
+            self.assertEqual(running.scores(), calculate_scores(responses))
+        self.assertEqual(RunningScores.from_responses(responses).scores(), running.scores())
+
+    def test_answered_scores(self):
+        """answered_scores only covers categories with answers"""
+        running = RunningScores.from_responses({1: 5, 2: 4})
+        self.assertEqual(running.answered_scores(), {"Communication": "High"})
+        with self.assertRaises(ValueError):
+            running.record(3, 10)
+
+class TestQuestionBank(unittest.TestCase):
+    def test_lookups_match_question_list(self):
+        """QuestionBank lookups agree with the QUESTIONS list"""
+        self.assertEqual(QUESTION_BANK.ids, tuple(q["id"] for q in QUESTIONS))
+        for position, question in enumerate(QUESTIONS):
+            self.assertEqual(QUESTION_BANK[question["id"]]["text"], question["text"])
+            self.assertEqual(QUESTION_BANK.category_of(question["id"]), question["category"])
+            self.assertEqual(QUESTION_BANK.position(question["id"]), position)
+        self.assertIsNone(QUESTION_BANK.category_of(999))
+
+    def test_category_codes(self):
+        """Category codes are contiguous and follow CATEGORIES order"""
+        self.assertEqual(list(QUESTION_BANK.category_codes), list(CATEGORIES))
+        self.assertEqual(list(QUESTION_BANK.category_codes.values()), list(range(len(CATEGORIES))))
+        self.assertEqual(QUESTION_BANK.ids_for_category("Confidence"), (21, 22, 23, 24))
+
+    def test_immutable(self):
+        """QuestionBank and its questions cannot be modified"""
+        with self.assertRaises(AttributeError):
+            QUESTION_BANK.ids = ()
+        with self.assertRaises(TypeError):
+            QUESTION_BANK[1]["category"] = "Content"
+
+    def test_next_unanswered(self):
+        """next_unanswered walks the frozen question order"""
+        self.assertEqual(QUESTION_BANK.next_unanswered({})["id"], 1)
+        self.assertEqual(QUESTION_BANK.next_unanswered({1: 5, 2: 4})["id"], 3)
+        self.assertIsNone(QUESTION_BANK.next_unanswered(set(QUESTION_BANK.ids)))
+
+class TestProfileTable(unittest.TestCase):
+    def test_codes_round_trip(self):
+        """Every profile code decodes to a scores dict that encodes back to it"""
+        self.assertEqual(PROFILE_COUNT, 729)
+        for code in range(PROFILE_COUNT):
+            self.assertEqual(encode_profile(decode_profile(code)), code)
+
+    def test_table_matches_direct_computation(self):
+        """Table entries agree with computing each result from the scores dict"""
+        for entry in PROFILE_TABLE:
+            scores = decode_profile(entry.code)
+            self.assertEqual(entry.personality_label, get_personality_label(scores))
+            self.assertEqual(entry.strengths, tuple(c for c, s in scores.items() if s == "High"))
+            self.assertEqual(entry.growth_areas, tuple(c for c, s in scores.items() if s == "Low"))
+
+    def test_non_canonical_scores(self):
+        """Partial or reordered scores dicts are derived directly instead of looked up"""
+        self.assertIsNone(encode_profile({"Confidence": "High"}))
+        profile = get_profile({"Confidence": "High", "Communication": "High"})
+        self.assertIsNone(profile.code)
+        self.assertEqual(profile.personality_label, "Confident Speaker")
+        self.assertEqual(get_profile({}).personality_label, "Learning Explorer")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,392 @@
+import unittest
+import sys
+import os
+import json
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import streamlit as st
+
+from utils import database
+from utils.batch_scoring import BAND_LABELS, CATEGORY_NAMES, batch_calculate_scores
+from utils.database import QUERY_CACHE
+from utils.norms import MIN_COHORT_SIZE
+from utils.scoring import get_personality_label
+from utils.storage import SQLiteStorage
+
+try:
+    import psycopg2
+    from utils.postgres_storage import PostgresStorage
+except ImportError:
+    psycopg2 = None
+
+# Point at a running server (e.g. postgresql://postgres@localhost/postgres) to test
+# against it; each test class works in a throwaway database it creates and drops.
+# Otherwise a throwaway server is started with initdb and pg_ctl from PATH.
+POSTGRES_URL_ENV = "LEARNING_PROFILE_TEST_POSTGRES_URL"
+
+RESPONSES = {q_id: (1, 2, 4, 5)[q_id % 4] for q_id in range(1, 25)}
+
+
+class StorageContract:
+    """Behaviour every Storage backend shares; subclasses provide self.storage on a fresh, migrated database."""
+
+    def save(self, child_name="Sam", email="parent@example.com", age=5, birth_year=2020, submission_key=None):
+        scores = {category: "High" for category in CATEGORY_NAMES}
+        return self.storage.save_assessment_result(child_name, age, scores, "Learning Explorer", RESPONSES, email,
+                                                   3, birth_year, submission_key=submission_key)
+
+    def test_schema(self):
+        """init_db is a no-op on a current database and ensure_schema reports the version"""
+        self.assertTrue(self.storage.init_db())
+        self.assertEqual(self.storage.ensure_schema(), self.storage.schema_version)
+
+    def test_assessment_pages(self):
+        """Pages cover every row once, newest first, with JSON columns decoded"""
+        ids = [self.save() for _ in range(5)]
+        self.save(email="other@example.com")
+        seen, cursor = [], None
+        while True:
+            rows, cursor = self.storage.get_assessments_page(email="parent@example.com", page_size=2, cursor=cursor)
+            seen.extend(rows)
+            if cursor is None:
+                break
+        self.assertEqual(sorted(row['id'] for row in seen), ids)
+        order = [(row['created_at'], row['id']) for row in seen]
+        self.assertEqual(order, sorted(order, reverse=True))
+        self.assertEqual(seen[0]['scores'][CATEGORY_NAMES[0]], "High")
+        self.assertEqual(seen[0]['raw_responses']['1'], RESPONSES[1])
+        self.assertEqual(len(self.storage.get_previous_assessments(child_name="Sam")), 6)
+        self.assertEqual(self.storage.get_previous_assessments(), [])
+
+    def test_submission_key(self):
+        """A submission key is saved once, however many times or threads submit it"""
+        first = self.save(submission_key="session-1")
+        self.assertEqual(self.save(submission_key="session-1"), first)
+        self.assertNotEqual(self.save(submission_key="session-2"), first)
+
+        results = []
+        workers = [threading.Thread(target=lambda: results.append(self.save(submission_key="session-3")))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(set(results)), 1)
+        self.assertIsNotNone(results[0])
+        self.assertEqual(len(self.storage.get_previous_assessments(email="parent@example.com")), 3)
+
+    def test_teachers(self):
+        teacher_id = self.storage.create_teacher_account("teacher@example.com", "Ms. Rivera", "Oak", "K")
+        teacher = self.storage.get_teacher_by_email("teacher@example.com")
+        self.assertEqual((teacher['id'], teacher['name'], teacher['school']), (teacher_id, "Ms. Rivera", "Oak"))
+        with mock.patch.object(st, "error"):
+            self.assertIsNone(self.storage.create_teacher_account("teacher@example.com", "Someone Else"))
+        self.assertIsNone(self.storage.get_teacher_by_email("nobody@example.com"))
+
+    def test_assignment_lifecycle(self):
+        """An assignment is created, completed and read back with its teacher and assessment"""
+        teacher_id = self.storage.create_teacher_account("teacher@example.com", "Ms. Rivera", "Oak", "K")
+        assignment_id = self.storage.create_assignment(teacher_id, "parent@example.com", "Sam", "token-1")
+        assignment = self.storage.get_assignment_by_token("token-1")
+        self.assertEqual((assignment['id'], assignment['status'], assignment['teacher_name']),
+                         (assignment_id, "sent", "Ms. Rivera"))
+
+        assessment_id = self.save()
+        self.assertTrue(self.storage.complete_assignment("token-1", assessment_id))
+        self.assertFalse(self.storage.complete_assignment("missing", assessment_id))
+        self.assertEqual(self.storage.get_assignment_by_token("token-1")['status'], "completed")
+
+        result = self.storage.get_assignment_results(teacher_id, assignment_id)
+        self.assertEqual(result['personality_label'], "Learning Explorer")
+        self.assertEqual(result['assessment']['id'], assessment_id)
+        self.assertEqual(result['assessment']['scores'][CATEGORY_NAMES[0]], "High")
+        self.assertIsNotNone(result['completed_at_formatted'])
+        other_id = self.storage.create_teacher_account("other@example.com", "Mr. Lee")
+        self.assertIsNone(self.storage.get_assignment_results(other_id, assignment_id))
+
+    def test_bulk_assignments(self):
+        """Bulk ids come back in input order, and a clashing token creates nothing"""
+        teacher_id = self.storage.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        rows = [(f"parent{i}@example.com", f"Child {i}", f"bulk-{i}") for i in range(25)]
+        ids = self.storage.create_assignments(teacher_id, rows)
+        self.assertEqual(len(set(ids)), 25)
+        self.assertEqual(self.storage.get_assignment_by_token("bulk-7")['id'], ids[7])
+        with mock.patch.object(st, "error"):
+            self.assertEqual(self.storage.create_assignments(teacher_id, [("a@example.com", "A", "fresh"),
+                                                                          ("b@example.com", "B", "bulk-3")]), [])
+        self.assertIsNone(self.storage.get_assignment_by_token("fresh"))
+        self.assertEqual(self.storage.create_assignments(teacher_id, []), [])
+
+    def test_assignment_pages(self):
+        teacher_id = self.storage.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        self.storage.create_assignments(teacher_id, [(f"p{i}@example.com", f"C{i}", f"t-{i}") for i in range(5)])
+        self.storage.complete_assignment("t-2", self.save())
+        seen, cursor = [], None
+        while True:
+            rows, cursor = self.storage.get_teacher_assignments_page(teacher_id, page_size=2, cursor=cursor)
+            seen.extend(rows)
+            if cursor is None:
+                break
+        self.assertEqual(len({row['id'] for row in seen}), 5)
+        completed, _ = self.storage.get_teacher_assignments_page(teacher_id, status="completed")
+        self.assertEqual([row['assignment_token'] for row in completed], ["t-2"])
+        self.assertEqual(completed[0]['personality_label'], "Learning Explorer")
+
+    def test_pending_writes(self):
+        """Queued saves get ids and completions may point at them by key"""
+        teacher_id = self.storage.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        self.storage.create_assignment(teacher_id, "parent@example.com", "Sam", "queued")
+        self.assertIsNone(self.storage.get_assignment_by_token("queued")['assessment_id'])
+        fields = {"child_name": "Sam", "age": 5, "scores": {}, "personality_label": "Learning Explorer",
+                  "raw_responses": RESPONSES, "email": "parent@example.com", "birth_month": 3, "birth_year": 2020}
+        saved = self.storage.save_pending_writes([("pending:a", fields), ("pending:b", fields)],
+                                                 [("queued", "pending:b")])
+        self.assertEqual(set(saved), {"pending:a", "pending:b"})
+        self.assertEqual(self.storage.get_assignment_by_token("queued")['assessment_id'], saved["pending:b"])
+        self.assertEqual(len(self.storage.get_previous_assessments(email="parent@example.com")), 2)
+
+        # A replayed batch maps its keys to the stored rows instead of saving them again
+        replayed = self.storage.save_pending_writes([("pending:b", fields), ("pending:c", fields), ("pending:c", fields)],
+                                                    [])
+        self.assertEqual(replayed["pending:b"], saved["pending:b"])
+        self.assertEqual(len(self.storage.get_previous_assessments(email="parent@example.com")), 3)
+
+    def test_admin_statistics(self):
+        """Trigger-kept counters match a rebuild from the tables"""
+        teacher_id = self.storage.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        self.storage.create_assignments(teacher_id, [("a@example.com", "A", "s-1"), ("b@example.com", "B", "s-2")])
+        self.save("Sam")
+        self.save("Sam")
+        self.save("Alex", email=None)
+        stats = self.storage.get_admin_statistics()
+        expected = {'total_assessments': 3, 'total_teachers': 1, 'total_assignments': 2, 'unique_children': 2,
+                    'unique_accounts': 1}
+        self.assertEqual({name: stats[name] for name in expected}, expected)
+        self.assertEqual(sum(day['count'] for day in stats['daily_activity']), 3)
+        self.assertEqual([row['child_name'] for row in stats['latest_assessments']], ["Alex", "Sam", "Sam"])
+
+        self.assertTrue(self.storage.rebuild_admin_statistics())
+        rebuilt = self.storage.get_admin_statistics()
+        self.assertEqual({name: rebuilt[name] for name in expected}, expected)
+
+    def test_export_chunks(self):
+        ids = [self.save(f"Child {i}") for i in range(7)]
+        chunks = list(self.storage.iter_assessment_chunks(3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual([int(row_id) for chunk in chunks for row_id in chunk['id']], ids)
+        self.assertEqual(list(chunks[0].columns),
+                         ["id", "child_name", "age", "birth_month", "birth_year", "email", "personality_label",
+                          "scores", "instrument_id", "created_at"])
+
+    def test_norms(self):
+        """Saves keep the histograms current, and a rebuild reproduces them"""
+        for _ in range(MIN_COHORT_SIZE):
+            self.save()
+        before = self.storage.get_cohort_histograms("birth_year", 2020)
+        self.assertEqual(int(before[CATEGORY_NAMES[0]].sum()), MIN_COHORT_SIZE)
+        self.assertEqual(self.storage.get_peer_percentiles(RESPONSES, 5, 2020)[0], "birth_year")
+
+        self.assertEqual(self.storage.rebuild_category_norms(chunk_size=7), MIN_COHORT_SIZE)
+        after = self.storage.get_cohort_histograms("birth_year", 2020)
+        self.assertEqual({category: counts.tolist() for category, counts in before.items()},
+                         {category: counts.tolist() for category, counts in after.items()})
+        self.assertEqual(self.storage.backfill_packed_responses(), 0)
+
+    def test_score_rollups(self):
+        """Saved assessments are scored into band counts and trends, filterable by teacher and school"""
+        teacher_id = self.storage.create_teacher_account("teacher@example.com", "Ms. Rivera", "Oak")
+        self.storage.create_assignment(teacher_id, "parent@example.com", "Sam", "token-1")
+        self.storage.complete_assignment("token-1", self.save())
+        self.save()
+        bands = batch_calculate_scores([RESPONSES]).to_dicts()[0]
+        expected = {category: {label: 2 * (label == band) for label in BAND_LABELS} for category, band in bands.items()}
+        self.assertEqual(self.storage.get_band_counts(), expected)
+        self.assertEqual(self.storage.get_band_counts(since="2000-01-01", until="3000-01-01"), expected)
+        self.assertEqual(self.storage.get_band_counts(until="2000-01-01"), {})
+        self.assertEqual(sum(self.storage.get_band_counts(teacher_id=teacher_id)[CATEGORY_NAMES[0]].values()), 1)
+        self.assertEqual(self.storage.get_band_counts(school="Oak"), self.storage.get_band_counts(teacher_id=teacher_id))
+
+        trends = self.storage.get_category_trends("day")
+        self.assertEqual(len(trends), len(CATEGORY_NAMES))
+        self.assertEqual({row['assessments'] for row in trends}, {2})
+        self.assertEqual(self.storage.backfill_assessment_scores(), 0)
+        with self.assertRaises(ValueError):
+            self.storage.get_category_trends("fortnight")
+
+    def test_rescore(self):
+        """Rescoring fixes stale scores, labels and score rows, resumes from its checkpoint, then has nothing to do"""
+        ids = [self.save() for _ in range(5)]
+        trends = self.storage.get_category_trends("day")
+        self.execute("UPDATE assessment_scores SET average = average + 0.5 WHERE average IS NOT NULL")
+        self.execute(f"DELETE FROM assessment_scores WHERE assessment_id = {ids[-1]}")
+
+        def interrupt(stats):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.storage.rescore_assessments(chunk_size=2, progress=interrupt)
+        stats = self.storage.rescore_assessments(chunk_size=2)
+        self.assertEqual((stats["processed"], stats["updated"], stats["skipped"]), (3, 3, 0))
+        self.assertEqual(self.storage.get_category_trends("day"), trends)
+        expected = batch_calculate_scores([RESPONSES]).to_dicts()[0]
+        rows, _ = self.storage.get_assessments_page(email="parent@example.com")
+        self.assertEqual({(json.dumps(row['scores']), row['personality_label']) for row in rows},
+                         {(json.dumps(expected), get_personality_label(expected))})
+        self.assertEqual(self.storage.rescore_assessments(chunk_size=2)["updated"], 0)
+
+    def test_dedupe(self):
+        """Repeated saves are removed with their scores, norms and statistics, and assignments move to the kept row"""
+        teacher_id = self.storage.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        self.storage.create_assignment(teacher_id, "parent@example.com", "Sam", "token-1")
+        kept = [self.save(), self.save(child_name="Alex")]
+        repeats = [self.save(), self.save()]
+        kept += [self.save(child_name="Kai", submission_key=key) for key in ("first", "second")]
+        self.storage.complete_assignment("token-1", repeats[-1])
+
+        self.assertEqual(self.storage.dedupe_assessments(dry_run=True)["removed"], len(repeats))
+        stats = self.storage.dedupe_assessments(chunk_size=2)
+        self.assertEqual((stats["processed"], stats["removed"]), (len(kept) + len(repeats), len(repeats)))
+        rows, _ = self.storage.get_assessments_page(email="parent@example.com", page_size=10)
+        self.assertEqual(sorted(row['id'] for row in rows), kept)
+        self.assertEqual(self.storage.get_assignment_by_token("token-1")['assessment_id'], kept[0])
+        self.assertEqual(self.storage.get_admin_statistics()['total_assessments'], len(kept))
+        self.assertEqual(sum(self.storage.get_band_counts()[CATEGORY_NAMES[0]].values()), len(kept))
+        histograms = self.storage.get_cohort_histograms("all", 0)
+        self.assertEqual(self.storage.rebuild_category_norms(), len(kept))
+        self.assertEqual({category: counts.tolist() for category, counts in histograms.items()},
+                         {category: counts.tolist()
+                          for category, counts in self.storage.get_cohort_histograms("all", 0).items()})
+        self.assertEqual(self.storage.dedupe_assessments()["removed"], 0)
+
+    def test_health(self):
+        health = self.storage.get_db_health()
+        self.assertTrue(health['ok'])
+        self.assertIn('query_cache', health)
+        self.assertGreaterEqual(health['latency_ms'], 0)
+
+
+class TestSQLiteStorage(StorageContract, unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "contract.db"
+        self.conn = st.connection(f"test_contract_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        QUERY_CACHE.clear()
+        self.storage = SQLiteStorage()
+        database.init_db()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def execute(self, sql):
+        database._execute(self.conn, sql)
+
+    def test_schema(self):
+        self.assertTrue(self.storage.init_db())
+        self.assertEqual(self.storage.schema_version, database.SCHEMA_VERSION)
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@unittest.skipIf(psycopg2 is None, "psycopg2 is not installed")
+class TestPostgresStorage(StorageContract, unittest.TestCase):
+    server_dir = None
+
+    @classmethod
+    def setUpClass(cls):
+        server_url = os.environ.get(POSTGRES_URL_ENV)
+        if not server_url:
+            server_url = cls.start_server()
+        cls.database_name = f"contract_{uuid.uuid4().hex[:12]}"
+        cls.admin = psycopg2.connect(server_url)
+        cls.admin.autocommit = True
+        with cls.admin.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE {cls.database_name}")
+        cls.url = psycopg2.extensions.make_dsn(server_url, dbname=cls.database_name)
+        cls.storage_pool = PostgresStorage(cls.url, max_connections=4)
+
+    @classmethod
+    def start_server(cls):
+        """Start a throwaway server in a temp directory, listening only on a socket there."""
+        initdb, pg_ctl = shutil.which("initdb"), shutil.which("pg_ctl")
+        if not initdb or not pg_ctl:
+            raise unittest.SkipTest(f"no PostgreSQL server: set {POSTGRES_URL_ENV} or put initdb on PATH")
+        if hasattr(os, "geteuid") and os.geteuid() == 0:
+            raise unittest.SkipTest(f"initdb refuses to run as root: set {POSTGRES_URL_ENV}")
+        cls.server_dir = tempfile.mkdtemp(prefix="pg_contract_")
+        data_dir = os.path.join(cls.server_dir, "data")
+        port = _free_port()
+        subprocess.run([initdb, "-D", data_dir, "-U", "postgres", "-A", "trust", "--no-sync"],
+                       check=True, capture_output=True)
+        subprocess.run([pg_ctl, "-D", data_dir, "-w", "-l", os.path.join(cls.server_dir, "server.log"),
+                        "-o", f"-p {port} -k {cls.server_dir} -c listen_addresses='' -c fsync=off", "start"],
+                       check=True, capture_output=True)
+        return f"dbname=postgres user=postgres host={cls.server_dir} port={port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.storage_pool.close()
+        with cls.admin.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE {cls.database_name}")
+        cls.admin.close()
+        if cls.server_dir:
+            subprocess.run([shutil.which("pg_ctl"), "-D", os.path.join(cls.server_dir, "data"), "-m", "immediate",
+                            "stop"], capture_output=True)
+            shutil.rmtree(cls.server_dir, ignore_errors=True)
+
+    def setUp(self):
+        # Every test starts from an empty, freshly migrated schema
+        with self.storage_pool._transaction() as cursor:
+            cursor.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+        QUERY_CACHE.clear()
+        self.storage = self.storage_pool
+        self.storage._schema_ready = False
+        self.assertTrue(self.storage.init_db())
+
+    def execute(self, sql):
+        with self.storage._transaction() as cursor:
+            cursor.execute(sql)
+
+    def test_concurrent_migration(self):
+        """Startups racing on a fresh database apply each migration once"""
+        with self.storage._transaction() as cursor:
+            cursor.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+        results = []
+        workers = [threading.Thread(target=lambda: results.append(self.storage.init_db())) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(results, [True, True, True])
+        with self.storage._transaction() as cursor:
+            cursor.execute("SELECT version FROM schema_version ORDER BY version")
+            self.assertEqual(cursor.fetchall(), [(version,) for version in range(1, self.storage.schema_version + 1)])
+
+    def test_pool_is_bounded(self):
+        """Callers beyond max_connections wait for a connection instead of opening more"""
+        storage = PostgresStorage(self.url, max_connections=1, pool_timeout=0.2)
+        try:
+            with storage._connection():
+                with mock.patch.object(st, "error"):
+                    self.assertFalse(storage.get_db_health()['ok'])
+            self.assertTrue(storage.get_db_health()['ok'])
+        finally:
+            storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
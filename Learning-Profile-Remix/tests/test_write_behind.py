@@ -0,0 +1,235 @@
+import unittest
+import sys
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+sys.path.append(str(Path(__file__).parent.parent))
+
+import streamlit as st
+from sqlalchemy.exc import OperationalError
+
+from utils import database, write_behind
+from utils.batch_scoring import QUESTION_IDS
+from utils.response_codec import decode_responses
+from utils.write_behind import WriteBehindQueue
+
+class TestWriteBehindQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmpdir.name) / "queue.db"
+        self.spool_path = Path(self.tmpdir.name) / "queue.spool.jsonl"
+        self.conn = st.connection(f"test_queue_{id(self)}", type="sql", url=f"sqlite:///{db_path}")
+        self.patcher = mock.patch.object(database, "get_db_connection", return_value=self.conn)
+        self.patcher.start()
+        database.init_db()
+
+        teacher_id = database.create_teacher_account("teacher@example.com", "Ms. Rivera")
+        database.create_assignment(teacher_id, "parent@example.com", "Sam", "token-1")
+        self.responses = {q_id: 4 for q_id in QUESTION_IDS}
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    @staticmethod
+    def unavailable(message):
+        """The error SQLAlchemy raises when SQLite cannot take the write."""
+        return OperationalError("INSERT", {}, sqlite3.OperationalError(message))
+
+    def submit(self, queue):
+        provisional_id = queue.submit_assessment(child_name="Sam", age=5, scores={"Communication": "High"},
+                                                 personality_label="Learning Explorer", raw_responses=self.responses,
+                                                 email="parent@example.com", birth_month=1, birth_year=2020)
+        queue.submit_completion("token-1", provisional_id)
+        return provisional_id
+
+    def test_flush(self):
+        """Queued writes land in one batch and the assignment points at the new row"""
+        queue = WriteBehindQueue(self.spool_path)
+        provisional_id = self.submit(queue)
+        self.assertIsNone(queue.resolve(provisional_id))
+        self.assertEqual(queue.pending_count(), 2)
+
+        self.assertEqual(queue.flush(), 2)
+        assessment_id = queue.resolve(provisional_id)
+        assignment = database.get_assignment_by_token("token-1")
+        self.assertEqual(assignment["status"], "completed")
+        self.assertEqual(assignment["assessment_id"], assessment_id)
+        stored = database._query(self.conn, "SELECT raw_responses_packed FROM assessment_results WHERE id = ?", [assessment_id])
+        self.assertEqual(decode_responses(stored.iloc[0]["raw_responses_packed"]), self.responses)
+        self.assertFalse(self.spool_path.exists())
+
+    def test_resolved_ids_bounded(self):
+        """Only the most recent written ids are remembered, and queued completions still find theirs"""
+        queue = WriteBehindQueue(self.spool_path, max_batch=2, max_resolved=2)
+        ids = [queue.submit_assessment(child_name=f"Child {index}", age=5, scores={}, personality_label="Learning Explorer",
+                                       raw_responses=self.responses, email="parent@example.com", birth_month=1,
+                                       birth_year=2020) for index in range(4)]
+        queue.submit_completion("token-1", ids[0])
+
+        self.assertEqual(queue.flush(), 5)
+        self.assertEqual(list(queue.resolved), ids[2:])
+        self.assertIsNone(queue.resolve(ids[0]))
+        self.assertIsNotNone(queue.resolve(ids[3]))
+        first_id = database._query(self.conn, "SELECT MIN(id) AS id FROM assessment_results")["id"][0]
+        self.assertEqual(database.get_assignment_by_token("token-1")["assessment_id"], first_id)
+
+    def test_replay_after_restart(self):
+        """Writes still in the spool are replayed by the next queue"""
+        self.submit(WriteBehindQueue(self.spool_path))
+
+        restarted = WriteBehindQueue(self.spool_path)
+        self.assertEqual(restarted.pending_count(), 2)
+        restarted.flush()
+        self.assertEqual(database.get_assignment_by_token("token-1")["status"], "completed")
+        self.assertEqual(database.get_admin_statistics()["total_assessments"], 1)
+
+    def test_replay_of_written_batch(self):
+        """A crash after the batch commits but before the spool is rewritten saves nothing twice"""
+        queue = WriteBehindQueue(self.spool_path)
+        provisional_id = self.submit(queue)
+        spooled = self.spool_path.read_text()
+        queue.flush()
+        self.spool_path.write_text(spooled)
+
+        restarted = WriteBehindQueue(self.spool_path)
+        self.assertEqual(restarted.flush(), 2)
+        self.assertEqual(restarted.resolve(provisional_id), queue.resolve(provisional_id))
+        self.assertEqual(database.get_admin_statistics()["total_assessments"], 1)
+
+    def test_torn_last_line(self):
+        """A line cut short by a crash is dropped and later appends still read back"""
+        self.submit(WriteBehindQueue(self.spool_path))
+        with self.spool_path.open("a", encoding="utf-8") as spool:
+            spool.write('{"op": "complete", "tok')
+
+        restarted = WriteBehindQueue(self.spool_path)
+        self.submit(restarted)
+        self.assertEqual(WriteBehindQueue(self.spool_path).pending_count(), 4)
+
+    def test_appends_are_fsynced(self):
+        """A submission is on disk when acknowledged, and an fsync covers every line before it"""
+        queue = WriteBehindQueue(self.spool_path)
+        with mock.patch.object(write_behind.os, "fsync", wraps=write_behind.os.fsync) as fsync:
+            self.submit(queue)
+            self.assertEqual(fsync.call_count, 2)
+            queue._sync(1)
+            self.assertEqual(fsync.call_count, 2)
+
+    def test_backoff_until_database_recovers(self):
+        """The flusher retries a failing database less and less often, then drains the spool"""
+        save = database.save_pending_writes
+        failures = [self.unavailable("database is locked")] * 3
+        calls = []
+
+        def flaky(assessments, completions):
+            calls.append(time.perf_counter())
+            if failures:
+                raise failures.pop()
+            return save(assessments, completions)
+
+        queue = WriteBehindQueue(self.spool_path, flush_interval=0.01, max_retry_interval=0.08)
+        with mock.patch.object(database, "save_pending_writes", side_effect=flaky):
+            self.submit(queue)
+            queue.start()
+            deadline = time.monotonic() + 5
+            while queue.pending_count() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            queue.stop()
+        self.assertEqual(queue.pending_count(), 0)
+        self.assertIsNone(queue.last_error)
+        self.assertEqual(len(calls), 4)
+        self.assertGreater(calls[3] - calls[2], calls[1] - calls[0])
+        self.assertEqual(database.get_assignment_by_token("token-1")["status"], "completed")
+
+    def test_repeated_submission(self):
+        """A quiz submitted twice under its submission key is saved once"""
+        queue = WriteBehindQueue(self.spool_path, max_batch=1)
+        fields = dict(child_name="Sam", age=5, scores={"Communication": "High"}, personality_label="Learning Explorer",
+                      raw_responses=self.responses, email="parent@example.com", birth_month=1, birth_year=2020)
+        first = queue.submit_assessment(submission_key="session-1", **fields)
+        self.assertEqual(queue.submit_assessment(submission_key="session-1", **fields), first)
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(database.get_admin_statistics()["total_assessments"], 1)
+        self.assertIsNotNone(queue.resolve(first))
+
+    def test_failed_flush_keeps_writes(self):
+        """A batch that cannot be written stays queued and spooled"""
+        queue = WriteBehindQueue(self.spool_path)
+        self.submit(queue)
+        with mock.patch.object(database, "save_pending_writes", side_effect=self.unavailable("database or disk is full")):
+            with self.assertRaises(OperationalError):
+                queue.flush()
+        self.assertEqual(queue.pending_count(), 2)
+        self.assertEqual(WriteBehindQueue(self.spool_path).pending_count(), 2)
+
+    def test_bad_entry_is_dead_lettered(self):
+        """A write the database rejects is set aside and the writes around it still land"""
+        queue = WriteBehindQueue(self.spool_path)
+        self.submit(queue)
+        bad_id = queue.submit_assessment(child_name="Bad", age=5, scores={}, personality_label="Learning Explorer",
+                                         raw_responses=self.responses, email="parent@example.com", birth_month=1,
+                                         birth_year=2020, unknown_column=1)
+        queue.submit_completion("token-2", bad_id)
+        queue._append({"op": "assessment", "id": "pending:malformed"})
+        later_id = queue.submit_assessment(child_name="Later", age=5, scores={}, personality_label="Learning Explorer",
+                                           raw_responses=self.responses, email="parent@example.com", birth_month=1,
+                                           birth_year=2020)
+
+        self.assertEqual(queue.flush(), 6)
+        self.assertEqual(queue.pending_count(), 0)
+        self.assertIsNotNone(queue.resolve(later_id))
+        self.assertIsNone(queue.resolve(bad_id))
+        self.assertEqual(database.get_admin_statistics()["total_assessments"], 2)
+        self.assertEqual(database.get_assignment_by_token("token-1")["status"], "completed")
+
+        status = queue.status()
+        self.assertEqual((status["pending"], status["dead_letters"]), (0, 3))
+        dead = [json.loads(line) for line in queue.dead_letter_path.read_text().splitlines()]
+        self.assertEqual([entry["entry"]["id"] if "id" in entry["entry"] else entry["entry"]["token"] for entry in dead],
+                         [bad_id, "token-2", "pending:malformed"])
+        self.assertIn("unknown_column", dead[0]["error"])
+        self.assertEqual(WriteBehindQueue(self.spool_path).status()["dead_letters"], 3)
+
+    def test_outage_while_isolating(self):
+        """If the database goes away while a rejected batch is retried entry by entry, the rest stays queued"""
+        queue = WriteBehindQueue(self.spool_path)
+        queue._append({"op": "assessment", "id": "pending:malformed"})
+        self.submit(queue)
+        save = database.save_pending_writes
+        calls = []
+
+        def failing(assessments, completions):
+            calls.append(assessments)
+            if len(calls) == 2:
+                raise self.unavailable("unable to open database file")
+            return save(assessments, completions)
+
+        with mock.patch.object(database, "save_pending_writes", side_effect=failing):
+            with self.assertRaises(OperationalError):
+                queue.flush()
+        self.assertEqual(queue.status()["dead_letters"], 1)
+        self.assertEqual(queue.pending_count(), 1)
+        queue.flush()
+        self.assertEqual(database.get_assignment_by_token("token-1")["status"], "completed")
+
+    def test_completion_split_from_its_assessment(self):
+        """A completion flushed in a later batch than its assessment still gets the real id"""
+        queue = WriteBehindQueue(self.spool_path, max_batch=1)
+        self.submit(queue)
+        queue.flush()
+        self.assertEqual(database.get_assignment_by_token("token-1")["status"], "completed")
+
+    def test_background_flush(self):
+        """The started queue writes without an explicit flush"""
+        queue = WriteBehindQueue(self.spool_path, flush_interval=0.01).start()
+        self.submit(queue)
+        queue.stop()
+        self.assertEqual(queue.pending_count(), 0)
+        self.assertEqual(database.get_assignment_by_token("token-1")["status"], "completed")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Batch Scoring Engine
+Scores many assessments at once with NumPy, matching calculate_scores row for row
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.instruments import Instrument, DEFAULT_INSTRUMENT_ID, LOW_THRESHOLD, MEDIUM_THRESHOLD, get_instrument
+
+# Band labels indexed by band code (0 = Low, 1 = Medium, 2 = High)
+BAND_LABELS = ("Low", "Medium", "High")
+
+DEFAULT_INSTRUMENT = get_instrument(DEFAULT_INSTRUMENT_ID)
+
+# Column order of the default instrument's response matrix and category axis
+QUESTION_IDS = DEFAULT_INSTRUMENT.question_bank.ids
+CATEGORY_NAMES = DEFAULT_INSTRUMENT.question_bank.categories
+CATEGORY_MATRIX = DEFAULT_INSTRUMENT.category_matrix
+
+
+class BatchScores(NamedTuple):
+    """Scores for N assessments: averages (NaN where unanswered) and band codes, both N x categories."""
+    averages: np.ndarray
+    bands: np.ndarray
+    categories: Tuple[str, ...] = CATEGORY_NAMES
+
+    def to_dicts(self) -> List[Dict[str, str]]:
+        """Convert band codes to the {category: "High"/"Medium"/"Low"} dicts calculate_scores returns."""
+        return [
+            {category: BAND_LABELS[code] for category, code in zip(self.categories, row)}
+            for row in self.bands.tolist()
+        ]
+
+
+def responses_to_matrix(responses: Iterable[Dict[Any, int]], instrument: Optional[Instrument] = None) -> np.ndarray:
+    """
+    Pack response dicts into an N x questions matrix, with 0 marking an unanswered question.
+
+    Keys that are not question ids are skipped, exactly as calculate_scores skips them.
+    """
+    instrument = instrument or DEFAULT_INSTRUMENT
+    question_bank = instrument.question_bank
+    responses = list(responses)
+    matrix = np.zeros((len(responses), len(question_bank)), dtype=np.int8)
+    valid_values = set(instrument.likert_scale.values())
+    for row, response in enumerate(responses):
+        if not isinstance(response, dict):
+            raise ValueError("Responses must be a dictionary")
+        for q_id, value in response.items():
+            if value not in valid_values:
+                raise ValueError("Invalid response values detected")
+            if q_id in question_bank:
+                matrix[row, question_bank.position(q_id)] = value
+    return matrix
+
+
+def score_bands(averages: np.ndarray, low_threshold: float = LOW_THRESHOLD,
+                medium_threshold: float = MEDIUM_THRESHOLD) -> np.ndarray:
+    """Map category averages to band codes; NaN (no answers) maps to Low."""
+    bands = np.zeros(averages.shape, dtype=np.int8)
+    bands[averages > low_threshold] = 1
+    bands[averages > medium_threshold] = 2
+    return bands
+
+
+def batch_calculate_scores(responses: Union[np.ndarray, Iterable[Dict[Any, int]]],
+                           instrument: Optional[Instrument] = None) -> BatchScores:
+    """
+    Score a batch of assessments taken on one instrument (the default if None).
+
+    responses: an N x questions matrix in the instrument's question order
+    (0 = unanswered), or an iterable of response dicts as accepted by calculate_scores.
+    """
+    instrument = instrument or DEFAULT_INSTRUMENT
+    question_count = len(instrument.question_bank)
+    if isinstance(responses, np.ndarray):
+        matrix = responses
+        if matrix.ndim != 2 or matrix.shape[1] != question_count:
+            raise ValueError(f"Response matrix must have shape (N, {question_count})")
+        if not np.isin(matrix[matrix != 0], instrument.valid_values).all():
+            raise ValueError("Invalid response values detected")
+    else:
+        matrix = responses_to_matrix(responses, instrument)
+
+    answered = (matrix != 0).astype(np.int32)
+    sums = matrix.astype(np.int32) @ instrument.category_matrix
+    counts = answered @ instrument.category_matrix
+
+    averages = np.full(sums.shape, np.nan)
+    np.divide(sums, counts, out=averages, where=counts > 0)
+    bands = score_bands(averages, instrument.low_threshold, instrument.medium_threshold)
+    return BatchScores(averages=averages, bands=bands, categories=instrument.question_bank.categories)
@@ -1,113 +1,709 @@
 import streamlit as st
+import base64
 import json
+import math
+import os
+import time
+import numpy as np
+import pandas as pd
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from utils.questions import LIKERT_SCALE
+from utils.batch_scoring import BAND_LABELS, batch_calculate_scores, responses_to_matrix, CATEGORY_NAMES
+from utils.instruments import DEFAULT_INSTRUMENT_ID, get_instrument
+from utils.query_cache import QueryCache
+from utils.records import AssessmentRecord, AssignmentRecord, TeacherRecord
+from utils.response_codec import packed_size, encode_matrix, encode_responses, decode_matrix
+from utils.norms import NORM_BIN_COUNT, histogram_rows, accumulate_histograms, peer_percentiles
+from utils.profiles import PROFILE_COUNT, PROFILE_TABLE, decode_profile, encode_bands
+from utils.scoring import get_personality_label
+
+LIKERT_VALUES = set(LIKERT_SCALE.values())
+
+# Largest page the paginated list functions return
+MAX_PAGE_SIZE = 100
+
+# Shared read-through cache for the lookups every rerun repeats; the write
+# functions below invalidate the entries for the rows they change
+QUERY_CACHE = QueryCache()
+
+# SQLite pragmas applied to every pooled connection, by profile name.
+# "tuned" lets parents' submissions proceed while others read (WAL) and waits
+# for a busy writer instead of failing with "database is locked".
+SQLITE_PROFILES = {
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -65536,      # KiB, so 64 MiB of page cache
+        "mmap_size": 268435456,    # 256 MiB
+        "temp_store": "MEMORY",
+    },
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+DEFAULT_SQLITE_PROFILE = "tuned"
+
+# Environment variable that selects the profile
+SQLITE_PROFILE_ENV = "LEARNING_PROFILE_DB_PROFILE"
+
+def get_sqlite_profile(name=None):
+    """Return the pragmas of a named profile, by default the one set in the environment."""
+    name = name or os.environ.get(SQLITE_PROFILE_ENV) or DEFAULT_SQLITE_PROFILE
+    if name not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile: {name!r}")
+    return SQLITE_PROFILES[name]
+
+def configure_sqlite_connection(conn, profile=None):
+    """Apply a SQLite profile's pragmas to every connection the pool opens from now on."""
+    pragmas = get_sqlite_profile(profile)
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in pragmas.items():
+                cursor.execute(f"PRAGMA {pragma} = {value}")
+        finally:
+            cursor.close()
+
+    event.listen(conn.engine, "connect", set_pragmas)
+    # Drop connections opened before the listener so none miss the pragmas
+    conn.engine.dispose()
+    return conn
 
 @st.cache_resource
 def get_db_connection():
     """Get a connection to the SQLite database using st.connection."""
     try:
-        return st.connection('learningprofile', type='sql', url='sqlite:///learning_profiles.db')
+        conn = st.connection('learningprofile', type='sql', url='sqlite:///learning_profiles.db')
+        return configure_sqlite_connection(conn)
     except Exception as e:
         st.error(f"Database connection error: {e}")
         return None
 
+def _execute(conn, sql, params=()):
+    """Run one write statement with ? parameters in its own transaction."""
+    with conn.engine.begin() as connection:
+        return connection.exec_driver_sql(sql, tuple(params))
+
+def _query(conn, sql, params=()):
+    """Run a read query with ? parameters and return a DataFrame."""
+    with conn.engine.connect() as connection:
+        return pd.read_sql_query(sql, connection.connection.dbapi_connection, params=tuple(params))
+
+def _fetch_records(conn, record_type, sql, params=()):
+    """Run a read query with ? parameters and build one record per row, without pandas."""
+    with conn.engine.connect() as connection:
+        rows = connection.exec_driver_sql(sql, tuple(params)).mappings().all()
+    return [record_type.from_row(row) for row in rows]
+
+def _cached(conn, name, params, load, tags):
+    """Read a lookup through QUERY_CACHE, keyed by the database, the lookup's name and its parameters."""
+    return QUERY_CACHE.get_or_load((str(conn.engine.url), name) + tuple(params), load, tags)
+
+def _assessment_tags(child_name, email):
+    """Cache tags of the assessment lists a saved assessment appears in."""
+    return [('assessments_email', email), ('assessments_child', child_name)]
+
+def _completion_tags(connection, tokens):
+    """Cache tags of the assignments a completion changes, read inside the completing transaction."""
+    tokens = list(tokens)
+    placeholders = ", ".join("?" * len(tokens))
+    teacher_ids = connection.exec_driver_sql(
+        f"SELECT DISTINCT teacher_id FROM profile_assignments WHERE assignment_token IN ({placeholders})",
+        tuple(tokens)).fetchall()
+    return ([('assignment', token) for token in tokens] +
+            [('teacher_assignments', teacher_id) for (teacher_id,) in teacher_ids])
+
+def _add_column_if_missing(connection, table, column, declaration):
+    """Add a column to an existing table created before the column was introduced."""
+    columns = [row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def encode_cursor(timestamp, row_id):
+    """Build the opaque cursor for the page after a row with this (timestamp, id)."""
+    return base64.urlsafe_b64encode(json.dumps([timestamp, row_id]).encode()).decode()
+
+def decode_cursor(cursor):
+    """Unpack a cursor from encode_cursor into (timestamp, id); raises ValueError if it is not one."""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError("Invalid page cursor") from None
+    if not isinstance(timestamp, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid page cursor")
+    return timestamp, row_id
+
+def _page(rows, page_size, timestamp_column):
+    """Split one extra fetched row off a page and turn it into the next cursor."""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(rows[-1][timestamp_column], int(rows[-1]['id']))
+
+def decode_raw_responses(raw_responses):
+    """Decode stored raw_responses JSON into {question_id: value}, or None if unreadable or invalid."""
+    try:
+        responses = {int(q_id): value for q_id, value in json.loads(raw_responses).items()}
+    except (TypeError, ValueError, AttributeError):
+        return None
+    if not all(value in LIKERT_VALUES for value in responses.values()):
+        return None
+    return responses
+
+def response_matrices(rows):
+    """
+    Group (instrument_id, raw_responses, raw_responses_packed) rows into per-instrument response matrices.
+
+    Packed rows are unpacked in one vectorized step per instrument; rows without a
+    packed copy fall back to the JSON. Returns {instrument_id: (row indexes, matrix)}
+    with unreadable or invalid rows, and rows of instruments no longer registered,
+    left out.
+    """
+    groups = {}
+    for index, (instrument_id, _, _) in enumerate(rows):
+        groups.setdefault(instrument_id or DEFAULT_INSTRUMENT_ID, []).append(index)
+
+    matrices = {}
+    for instrument_id, indexes in groups.items():
+        try:
+            instrument = get_instrument(instrument_id)
+        except ValueError:
+            continue
+        size = packed_size(len(instrument.question_bank))
+        packed = [i for i in indexes if rows[i][2] is not None and len(rows[i][2]) == size]
+        unpacked = [i for i in indexes if rows[i][2] is None or len(rows[i][2]) != size]
+
+        # JSON fallback; decode_raw_responses already rejects invalid values
+        decoded = [(i, decode_raw_responses(rows[i][1])) for i in unpacked]
+        decoded = [(i, responses) for i, responses in decoded if responses is not None]
+
+        matrix = np.concatenate([
+            decode_matrix([bytes(rows[i][2]) for i in packed], len(instrument.question_bank)),
+            responses_to_matrix([responses for _, responses in decoded], instrument),
+        ])
+        row_indexes = np.array(packed + [i for i, _ in decoded], dtype=np.int64)
+
+        # Three bits can hold values outside the Likert scale; drop those rows
+        valid = np.isin(matrix, instrument.valid_values) | (matrix == 0)
+        keep = valid.all(axis=1)
+        order = np.argsort(row_indexes[keep], kind="stable")
+        matrices[instrument_id] = (row_indexes[keep][order], matrix[keep][order])
+    return matrices
+
+# Admin dashboard counters kept current by the triggers below
+STAT_COUNTERS = ('total_assessments', 'total_teachers', 'total_assignments', 'unique_children', 'unique_accounts')
+
+# Days shown in the admin activity chart
+ACTIVITY_DAYS = 14
+
+# Trigger steps that count an assessment row in ({row} = NEW) or out ({row} = OLD) of the stats
+_STATS_ADD_ASSESSMENT = """
+    UPDATE stat_counters SET value = value + 1 WHERE name = 'total_assessments';
+    UPDATE stat_counters SET value = value + 1 WHERE name = 'unique_children'
+        AND {row}.child_name IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM stat_children WHERE child_name = {row}.child_name);
+    INSERT INTO stat_children (child_name, count) SELECT {row}.child_name, 1 WHERE {row}.child_name IS NOT NULL
+        ON CONFLICT (child_name) DO UPDATE SET count = count + 1;
+    UPDATE stat_counters SET value = value + 1 WHERE name = 'unique_accounts'
+        AND {row}.email IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM stat_accounts WHERE email = {row}.email);
+    INSERT INTO stat_accounts (email, count) SELECT {row}.email, 1 WHERE {row}.email IS NOT NULL
+        ON CONFLICT (email) DO UPDATE SET count = count + 1;
+    INSERT INTO stat_daily_assessments (day, count) SELECT date({row}.created_at), 1 WHERE {row}.created_at IS NOT NULL
+        ON CONFLICT (day) DO UPDATE SET count = count + 1;
+"""
+_STATS_REMOVE_ASSESSMENT = """
+    UPDATE stat_counters SET value = value - 1 WHERE name = 'total_assessments';
+    UPDATE stat_children SET count = count - 1 WHERE child_name = {row}.child_name;
+    UPDATE stat_counters SET value = value - 1 WHERE name = 'unique_children'
+        AND EXISTS (SELECT 1 FROM stat_children WHERE child_name = {row}.child_name AND count = 0);
+    DELETE FROM stat_children WHERE child_name = {row}.child_name AND count = 0;
+    UPDATE stat_accounts SET count = count - 1 WHERE email = {row}.email;
+    UPDATE stat_counters SET value = value - 1 WHERE name = 'unique_accounts'
+        AND EXISTS (SELECT 1 FROM stat_accounts WHERE email = {row}.email AND count = 0);
+    DELETE FROM stat_accounts WHERE email = {row}.email AND count = 0;
+    UPDATE stat_daily_assessments SET count = count - 1 WHERE day = date({row}.created_at);
+"""
+
+STATS_TRIGGERS = {
+    'trg_stats_assessment_insert': f"""
+        AFTER INSERT ON assessment_results BEGIN {_STATS_ADD_ASSESSMENT.format(row='NEW')} END""",
+    'trg_stats_assessment_delete': f"""
+        AFTER DELETE ON assessment_results BEGIN {_STATS_REMOVE_ASSESSMENT.format(row='OLD')} END""",
+    'trg_stats_assessment_update': f"""
+        AFTER UPDATE OF child_name, email, created_at ON assessment_results BEGIN
+        {_STATS_REMOVE_ASSESSMENT.format(row='OLD')} {_STATS_ADD_ASSESSMENT.format(row='NEW')} END""",
+    'trg_stats_teacher_insert': """
+        AFTER INSERT ON teachers BEGIN
+        UPDATE stat_counters SET value = value + 1 WHERE name = 'total_teachers'; END""",
+    'trg_stats_teacher_delete': """
+        AFTER DELETE ON teachers BEGIN
+        UPDATE stat_counters SET value = value - 1 WHERE name = 'total_teachers'; END""",
+    'trg_stats_assignment_insert': """
+        AFTER INSERT ON profile_assignments BEGIN
+        UPDATE stat_counters SET value = value + 1 WHERE name = 'total_assignments'; END""",
+    'trg_stats_assignment_delete': """
+        AFTER DELETE ON profile_assignments BEGIN
+        UPDATE stat_counters SET value = value - 1 WHERE name = 'total_assignments'; END""",
+}
+
+def _migrate_baseline(connection):
+    """
+    Version 1: the schema as it stood when versioning was introduced.
+
+    Every statement is IF NOT EXISTS, so databases created by earlier releases
+    without a schema_version table are brought up to it in place.
+    """
+    # Create assessment results table
+    connection.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS assessment_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            child_name TEXT,
+            age INTEGER,
+            scores TEXT,
+            personality_label TEXT,
+            raw_responses TEXT,
+            email TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            birth_month INTEGER,
+            birth_year INTEGER,
+            instrument_id TEXT,
+            raw_responses_packed BLOB
+        )
+    """)
+    _add_column_if_missing(connection, "assessment_results", "instrument_id", "TEXT")
+    _add_column_if_missing(connection, "assessment_results", "raw_responses_packed", "BLOB")
+
+    # Create teachers table
+    connection.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS teachers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            school TEXT,
+            grade_level TEXT,
+            ambassador_status BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Create profile assignments table
+    connection.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS profile_assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            teacher_id INTEGER REFERENCES teachers(id) ON DELETE CASCADE,
+            parent_email TEXT NOT NULL,
+            child_name TEXT,
+            assignment_token TEXT UNIQUE NOT NULL,
+            status TEXT DEFAULT 'sent',
+            assessment_id INTEGER REFERENCES assessment_results(id) ON DELETE SET NULL,
+            assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP
+        )
+    """)
+
+    # Create category norms histogram table (one row per cohort, category and bin)
+    connection.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS category_norms (
+            cohort_type TEXT NOT NULL,
+            cohort_value INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            bin INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (cohort_type, cohort_value, category, bin)
+        )
+    """)
+
+    # Create checkpoints table for resumable batch jobs
+    connection.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            job TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Create indexes for profile assignments
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_assignments_token ON profile_assignments(assignment_token)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_assignments_parent_email ON profile_assignments(parent_email)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_assignments_teacher_assigned ON profile_assignments(teacher_id, assigned_at)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_assignments_assessment ON profile_assignments(assessment_id)")
+
+    # Create indexes for assessment lookups, newest first within an email or child
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_assessments_email_created ON assessment_results(email, created_at)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_assessments_child_created ON assessment_results(child_name, created_at)")
+
+    # Create admin statistics tables: named counters, per-child and per-account
+    # assessment counts behind the unique counters, and assessments per day
+    connection.exec_driver_sql("CREATE TABLE IF NOT EXISTS stat_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)")
+    connection.exec_driver_sql("CREATE TABLE IF NOT EXISTS stat_children (child_name TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+    connection.exec_driver_sql("CREATE TABLE IF NOT EXISTS stat_accounts (email TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+    connection.exec_driver_sql("CREATE TABLE IF NOT EXISTS stat_daily_assessments (day TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+    for name, body in STATS_TRIGGERS.items():
+        connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    # Databases created before the counters existed get them computed once
+    if connection.exec_driver_sql("SELECT COUNT(*) FROM stat_counters").fetchone()[0] == 0:
+        _rebuild_admin_statistics(connection)
+
+# Assessments scored per chunk when filling assessment_scores from stored answers
+SCORE_CHUNK_SIZE = 5000
+
+def assessment_score_rows(rows):
+    """
+    Score (id, created_at, instrument_id, raw_responses, raw_responses_packed) rows into
+    assessment_scores (assessment_id, category, average, band, created_at) rows.
+
+    Rows whose answers are unreadable get none.
+    """
+    score_rows = []
+    for instrument_id, (row_indexes, matrix) in response_matrices([row[2:] for row in rows]).items():
+        batch = batch_calculate_scores(matrix, get_instrument(instrument_id))
+        for index, averages, bands in zip(row_indexes.tolist(), batch.averages.tolist(), batch.bands.tolist()):
+            row_id, created_at = rows[index][:2]
+            score_rows.extend((row_id, category, average, band, created_at)
+                              for category, average, band in category_scores(averages, bands, batch.categories))
+    return score_rows
+
+def _score_unscored_chunk(connection, last_id, chunk_size):
+    """
+    Fill assessment_scores for the next chunk_size assessments after last_id that have none.
+
+    Returns (last id read, assessments scored); the id is None when there was nothing left.
+    """
+    rows = connection.exec_driver_sql("""
+        SELECT id, created_at, instrument_id, raw_responses, raw_responses_packed FROM assessment_results a
+        WHERE id > ? AND NOT EXISTS (SELECT 1 FROM assessment_scores s WHERE s.assessment_id = a.id)
+        ORDER BY id LIMIT ?
+    """, (last_id, chunk_size)).fetchall()
+    if not rows:
+        return None, 0
+    score_rows = assessment_score_rows(rows)
+    if score_rows:
+        connection.exec_driver_sql("""
+            INSERT INTO assessment_scores (assessment_id, category, average, band, created_at) VALUES (?, ?, ?, ?, ?)
+        """, score_rows)
+    return rows[-1][0], len({row[0] for row in score_rows})
+
+def _migrate_assessment_scores(connection):
+    """
+    Version 2: each category's average and band as real columns in assessment_scores.
+
+    One row per assessment and category, so class- and school-level rollups are
+    GROUP BY queries instead of parsing the scores JSON. created_at is copied
+    from the assessment, so a date-bounded rollup is a range read of the
+    covering (created_at, category, band, average) index. Stored assessments
+    are scored from their answers in chunks, inside the migration's transaction.
+    """
+    connection.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS assessment_scores (
+            assessment_id INTEGER NOT NULL REFERENCES assessment_results(id) ON DELETE CASCADE,
+            category TEXT NOT NULL,
+            average REAL,
+            band INTEGER NOT NULL,
+            created_at TIMESTAMP,
+            PRIMARY KEY (assessment_id, category)
+        ) WITHOUT ROWID
+    """)
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS idx_scores_created ON assessment_scores(created_at, category, band, average)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_teachers_school ON teachers(school)")
+
+    # Foreign keys are not enforced on these connections, so deletes and date fixes are mirrored here
+    connection.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS trg_scores_assessment_delete AFTER DELETE ON assessment_results BEGIN
+        DELETE FROM assessment_scores WHERE assessment_id = OLD.id; END""")
+    connection.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS trg_scores_assessment_created AFTER UPDATE OF created_at ON assessment_results BEGIN
+        UPDATE assessment_scores SET created_at = NEW.created_at WHERE assessment_id = NEW.id; END""")
+
+    last_id = 0
+    while last_id is not None:
+        last_id, _ = _score_unscored_chunk(connection, last_id, SCORE_CHUNK_SIZE)
+
+def _migrate_submission_keys(connection):
+    """
+    Version 3: an optional submission_key on assessment_results, unique when set.
+
+    A write carrying a key is stored at most once, so replaying a spooled batch
+    that was already committed finds the rows instead of duplicating them.
+    """
+    _add_column_if_missing(connection, "assessment_results", "submission_key", "TEXT")
+    connection.exec_driver_sql("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_assessment_submission_key ON assessment_results(submission_key)
+        WHERE submission_key IS NOT NULL
+    """)
+
+# Ordered schema migrations: (version, description, function applying it to an open transaction).
+# Append new ones with the next version number; never edit or reorder applied ones.
+MIGRATIONS = (
+    (1, "Baseline: assessments, teachers, assignments, norms, job checkpoints, indexes and admin statistics",
+     _migrate_baseline),
+    (2, "Per-category average and band columns in assessment_scores, backfilled from stored answers",
+     _migrate_assessment_scores),
+    (3, "Unique submission_key on assessment_results for idempotent queued writes", _migrate_submission_keys),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(connection):
+    """Highest migration applied to the database, 0 if none."""
+    connection.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    return connection.exec_driver_sql("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
 def init_db():
-    """Initialize the SQLite database schema."""
+    """
+    Bring the database schema up to SCHEMA_VERSION.
+
+    Applies each migration newer than the recorded version in its own
+    transaction, which also records it in schema_version. A database that is
+    already current costs one query. When several processes start at once, the
+    first to record a version applies it; the others wait on SQLite's write
+    lock, see the version taken and skip it.
+    """
     conn = get_db_connection()
     if not conn:
         st.warning("No database connection available, skipping initialization.")
         return False
     
     try:
-        # Create assessment results table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS assessment_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                child_name TEXT,
-                age INTEGER,
-                scores TEXT,
-                personality_label TEXT,
-                raw_responses TEXT,
-                email TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                birth_month INTEGER,
-                birth_year INTEGER
-            )
-        """)
-
-        # Create teachers table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS teachers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                school TEXT,
-                grade_level TEXT,
-                ambassador_status BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Create profile assignments table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS profile_assignments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                teacher_id INTEGER REFERENCES teachers(id) ON DELETE CASCADE,
-                parent_email TEXT NOT NULL,
-                child_name TEXT,
-                assignment_token TEXT UNIQUE NOT NULL,
-                status TEXT DEFAULT 'sent',
-                assessment_id INTEGER REFERENCES assessment_results(id) ON DELETE SET NULL,
-                assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP
-            )
-        """)
-
-        # Create indexes for profile assignments
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_assignments_token ON profile_assignments(assignment_token)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_assignments_parent_email ON profile_assignments(parent_email)")
-        
+        with conn.engine.begin() as connection:
+            current = get_schema_version(connection)
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            with conn.engine.begin() as connection:
+                # Recording the version first takes the write lock before any schema work
+                try:
+                    connection.exec_driver_sql("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                                               (version, description))
+                except IntegrityError:
+                    # Another process applied this version first
+                    continue
+                # An IntegrityError from the migration itself fails init_db and rolls the version back
+                migrate(connection)
         return True
     except Exception as e:
         st.error(f"Database initialization error: {e}")
         return False
 
-def save_assessment_result(child_name, age, scores, personality_label, raw_responses, email, birth_month, birth_year):
-    """Save an assessment result to the database."""
+@st.cache_resource
+def ensure_schema():
+    """
+    Run init_db once per process.
+
+    Streamlit reruns the whole script on every interaction, so the app calls
+    this instead of init_db; every rerun after the first is a cache hit. Raises
+    if the schema could not be brought up to date, so a later rerun retries.
+    """
+    if not init_db():
+        raise RuntimeError("Database schema could not be brought up to date")
+    return SCHEMA_VERSION
+
+def category_scores(averages, bands, categories):
+    """(category, average, band code) rows for one assessment; a category with no answers has a NULL average."""
+    return [(category, None if math.isnan(average) else average, band)
+            for category, average, band in zip(categories, averages, bands)]
+
+def _assessment_row(child_name, age, scores, personality_label, raw_responses, email, birth_month, birth_year,
+                    instrument_id=DEFAULT_INSTRUMENT_ID, submission_key=None):
+    """
+    Build the assessment_results insert parameters, the norms bins one assessment
+    bumps and its assessment_scores (category, average, band) rows.
+    """
+    # Packed copy of the answers, histogram bins to bump for the population norms
+    # and per-category score rows; never block the save on them
+    try:
+        instrument = get_instrument(instrument_id)
+        packed = encode_responses(raw_responses, instrument)
+        batch = batch_calculate_scores([raw_responses], instrument)
+        norm_rows = histogram_rows(batch.averages[0], age, birth_year, batch.categories)
+        score_rows = category_scores(batch.averages[0].tolist(), batch.bands[0].tolist(), batch.categories)
+    except ValueError:
+        packed = None
+        norm_rows = []
+        score_rows = []
+
+    row = (child_name, age, json.dumps(scores), personality_label, json.dumps(raw_responses), email, birth_month, birth_year,
+           instrument_id, packed, submission_key)
+    return row, norm_rows, score_rows
+
+def _insert_assessments(connection, prepared):
+    """
+    Insert prepared (row, norm_rows, score_rows) assessments inside an open transaction and return their ids.
+
+    SQLite holds the write lock for the whole transaction and AUTOINCREMENT ids
+    are consecutive, so the ids of one executemany end at last_insert_rowid().
+    """
+    connection.exec_driver_sql("""
+        INSERT INTO assessment_results 
+        (child_name, age, scores, personality_label, raw_responses, email, birth_month, birth_year, instrument_id,
+         raw_responses_packed, submission_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [row for row, _, _ in prepared])
+    last_id = connection.exec_driver_sql("SELECT last_insert_rowid()").fetchone()[0]
+    ids = list(range(last_id - len(prepared) + 1, last_id + 1))
+
+    norm_rows = [norm_row for _, rows, _ in prepared for norm_row in rows]
+    if norm_rows:
+        connection.exec_driver_sql("""
+            INSERT INTO category_norms (cohort_type, cohort_value, category, bin, count)
+            VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT (cohort_type, cohort_value, category, bin) DO UPDATE SET count = count + 1
+        """, norm_rows)
+
+    score_rows = [(result_id, category, average, band, result_id)
+                  for result_id, (_, _, rows) in zip(ids, prepared) for category, average, band in rows]
+    if score_rows:
+        # created_at is copied from the row just inserted, default timestamp included
+        connection.exec_driver_sql("""
+            INSERT INTO assessment_scores (assessment_id, category, average, band, created_at)
+            SELECT ?, ?, ?, ?, created_at FROM assessment_results WHERE id = ?
+        """, score_rows)
+    return ids
+
+def save_assessment_result(child_name, age, scores, personality_label, raw_responses, email, birth_month, birth_year,
+                           instrument_id=DEFAULT_INSTRUMENT_ID, submission_key=None):
+    """
+    Save an assessment result to the database, recording which instrument it was taken on.
+
+    With a submission_key the save happens at most once: if a row with that key
+    is already stored, by an earlier call or a concurrent one, its id is
+    returned and nothing is written.
+    """
     conn = get_db_connection()
     if not conn:
         return None
 
+    prepared = _assessment_row(child_name, age, scores, personality_label, raw_responses, email, birth_month, birth_year,
+                               instrument_id, submission_key)
     try:
-        result = conn.execute("""
-            INSERT INTO assessment_results 
-            (child_name, age, scores, personality_label, raw_responses, email, birth_month, birth_year)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, [child_name, age, json.dumps(scores), personality_label, json.dumps(raw_responses), email, birth_month, birth_year])
-        
-        return result.lastrowid
+        try:
+            with conn.engine.begin() as connection:
+                result_id = _submission_id(connection, submission_key)
+                if result_id is not None:
+                    return result_id
+                (result_id,) = _insert_assessments(connection, [prepared])
+        except IntegrityError:
+            # A concurrent save with the same key committed first
+            with conn.engine.connect() as connection:
+                result_id = _submission_id(connection, submission_key)
+            if result_id is None:
+                raise
+            return result_id
+        QUERY_CACHE.invalidate(*_assessment_tags(child_name, email))
+        return result_id
     except Exception as e:
         st.error(f"Error saving assessment result: {e}")
         return None
 
-def get_previous_assessments(email=None, child_name=None, limit=50):
-    """Get previous assessments by email or child name."""
+def _submission_ids(connection, keys):
+    """(submission_key, id) of the stored assessments with these keys."""
+    keys = list(keys)
+    placeholders = ", ".join("?" * len(keys))
+    return connection.exec_driver_sql(
+        f"SELECT submission_key, id FROM assessment_results WHERE submission_key IN ({placeholders})",
+        tuple(keys)).fetchall()
+
+def _submission_id(connection, submission_key):
+    """Id of the stored assessment with this submission_key, or None."""
+    return dict(_submission_ids(connection, [submission_key])).get(submission_key) if submission_key else None
+
+def unsaved_submissions(assessments, saved):
+    """The (key, fields) assessments whose key is not in saved, each key once."""
+    fresh = {}
+    for key, fields in assessments:
+        if key not in saved:
+            fresh.setdefault(key, fields)
+    return list(fresh.items())
+
+def save_pending_writes(assessments, completions):
+    """
+    Write a batch of queued saves and assignment completions in one transaction.
+
+    assessments: [(key, save_assessment_result keyword arguments)]
+    completions: [(assignment_token, assessment_id or the key of a queued assessment)]
+    Each key is stored as the row's submission_key, so a key already in the
+    table is not inserted again and maps to the stored row; replaying a batch
+    is safe. Returns {key: assessment id}; raises if the batch could not be
+    written so the caller can keep it queued.
+    """
     conn = get_db_connection()
     if not conn:
-        return []
+        raise ConnectionError("No database connection available")
+
+    with conn.engine.begin() as connection:
+        saved = dict(_submission_ids(connection, {key for key, _ in assessments})) if assessments else {}
+        fresh = unsaved_submissions(assessments, saved)
+        prepared = [_assessment_row(**fields, submission_key=key) for key, fields in fresh]
+        ids = _insert_assessments(connection, prepared) if prepared else []
+        saved.update((key, result_id) for (key, _), result_id in zip(fresh, ids))
+        tags = [tag for _, fields in fresh for tag in _assessment_tags(fields.get('child_name'), fields.get('email'))]
+        if completions:
+            connection.exec_driver_sql("""
+                UPDATE profile_assignments 
+                SET status = 'completed', assessment_id = ?, completed_at = CURRENT_TIMESTAMP
+                WHERE assignment_token = ?
+            """, [(saved.get(assessment_id, assessment_id), token) for token, assessment_id in completions])
+            tags.extend(_completion_tags(connection, {token for token, _ in completions}))
+    QUERY_CACHE.invalidate(*tags)
+    return saved
+
+def get_assessments_page(email=None, child_name=None, page_size=20, cursor=None):
+    """
+    Get one page of assessments by email or child name, newest first.
+
+    Pages are keyed on (created_at, id), so rows saved while paging never shift
+    or repeat a page. Returns (rows, next_cursor), rows being AssessmentRecords
+    with scores and raw_responses decoded; next_cursor is None on the last
+    page. page_size is capped at MAX_PAGE_SIZE.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return [], None
+
+    if email:
+        where, params = "email = ?", [email]
+    elif child_name:
+        where, params = "child_name = ?", [child_name]
+    else:
+        return [], None
 
     try:
-        if email:
-            df = conn.query("SELECT *, datetime(created_at) as created_at_formatted FROM assessment_results WHERE email = ? ORDER BY created_at DESC LIMIT ?", params=[email, limit])
-        elif child_name:
-            df = conn.query("SELECT *, datetime(created_at) as created_at_formatted FROM assessment_results WHERE child_name = ? ORDER BY created_at DESC LIMIT ?", params=[child_name, limit])
-        else:
-            return []
-        
-        return df.to_dict('records')
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        tags = [('assessments_email', email)] if email else [('assessments_child', child_name)]
+        if cursor:
+            where += " AND (created_at, id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        params.append(page_size + 1)
+        rows, next_cursor = _cached(conn, f"assessments:{where}", params, lambda: _page(tuple(_fetch_records(
+            conn, AssessmentRecord, f"""
+            SELECT *, datetime(created_at) as created_at_formatted FROM assessment_results
+            WHERE {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        """, params)), page_size, 'created_at'), tags)
+        # A copy, so callers extending their page lists don't change the cached one
+        return list(rows), next_cursor
     except Exception as e:
         st.error(f"Error retrieving assessments: {e}")
-        return []
+        return [], None
+
+def get_previous_assessments(email=None, child_name=None, limit=50):
+    """Get previous assessments by email or child name (the first page, newest first)."""
+    rows, _ = get_assessments_page(email=email, child_name=child_name, page_size=limit)
+    return rows
 
 def create_teacher_account(email, name, school=None, grade_level=None):
     """Create a new teacher account."""
@@ -116,8 +712,9 @@ def create_teacher_account(email, name, school=None, grade_level=None):
         return None
 
     try:
-        result = conn.execute("INSERT INTO teachers (email, name, school, grade_level) VALUES (?, ?, ?, ?)",
+        result = _execute(conn, "INSERT INTO teachers (email, name, school, grade_level) VALUES (?, ?, ?, ?)",
                     [email, name, school, grade_level])
+        QUERY_CACHE.invalidate(('teacher', email))
         return result.lastrowid
     except Exception as e:
         # Teacher already exists or other error
@@ -125,14 +722,15 @@ def create_teacher_account(email, name, school=None, grade_level=None):
         return None
 
 def get_teacher_by_email(email):
-    """Get teacher information by email."""
+    """Get teacher information by email, as a TeacherRecord."""
     conn = get_db_connection()
     if not conn:
         return None
     
     try:
-        df = conn.query("SELECT * FROM teachers WHERE email = ?", params=[email])
-        return df.iloc[0].to_dict() if len(df) > 0 else None
+        rows = _cached(conn, "teacher_by_email", [email], lambda: _fetch_records(
+            conn, TeacherRecord, "SELECT * FROM teachers WHERE email = ?", [email]), [('teacher', email)])
+        return rows[0] if rows else None
     except Exception as e:
         st.error(f"Error retrieving teacher: {e}")
         return None
@@ -144,52 +742,148 @@ def create_assignment(teacher_id, parent_email, child_name, assignment_token):
         return None
     
     try:
-        result = conn.execute("INSERT INTO profile_assignments (teacher_id, parent_email, child_name, assignment_token) VALUES (?, ?, ?, ?)",
+        result = _execute(conn, "INSERT INTO profile_assignments (teacher_id, parent_email, child_name, assignment_token) VALUES (?, ?, ?, ?)",
                     [teacher_id, parent_email, child_name, assignment_token])
+        QUERY_CACHE.invalidate(('assignment', assignment_token), ('teacher_assignments', teacher_id))
         return result.lastrowid
     except Exception as e:
         st.error(f"Error creating assignment: {e}")
         return None
 
+def create_assignments(teacher_id, assignments):
+    """
+    Create many profile assignments for one teacher in a single transaction.
+
+    assignments: [(parent_email, child_name, assignment_token)]
+    Returns the new assignment ids in order, or [] if nothing was created; the
+    batch is all or nothing.
+    """
+    conn = get_db_connection()
+    if not conn or not assignments:
+        return []
+
+    try:
+        with conn.engine.begin() as connection:
+            connection.exec_driver_sql("""
+                INSERT INTO profile_assignments (teacher_id, parent_email, child_name, assignment_token)
+                VALUES (?, ?, ?, ?)
+            """, [(teacher_id, parent_email, child_name, token) for parent_email, child_name, token in assignments])
+            last_id = connection.exec_driver_sql("SELECT last_insert_rowid()").fetchone()[0]
+        QUERY_CACHE.invalidate(('teacher_assignments', teacher_id),
+                               *[('assignment', token) for _, _, token in assignments])
+        return list(range(last_id - len(assignments) + 1, last_id + 1))
+    except Exception as e:
+        st.error(f"Error creating assignments: {e}")
+        return []
+
 def get_assignment_by_token(assignment_token):
-    """Get assignment information by token."""
+    """
+    Get assignment information by token, as an AssignmentRecord with its teacher's details.
+
+    Every rerun of an assigned quiz looks the token up, so the result is served
+    from QUERY_CACHE until the assignment is written.
+    """
     conn = get_db_connection()
     if not conn:
         return None
     
     try:
-        df = conn.query("""
+        rows = _cached(conn, "assignment_by_token", [assignment_token], lambda: _fetch_records(
+            conn, AssignmentRecord, """
             SELECT pa.*, t.name as teacher_name, t.school, t.grade_level
             FROM profile_assignments pa
             JOIN teachers t ON pa.teacher_id = t.id
             WHERE pa.assignment_token = ?
-        """, params=[assignment_token])
-        return df.iloc[0].to_dict() if len(df) > 0 else None
+        """, [assignment_token]), [('assignment', assignment_token)])
+        return rows[0] if rows else None
     except Exception as e:
         st.error(f"Error retrieving assignment: {e}")
         return None
 
-def get_teacher_assignments(teacher_id, limit=50):
-    """Get all assignments for a teacher."""
+def get_assignment_results(teacher_id, assignment_id):
+    """
+    Get one of a teacher's assignments with its teacher and linked assessment in one query.
+
+    Joins on profile_assignments.assessment_id, so the assessment is the one the
+    parent submitted for this assignment. Returns an AssignmentRecord with
+    teacher_name, school and grade_level, and 'assessment' holding the
+    AssessmentRecord with scores decoded (None until completed). Returns None
+    if the assignment does not exist or belongs to another teacher.
+    """
     conn = get_db_connection()
     if not conn:
-        return []
+        return None
+
+    def load():
+        with conn.engine.connect() as connection:
+            row = connection.exec_driver_sql("""
+                SELECT pa.*, t.name AS teacher_name, t.school, t.grade_level,
+                       datetime(pa.assigned_at) AS assigned_at_formatted,
+                       datetime(pa.completed_at) AS completed_at_formatted,
+                       ar.id AS ar_id, ar.child_name AS ar_child_name, ar.age AS ar_age, ar.scores AS ar_scores,
+                       ar.personality_label AS ar_personality_label, ar.email AS ar_email,
+                       ar.birth_month AS ar_birth_month, ar.birth_year AS ar_birth_year,
+                       ar.instrument_id AS ar_instrument_id, datetime(ar.created_at) AS ar_created_at
+                FROM profile_assignments pa
+                JOIN teachers t ON t.id = pa.teacher_id
+                LEFT JOIN assessment_results ar ON ar.id = pa.assessment_id
+                WHERE pa.id = ? AND pa.teacher_id = ?
+            """, (int(assignment_id), teacher_id)).mappings().fetchone()
+        if row is None:
+            return None
+
+        assessment = AssessmentRecord.from_row(row, prefix='ar_') if row['ar_id'] is not None else None
+        return AssignmentRecord.from_row(row, personality_label=row['ar_personality_label'], assessment=assessment)
 
     try:
-        df = conn.query("""
+        return _cached(conn, "assignment_results", [teacher_id, int(assignment_id)], load,
+                       [('teacher_assignments', teacher_id)])
+    except Exception as e:
+        st.error(f"Error retrieving assignment: {e}")
+        return None
+
+def get_teacher_assignments_page(teacher_id, page_size=20, cursor=None, status=None):
+    """
+    Get one page of a teacher's assignments, newest first, optionally only one status.
+
+    Pages are keyed on (assigned_at, id). Returns (rows, next_cursor), rows being
+    AssignmentRecords; next_cursor is None on the last page. page_size is
+    capped at MAX_PAGE_SIZE.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return [], None
+
+    try:
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        where, params = "pa.teacher_id = ?", [teacher_id]
+        if status:
+            where += " AND pa.status = ?"
+            params.append(status)
+        if cursor:
+            where += " AND (pa.assigned_at, pa.id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        params.append(page_size + 1)
+        rows, next_cursor = _cached(conn, f"teacher_assignments:{where}", params, lambda: _page(tuple(_fetch_records(
+            conn, AssignmentRecord, f"""
             SELECT pa.*, ar.personality_label,
                    datetime(pa.assigned_at) as assigned_at_formatted,
                    datetime(pa.completed_at) as completed_at_formatted
             FROM profile_assignments pa
             LEFT JOIN assessment_results ar ON pa.assessment_id = ar.id
-            WHERE pa.teacher_id = ?
-            ORDER BY pa.assigned_at DESC
+            WHERE {where}
+            ORDER BY pa.assigned_at DESC, pa.id DESC
             LIMIT ?
-        """, params=[teacher_id, limit])
-        return df.to_dict('records')
+        """, params)), page_size, 'assigned_at'), [('teacher_assignments', teacher_id)])
+        return list(rows), next_cursor
     except Exception as e:
         st.error(f"Error retrieving teacher assignments: {e}")
-        return []
+        return [], None
+
+def get_teacher_assignments(teacher_id, limit=50):
+    """Get a teacher's assignments (the first page, newest first)."""
+    rows, _ = get_teacher_assignments_page(teacher_id, page_size=limit)
+    return rows
 
 def complete_assignment(assignment_token, assessment_id):
     """Mark an assignment as completed."""
@@ -198,43 +892,662 @@ def complete_assignment(assignment_token, assessment_id):
         return False
 
     try:
-        result = conn.execute("""
-            UPDATE profile_assignments 
-            SET status = 'completed', assessment_id = ?, completed_at = CURRENT_TIMESTAMP
-            WHERE assignment_token = ?
-        """, [assessment_id, assignment_token])
+        with conn.engine.begin() as connection:
+            result = connection.exec_driver_sql("""
+                UPDATE profile_assignments 
+                SET status = 'completed', assessment_id = ?, completed_at = CURRENT_TIMESTAMP
+                WHERE assignment_token = ?
+            """, (assessment_id, assignment_token))
+            tags = _completion_tags(connection, [assignment_token])
+        QUERY_CACHE.invalidate(*tags)
         return result.rowcount > 0
     except Exception as e:
         st.error(f"Error completing assignment: {e}")
         return False
             
+def daily_activity(counts):
+    """One {'date', 'count'} row per day for the last ACTIVITY_DAYS days (UTC), from {day: count}."""
+    today = pd.Timestamp.now(tz='UTC').normalize()
+    days = [(today - pd.Timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(ACTIVITY_DAYS - 1, -1, -1)]
+    return [{'date': day, 'count': int(counts.get(day, 0))} for day in days]
+
 def get_admin_statistics():
-    """Get basic admin statistics."""
+    """
+    Get the admin dashboard statistics.
+
+    Counters and the daily rollup are kept current by triggers, so this reads
+    a handful of rows however many assessments exist.
+    """
+    empty = {
+        'total_assessments': 0,
+        'total_teachers': 0,
+        'total_assignments': 0,
+        'unique_children': 0,
+        'unique_accounts': 0,
+        'daily_assessments': [],
+        'daily_activity': [],
+        'latest_assessments': []
+    }
     conn = get_db_connection()
     if not conn:
-        return {
-            'total_assessments': 0,
-            'total_teachers': 0,
-            'total_assignments': 0,
-            'daily_activity': []
-        }
-    
+        return empty
+
     try:
-        total_assessments = conn.query("SELECT COUNT(*) as count FROM assessment_results").iloc[0]['count']
-        total_teachers = conn.query("SELECT COUNT(*) as count FROM teachers").iloc[0]['count']
-        total_assignments = conn.query("SELECT COUNT(*) as count FROM profile_assignments").iloc[0]['count']
-        
-        return {
-            'total_assessments': total_assessments,
-            'total_teachers': total_teachers,
-            'total_assignments': total_assignments,
-            'daily_activity': []  # Simplified for now
-        }
+        counters = _query(conn, "SELECT name, value FROM stat_counters")
+        stats = dict(empty)
+        stats.update({name: int(value) for name, value in zip(counters['name'], counters['value'])})
+
+        # One row per day with assessments; fill in the quiet days
+        daily = _query(conn, f"""
+            SELECT day, count FROM stat_daily_assessments
+            WHERE day > date('now', '-{ACTIVITY_DAYS} days') ORDER BY day
+        """)
+        stats['daily_assessments'] = daily_activity(dict(zip(daily['day'], daily['count'])))
+        stats['daily_activity'] = stats['daily_assessments']
+
+        stats['latest_assessments'] = _query(conn, """
+            SELECT id, child_name, age, personality_label, email, datetime(created_at) as created_at
+            FROM assessment_results ORDER BY id DESC LIMIT 10
+        """).to_dict('records')
+        return stats
     except Exception as e:
         st.error(f"Error getting admin statistics: {e}")
-        return {
-            'total_assessments': 0,
-            'total_teachers': 0,
-            'total_assignments': 0,
-            'daily_activity': []
-        }
\ No newline at end of file
+        return empty
+
+def iter_assessment_chunks(chunk_size=5000):
+    """
+    Yield every assessment (without raw answers) in id order, as DataFrames of up to chunk_size rows.
+
+    Each chunk is its own keyset query, so memory stays bounded by the chunk
+    and rows saved during the walk are included if they land after it.
+    Raises if the database cannot be read, so an export is never silently short.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("No database connection available")
+
+    last_id = 0
+    while True:
+        chunk = _query(conn, """
+            SELECT id, child_name, age, birth_month, birth_year, email, personality_label, scores, instrument_id,
+                   datetime(created_at) as created_at
+            FROM assessment_results WHERE id > ? ORDER BY id LIMIT ?
+        """, [last_id, chunk_size])
+        if chunk.empty:
+            return
+        last_id = int(chunk['id'].iloc[-1])
+        yield chunk
+
+def rebuild_admin_statistics():
+    """Recompute the admin counters and daily rollup from the tables in one transaction."""
+    conn = get_db_connection()
+    if not conn:
+        return False
+
+    try:
+        with conn.engine.begin() as connection:
+            _rebuild_admin_statistics(connection)
+        return True
+    except Exception as e:
+        st.error(f"Error rebuilding admin statistics: {e}")
+        return False
+
+def _rebuild_admin_statistics(connection):
+    """Recompute the admin statistics tables inside an open transaction."""
+    for table in ('stat_counters', 'stat_children', 'stat_accounts', 'stat_daily_assessments'):
+        connection.exec_driver_sql(f"DELETE FROM {table}")
+    connection.exec_driver_sql("""
+        INSERT INTO stat_children (child_name, count)
+        SELECT child_name, COUNT(*) FROM assessment_results WHERE child_name IS NOT NULL GROUP BY child_name
+    """)
+    connection.exec_driver_sql("""
+        INSERT INTO stat_accounts (email, count)
+        SELECT email, COUNT(*) FROM assessment_results WHERE email IS NOT NULL GROUP BY email
+    """)
+    connection.exec_driver_sql("""
+        INSERT INTO stat_daily_assessments (day, count)
+        SELECT date(created_at), COUNT(*) FROM assessment_results WHERE created_at IS NOT NULL
+        GROUP BY date(created_at)
+    """)
+    connection.exec_driver_sql("""
+        INSERT INTO stat_counters (name, value) VALUES
+        ('total_assessments', (SELECT COUNT(*) FROM assessment_results)),
+        ('total_teachers', (SELECT COUNT(*) FROM teachers)),
+        ('total_assignments', (SELECT COUNT(*) FROM profile_assignments)),
+        ('unique_children', (SELECT COUNT(*) FROM stat_children)),
+        ('unique_accounts', (SELECT COUNT(*) FROM stat_accounts))
+    """)
+
+def get_db_health():
+    """
+    Probe the database: round-trip latency, the pragmas in effect, file and pool sizes
+    and the query cache's hit and miss counters.
+
+    Returns a dict with ok=False and the error if the database cannot be reached.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return {'ok': False, 'error': 'No database connection available'}
+
+    try:
+        started = time.perf_counter()
+        with conn.engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1").fetchone()
+            latency_ms = (time.perf_counter() - started) * 1000
+            stats = {
+                pragma: connection.exec_driver_sql(f"PRAGMA {pragma}").fetchone()[0]
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size',
+                               'page_size', 'page_count', 'freelist_count')
+            }
+        stats['database_bytes'] = stats['page_size'] * stats['page_count']
+        return {'ok': True, 'latency_ms': latency_ms, 'pool': conn.engine.pool.status(),
+                'query_cache': QUERY_CACHE.stats(), **stats}
+    except Exception as e:
+        st.error(f"Database health check failed: {e}")
+        return {'ok': False, 'error': str(e)}
+
+def get_cohort_histograms(cohort_type, cohort_value):
+    """Get the norms histogram of every category for one cohort as {category: counts}."""
+    conn = get_db_connection()
+    if not conn:
+        return {}
+
+    try:
+        with conn.engine.connect() as connection:
+            rows = connection.exec_driver_sql("""
+                SELECT category, bin, count FROM category_norms
+                WHERE cohort_type = ? AND cohort_value = ?
+            """, (cohort_type, int(cohort_value))).fetchall()
+        histograms = {}
+        for category, bin_index, count in rows:
+            histograms.setdefault(category, np.zeros(NORM_BIN_COUNT, dtype=np.int64))[bin_index] = count
+        return histograms
+    except Exception as e:
+        st.error(f"Error retrieving norms: {e}")
+        return {}
+
+def get_peer_percentiles(responses, age=None, birth_year=None):
+    """
+    Get each category's percentile among peers for a set of responses.
+
+    Uses the narrowest cohort (birth year, then age, then everyone) with at least
+    MIN_COHORT_SIZE assessments. Returns (cohort_type, {category: percentile}).
+    """
+    return peer_percentiles(responses, age, birth_year, get_cohort_histograms)
+
+def accumulate_norm_rows(histograms, rows):
+    """
+    Score (age, birth_year, instrument_id, raw_responses, raw_responses_packed) rows into norms histograms.
+
+    Returns the number of rows counted; unreadable rows are skipped.
+    """
+    counted = 0
+    ages = np.array([np.nan if row[0] is None else row[0] for row in rows], dtype=float)
+    birth_years = np.array([np.nan if row[1] is None else row[1] for row in rows], dtype=float)
+    for instrument_id, (row_indexes, matrix) in response_matrices([row[2:] for row in rows]).items():
+        batch = batch_calculate_scores(matrix, get_instrument(instrument_id))
+        accumulate_histograms(histograms, batch.averages, ages[row_indexes], birth_years[row_indexes],
+                              batch.categories)
+        counted += len(row_indexes)
+    return counted
+
+def norm_table_rows(histograms):
+    """Flatten accumulated histograms into category_norms (cohort_type, cohort_value, category, bin, count) rows."""
+    return [
+        (cohort_type, cohort_value, category, bin_index, int(count))
+        for (cohort_type, cohort_value, category), counts in histograms.items()
+        for bin_index, count in enumerate(counts)
+        if count > 0
+    ]
+
+def packed_updates(rows):
+    """Pack (id, instrument_id, raw_responses, raw_responses_packed) rows into (blob, id) updates."""
+    updates = []
+    for row_indexes, matrix in response_matrices([row[1:] for row in rows]).values():
+        blobs = encode_matrix(matrix)
+        updates.extend((blob, rows[index][0]) for index, blob in zip(row_indexes.tolist(), blobs))
+    return updates
+
+def rebuild_category_norms(chunk_size=5000):
+    """
+    Rebuild the norms histograms from assessment_results.
+
+    Streams the table in id order, chunk_size rows at a time, and swaps in the
+    new histograms in one transaction. Returns the number of assessments counted.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return 0
+
+    try:
+        histograms = {}
+        counted = 0
+        last_id = 0
+        with conn.engine.connect() as connection:
+            while True:
+                rows = connection.exec_driver_sql("""
+                    SELECT id, age, birth_year, instrument_id, raw_responses, raw_responses_packed
+                    FROM assessment_results
+                    WHERE id > ? ORDER BY id LIMIT ?
+                """, (last_id, chunk_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                counted += accumulate_norm_rows(histograms, [row[1:] for row in rows])
+
+        norm_rows = norm_table_rows(histograms)
+        with conn.engine.begin() as connection:
+            connection.exec_driver_sql("DELETE FROM category_norms")
+            if norm_rows:
+                connection.exec_driver_sql("""
+                    INSERT INTO category_norms (cohort_type, cohort_value, category, bin, count)
+                    VALUES (?, ?, ?, ?, ?)
+                """, norm_rows)
+        return counted
+    except Exception as e:
+        st.error(f"Error rebuilding norms: {e}")
+        return 0
+
+
+def backfill_packed_responses(chunk_size=5000):
+    """
+    Fill raw_responses_packed for rows saved before the packed column existed.
+
+    Walks the table in id order and writes each chunk in its own transaction, so
+    it can be stopped and rerun. Rows whose JSON is unreadable are left NULL.
+    Returns the number of rows packed.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return 0
+
+    try:
+        packed_rows = 0
+        last_id = 0
+        while True:
+            with conn.engine.connect() as connection:
+                rows = connection.exec_driver_sql("""
+                    SELECT id, instrument_id, raw_responses, raw_responses_packed FROM assessment_results
+                    WHERE id > ? AND raw_responses_packed IS NULL ORDER BY id LIMIT ?
+                """, (last_id, chunk_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = packed_updates(rows)
+            if updates:
+                with conn.engine.begin() as connection:
+                    connection.exec_driver_sql(
+                        "UPDATE assessment_results SET raw_responses_packed = ? WHERE id = ?", updates)
+            packed_rows += len(updates)
+        return packed_rows
+    except Exception as e:
+        st.error(f"Error packing stored responses: {e}")
+        return 0
+
+def backfill_assessment_scores(chunk_size=SCORE_CHUNK_SIZE):
+    """
+    Fill assessment_scores for assessments that have no score rows.
+
+    Migration 2 does this once; this is for rows written around it, e.g. by
+    hand. Each chunk is committed on its own, so it can be stopped and rerun.
+    Returns the number of assessments scored.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return 0
+
+    try:
+        scored = 0
+        last_id = 0
+        while True:
+            with conn.engine.begin() as connection:
+                last_id, chunk_scored = _score_unscored_chunk(connection, last_id, chunk_size)
+            if last_id is None:
+                return scored
+            scored += chunk_scored
+    except Exception as e:
+        st.error(f"Error scoring stored assessments: {e}")
+        return 0
+
+# Checkpoint name of rescore_assessments in job_checkpoints
+RESCORE_JOB = "rescore_assessments"
+
+# Stored JSON and label for every profile code, so a rescored row is a table lookup
+_PROFILE_SCORES_JSON = tuple(json.dumps(decode_profile(code)) for code in range(PROFILE_COUNT))
+_PROFILE_LABELS = tuple(entry.personality_label for entry in PROFILE_TABLE)
+
+def rescore_rows(rows, stored_scores):
+    """
+    Rescore (id, scores, personality_label, instrument_id, raw_responses, raw_responses_packed) rows.
+
+    stored_scores maps (assessment_id, category) to the stored (average, band).
+    Returns (updates, score_updates, changed, scored): (scores, label, id)
+    for rows whose scores or label changed, (id, category, average, band)
+    for score rows that differ from the stored ones, the number of rows with
+    either, and the number of rows whose answers could be scored.
+    """
+    updates = []
+    score_updates = []
+    changed = 0
+    scored = 0
+    # Each instrument's rows are unpacked and scored as one batch
+    for instrument_id, (row_indexes, matrix) in response_matrices([row[3:] for row in rows]).items():
+        batch = batch_calculate_scores(matrix, get_instrument(instrument_id))
+        scored += len(row_indexes)
+        if batch.categories == CATEGORY_NAMES:
+            rescored = [(_PROFILE_SCORES_JSON[code], _PROFILE_LABELS[code]) for code in encode_bands(batch.bands).tolist()]
+        else:
+            rescored = [(json.dumps(scores), get_personality_label(scores)) for scores in batch.to_dicts()]
+        for row_index, (scores_json, label), averages, bands in zip(
+                row_indexes.tolist(), rescored, batch.averages.tolist(), batch.bands.tolist()):
+            row_id, scores, personality_label = rows[row_index][:3]
+            # Averages can move without any band changing, so score rows are compared on their own
+            stale_scores = [(row_id, category, average, band)
+                            for category, average, band in category_scores(averages, bands, batch.categories)
+                            if stored_scores.get((row_id, category)) != (average, band)]
+            if (scores, personality_label) != (scores_json, label):
+                updates.append((scores_json, label, row_id))
+            elif not stale_scores:
+                continue
+            score_updates.extend(stale_scores)
+            changed += 1
+    return updates, score_updates, changed, scored
+
+def rescore_assessments(chunk_size=10000, restart=False, progress=None):
+    """
+    Rescore every assessment from its raw_responses after a scoring change.
+
+    Rows are read in id order with keyset pagination and scored a chunk at a
+    time. Rows whose scores or label changed, the assessment_scores rows whose
+    average or band differs from the stored one, and the job checkpoint are
+    written together in one transaction per chunk, so an interrupted run
+    resumes after the last committed chunk and the app keeps serving between
+    chunks. progress, if given, is called with the running stats after each
+    chunk; "updated" counts the assessments with any change. Raises on failure.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("No database connection available")
+
+    with conn.engine.begin() as connection:
+        if restart:
+            connection.exec_driver_sql("DELETE FROM job_checkpoints WHERE job = ?", (RESCORE_JOB,))
+        row = connection.exec_driver_sql("SELECT last_id FROM job_checkpoints WHERE job = ?", (RESCORE_JOB,)).fetchone()
+    last_id = row[0] if row else 0
+
+    stats = {"processed": 0, "updated": 0, "skipped": 0, "last_id": last_id, "seconds": 0.0, "rows_per_second": 0.0}
+    started = time.perf_counter()
+
+    while True:
+        with conn.engine.connect() as connection:
+            rows = connection.exec_driver_sql("""
+                SELECT id, scores, personality_label, instrument_id, raw_responses, raw_responses_packed
+                FROM assessment_results
+                WHERE id > ? ORDER BY id LIMIT ?
+            """, (last_id, chunk_size)).fetchall()
+            if not rows:
+                break
+            stored = connection.exec_driver_sql("""
+                SELECT assessment_id, category, average, band FROM assessment_scores
+                WHERE assessment_id BETWEEN ? AND ?
+            """, (rows[0][0], rows[-1][0])).fetchall()
+        updates, score_updates, changed, scored = rescore_rows(rows, {tuple(row[:2]): tuple(row[2:]) for row in stored})
+
+        last_id = rows[-1][0]
+        with conn.engine.begin() as connection:
+            if updates:
+                connection.exec_driver_sql(
+                    "UPDATE assessment_results SET scores = ?, personality_label = ? WHERE id = ?", updates)
+            if score_updates:
+                connection.exec_driver_sql("""
+                    INSERT INTO assessment_scores (assessment_id, category, average, band, created_at)
+                    SELECT ?, ?, ?, ?, created_at FROM assessment_results WHERE id = ?
+                    ON CONFLICT (assessment_id, category) DO UPDATE SET average = excluded.average, band = excluded.band
+                """, [score + score[:1] for score in score_updates])
+            connection.exec_driver_sql("""
+                INSERT INTO job_checkpoints (job, last_id, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (job) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+            """, (RESCORE_JOB, last_id))
+
+        if changed:
+            # Any cached lookup may hold one of the rows; rescoring is rare enough to drop them all
+            QUERY_CACHE.clear()
+
+        stats["processed"] += len(rows)
+        stats["updated"] += changed
+        stats["skipped"] += len(rows) - scored
+        stats["last_id"] = last_id
+        stats["seconds"] = time.perf_counter() - started
+        stats["rows_per_second"] = stats["processed"] / stats["seconds"] if stats["seconds"] else 0.0
+        if progress:
+            progress(stats)
+
+    # Finished: the next run starts from the beginning
+    with conn.engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM job_checkpoints WHERE job = ?", (RESCORE_JOB,))
+    return stats
+
+# Checkpoint name of dedupe_assessments in job_checkpoints
+DEDUPE_JOB = "dedupe_assessments"
+
+# How long after a row an identical one still counts as a repeat of the same submission
+DUPLICATE_WINDOW_MINUTES = 10
+
+def kept_duplicates(pairs):
+    """Map (duplicate id, earliest repeated id) pairs, in id order, to (duplicate id, kept id) by following chains."""
+    kept = {}
+    for duplicate_id, kept_id in pairs:
+        kept[duplicate_id] = kept.get(kept_id, kept_id)
+    return list(kept.items())
+
+def find_duplicates(connection, after_id, through_id, window_minutes):
+    """
+    (duplicate id, kept id) for the rows with ids in (after_id, through_id] that repeat an earlier row.
+
+    A repeat has the same child, email, instrument and answers as an earlier
+    row saved at most window_minutes before it; rows that both carry a
+    submission key are distinct submissions. Each duplicate maps to the
+    earliest row it repeats, following chains inside the range.
+    """
+    return kept_duplicates(connection.exec_driver_sql("""
+        SELECT d.id, MIN(k.id) FROM assessment_results d
+        JOIN assessment_results k
+          ON k.child_name = d.child_name
+         AND k.created_at BETWEEN datetime(d.created_at, ?) AND d.created_at
+         AND k.id < d.id
+         AND k.email IS d.email
+         AND k.instrument_id IS d.instrument_id
+         AND k.raw_responses = d.raw_responses
+         AND (k.submission_key IS NULL OR d.submission_key IS NULL)
+        WHERE d.id > ? AND d.id <= ?
+        GROUP BY d.id ORDER BY d.id
+    """, (f"-{int(window_minutes)} minutes", after_id, through_id)).fetchall())
+
+def _remove_duplicates(connection, duplicates):
+    """Point assignments at the kept rows, take the duplicates out of the norms and delete them."""
+    duplicate_ids = [duplicate_id for duplicate_id, _ in duplicates]
+    placeholders = ", ".join("?" * len(duplicate_ids))
+    rows = connection.exec_driver_sql(f"""
+        SELECT age, birth_year, instrument_id, raw_responses, raw_responses_packed
+        FROM assessment_results WHERE id IN ({placeholders})
+    """, tuple(duplicate_ids)).fetchall()
+    histograms = {}
+    accumulate_norm_rows(histograms, rows)
+    norm_rows = norm_table_rows(histograms)
+    if norm_rows:
+        connection.exec_driver_sql("""
+            UPDATE category_norms SET count = MAX(count - ?, 0)
+            WHERE cohort_type = ? AND cohort_value = ? AND category = ? AND bin = ?
+        """, [(count, cohort_type, cohort_value, category, bin_index)
+              for cohort_type, cohort_value, category, bin_index, count in norm_rows])
+
+    connection.exec_driver_sql("UPDATE profile_assignments SET assessment_id = ? WHERE assessment_id = ?",
+                               [(kept_id, duplicate_id) for duplicate_id, kept_id in duplicates])
+    # Triggers drop the duplicates' score rows and admin statistics
+    connection.exec_driver_sql("DELETE FROM assessment_results WHERE id = ?",
+                               [(duplicate_id,) for duplicate_id in duplicate_ids])
+
+def dedupe_assessments(chunk_size=10000, window_minutes=DUPLICATE_WINDOW_MINUTES, restart=False, dry_run=False,
+                       progress=None):
+    """
+    Delete assessments saved more than once, keeping the earliest of each.
+
+    Rows are read in id order with keyset pagination. Each chunk's duplicates
+    are found against the rows before them, then their assignments are moved
+    to the kept row, their norms bins decremented and the rows deleted in one
+    transaction with the job checkpoint, so an interrupted run resumes after
+    the last committed chunk. A dry run only counts. progress, if given, is
+    called with the running stats after each chunk. Raises on failure.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("No database connection available")
+
+    with conn.engine.begin() as connection:
+        if restart:
+            connection.exec_driver_sql("DELETE FROM job_checkpoints WHERE job = ?", (DEDUPE_JOB,))
+        row = connection.exec_driver_sql("SELECT last_id FROM job_checkpoints WHERE job = ?", (DEDUPE_JOB,)).fetchone()
+    last_id = row[0] if row and not dry_run else 0
+
+    stats = {"processed": 0, "removed": 0, "last_id": last_id, "seconds": 0.0, "rows_per_second": 0.0}
+    started = time.perf_counter()
+
+    while True:
+        with conn.engine.begin() as connection:
+            processed, through_id = connection.exec_driver_sql("""
+                SELECT COUNT(*), MAX(id) FROM (
+                    SELECT id FROM assessment_results WHERE id > ? ORDER BY id LIMIT ?
+                )
+            """, (last_id, chunk_size)).fetchone()
+            if not processed:
+                break
+
+            duplicates = find_duplicates(connection, last_id, through_id, window_minutes)
+            if not dry_run:
+                if duplicates:
+                    _remove_duplicates(connection, duplicates)
+                connection.exec_driver_sql("""
+                    INSERT INTO job_checkpoints (job, last_id, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (job) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+                """, (DEDUPE_JOB, through_id))
+        last_id = through_id
+
+        if duplicates and not dry_run:
+            # Any cached lookup may hold a deleted row or a moved assignment
+            QUERY_CACHE.clear()
+
+        stats["processed"] += processed
+        stats["removed"] += len(duplicates)
+        stats["last_id"] = last_id
+        stats["seconds"] = time.perf_counter() - started
+        stats["rows_per_second"] = stats["processed"] / stats["seconds"] if stats["seconds"] else 0.0
+        if progress:
+            progress(stats)
+
+    # Finished: the next run starts from the beginning
+    if not dry_run:
+        with conn.engine.begin() as connection:
+            connection.exec_driver_sql("DELETE FROM job_checkpoints WHERE job = ?", (DEDUPE_JOB,))
+    return stats
+
+# Period keys get_category_trends groups by, as strftime formats
+TREND_PERIODS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+
+def timestamp_bound(value):
+    """A date or time bound as UTC text in the stored created_at format."""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
+def score_filters(since=None, until=None, teacher_id=None, school=None, placeholder="?"):
+    """
+    Joins, WHERE clause and parameters narrowing assessment_scores (aliased s) for the rollups.
+
+    since and until bound created_at, until exclusive. teacher_id and school keep
+    the assessments submitted through that teacher's or school's assignments.
+    """
+    joins, conditions, params = [], [], []
+    if teacher_id is not None or school is not None:
+        joins.append("JOIN profile_assignments pa ON pa.assessment_id = s.assessment_id")
+    if teacher_id is not None:
+        conditions.append(f"pa.teacher_id = {placeholder}")
+        params.append(teacher_id)
+    if school is not None:
+        joins.append("JOIN teachers t ON t.id = pa.teacher_id")
+        conditions.append(f"t.school = {placeholder}")
+        params.append(school)
+    if since is not None:
+        conditions.append(f"s.created_at >= {placeholder}")
+        params.append(timestamp_bound(since))
+    if until is not None:
+        conditions.append(f"s.created_at < {placeholder}")
+        params.append(timestamp_bound(until))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return " ".join(joins), where, params
+
+# Per-band counts of a GROUP BY over assessment_scores
+BAND_COUNT_COLUMNS = ", ".join(
+    f"SUM(CASE WHEN s.band = {code} THEN 1 ELSE 0 END) AS {label.lower()}" for code, label in enumerate(BAND_LABELS))
+
+def band_count_table(rows):
+    """{category: {band label: count}} from (category, band code, count) rows, every band present."""
+    counts = {}
+    for category, band, count in rows:
+        counts.setdefault(category, dict.fromkeys(BAND_LABELS, 0))[BAND_LABELS[band]] = int(count)
+    return counts
+
+def get_band_counts(since=None, until=None, teacher_id=None, school=None):
+    """
+    Count assessments in each band of each category, e.g. how many are High in
+    Collaboration this month for one school.
+
+    Grouped in SQL over assessment_scores; see score_filters for the arguments.
+    Returns {category: {"Low": n, "Medium": n, "High": n}}.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return {}
+
+    try:
+        joins, where, params = score_filters(since, until, teacher_id, school)
+        with conn.engine.connect() as connection:
+            rows = connection.exec_driver_sql(f"""
+                SELECT s.category, s.band, COUNT(*) FROM assessment_scores s {joins} {where}
+                GROUP BY s.category, s.band
+            """, tuple(params)).fetchall()
+        return band_count_table(rows)
+    except Exception as e:
+        st.error(f"Error counting score bands: {e}")
+        return {}
+
+def get_category_trends(period="month", since=None, until=None, teacher_id=None, school=None):
+    """
+    Per period ("day", "month" or "year") and category: the number of
+    assessments, their mean category average and the count in each band.
+
+    Grouped in SQL over assessment_scores; see score_filters for the other
+    arguments. Returns dicts with period, category, assessments, average, low,
+    medium and high, ordered by period then category. Raises ValueError for an
+    unknown period.
+    """
+    if period not in TREND_PERIODS:
+        raise ValueError(f"Unknown trend period: {period!r}")
+    conn = get_db_connection()
+    if not conn:
+        return []
+
+    try:
+        joins, where, params = score_filters(since, until, teacher_id, school)
+        with conn.engine.connect() as connection:
+            rows = connection.exec_driver_sql(f"""
+                SELECT strftime('{TREND_PERIODS[period]}', s.created_at) AS period, s.category,
+                       COUNT(*) AS assessments, AVG(s.average) AS average, {BAND_COUNT_COLUMNS}
+                FROM assessment_scores s {joins} {where}
+                GROUP BY period, s.category ORDER BY period, s.category
+            """, tuple(params)).mappings().all()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        st.error(f"Error computing category trends: {e}")
+        return []
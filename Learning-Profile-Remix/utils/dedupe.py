@@ -0,0 +1,52 @@
+"""
+Duplicate Assessment Cleanup
+Compacts assessment_results rows saved more than once by double clicks and
+reruns before submissions carried a submission key, streaming the table in
+resumable chunks through the storage backend DATABASE_URL selects
+
+Run with: python -m utils.dedupe [--chunk-size N] [--window-minutes M] [--restart] [--dry-run]
+"""
+
+import argparse
+from typing import Callable, Dict, Optional
+
+from utils.database import DUPLICATE_WINDOW_MINUTES, QUERY_CACHE
+from utils.storage import Storage, open_storage
+
+
+def _print_progress(stats: Dict[str, float]) -> None:
+    print(f"{stats['processed']} rows ({stats['removed']} duplicates) "
+          f"through id {stats['last_id']} at {stats['rows_per_second']:.0f} rows/s")
+
+
+def dedupe_assessments(chunk_size: int = 10000, window_minutes: int = DUPLICATE_WINDOW_MINUTES, restart: bool = False,
+                       dry_run: bool = False,
+                       progress: Optional[Callable[[Dict[str, float]], None]] = _print_progress,
+                       storage: Optional[Storage] = None) -> Dict[str, float]:
+    """Delete repeated assessments in storage, by default the backend DATABASE_URL selects; see Storage.dedupe_assessments."""
+    storage = storage or open_storage()
+    return storage.dedupe_assessments(chunk_size=chunk_size, window_minutes=window_minutes, restart=restart,
+                                      dry_run=dry_run, progress=progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete assessments saved more than once by repeated submissions.")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows checked and cleaned per transaction")
+    parser.add_argument("--window-minutes", type=int, default=DUPLICATE_WINDOW_MINUTES,
+                        help="how far apart identical rows may be saved and still count as one submission")
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint and start from the first row")
+    parser.add_argument("--dry-run", action="store_true", help="count the duplicates without deleting them")
+    args = parser.parse_args()
+
+    stats = dedupe_assessments(chunk_size=args.chunk_size, window_minutes=args.window_minutes, restart=args.restart,
+                               dry_run=args.dry_run)
+    verb = "Found" if args.dry_run else "Removed"
+    print(f"Done: {verb} {stats['removed']} duplicates in {stats['processed']} rows in {stats['seconds']:.2f}s")
+    if stats["removed"] and not args.dry_run:
+        # This process's cache is not the app's; running app processes drop their entries as they expire
+        print(f"Running app processes stop showing the duplicates within {QUERY_CACHE.ttl:g}s, "
+              f"as their cached lookups expire")
+
+
+if __name__ == "__main__":
+    main()
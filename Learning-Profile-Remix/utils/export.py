@@ -0,0 +1,166 @@
+"""
+Data Export
+Streams assessment_results to a CSV, JSON Lines or Parquet temp file one chunk
+at a time, with the scores JSON flattened into a column per category
+"""
+
+import os
+import tempfile
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Union
+
+import pandas as pd
+from streamlit.runtime.media_file_manager import MediaFileManager
+
+from utils.instruments import INSTRUMENTS
+from utils.records import decode_json_column
+from utils.storage import get_storage
+
+
+class ExportFormat(NamedTuple):
+    label: str
+    suffix: str
+    mime: str
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "csv": ExportFormat("CSV", ".csv", "text/csv"),
+    "jsonl": ExportFormat("JSON Lines", ".jsonl", "application/jsonl"),
+    "parquet": ExportFormat("Parquet", ".parquet", "application/vnd.apache.parquet"),
+}
+
+# Rows read and written per chunk; memory use is bounded by this, not the table size
+DEFAULT_CHUNK_SIZE = 10000
+
+# Streamlit releases that take a callable as download_button data run it only when the button is clicked
+DEFERRED_DOWNLOADS = hasattr(MediaFileManager, "add_deferred")
+
+# Leading rows kept for the on-page preview
+PREVIEW_ROWS = 50
+
+# Column types fixed up front so every chunk, and an empty export, has the same schema
+COLUMN_TYPES = {
+    "id": "Int64",
+    "child_name": "string",
+    "age": "Int64",
+    "birth_month": "Int64",
+    "birth_year": "Int64",
+    "email": "string",
+    "personality_label": "string",
+    "instrument_id": "string",
+    "created_at": "string",
+}
+
+
+class ExportResult(NamedTuple):
+    """A finished export: the temp file, its format, the row count and the first rows."""
+    path: str
+    export_format: str
+    rows: int
+    preview: pd.DataFrame
+
+    @property
+    def size(self) -> int:
+        """Bytes in the export file, or 0 once it has been removed."""
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def download_data(self) -> Union[Callable[[], bytes], bytes]:
+        """
+        The data for st.download_button.
+
+        Where Streamlit supports deferred downloads the file is read only when
+        the button is clicked; otherwise it is read for this run only. Either
+        way the bytes are never kept in session state.
+        """
+        def read() -> bytes:
+            with open(self.path, "rb") as export_file:
+                return export_file.read()
+        return read if DEFERRED_DOWNLOADS else read()
+
+    def discard(self) -> None:
+        """Remove the export file, if it is still there."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def category_columns() -> List[str]:
+    """Score columns of the export: every registered instrument's categories, first seen first."""
+    columns = []
+    for instrument in INSTRUMENTS.values():
+        columns.extend(category for category in instrument.question_bank.categories if category not in columns)
+    return columns
+
+
+def empty_export(categories: List[str]) -> pd.DataFrame:
+    columns = {column: pd.Series(dtype=dtype) for column, dtype in COLUMN_TYPES.items()}
+    columns.update({category: pd.Series(dtype="string") for category in categories})
+    return pd.DataFrame(columns)
+
+
+def flatten_scores(chunk: pd.DataFrame, categories: List[str]) -> pd.DataFrame:
+    """
+    Replace a chunk's scores JSON with one column per category.
+
+    Stored scores repeat heavily (there are only so many band combinations), so
+    each distinct JSON string is decoded once and the columns are filled by
+    reindexing that small table. Categories an assessment lacks are left empty.
+    """
+    distinct = chunk["scores"].dropna().unique()
+    decoded = [decode_json_column(text, {}) for text in distinct]
+    lookup = pd.DataFrame([scores if isinstance(scores, dict) else {} for scores in decoded],
+                          index=distinct, columns=categories)
+    flat = chunk.drop(columns="scores").astype(COLUMN_TYPES)
+    scores = lookup.reindex(chunk["scores"]).set_axis(chunk.index)
+    return pd.concat([flat, scores.astype("string")], axis=1)
+
+
+def export_assessments(export_format: str, chunk_size: int = DEFAULT_CHUNK_SIZE, directory: Optional[str] = None,
+                       chunks: Optional[Iterable[pd.DataFrame]] = None) -> ExportResult:
+    """
+    Write every assessment to a temp file in export_format ("csv", "jsonl" or "parquet").
+
+    Reads chunk_size rows at a time from the storage backend unless chunks is
+    given. The caller owns the file and removes it when done. Raises ValueError
+    for an unknown format, or for Parquet when pyarrow is not installed; the
+    partial file is removed if the export fails.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format!r}")
+    if export_format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow; choose CSV or JSON Lines instead") from None
+
+    categories = category_columns()
+    fd, path = tempfile.mkstemp(prefix="assessments_", suffix=EXPORT_FORMATS[export_format].suffix, dir=directory)
+    rows = 0
+    preview = None
+    try:
+        with os.fdopen(fd, "wb") as output:
+            writer = None
+            if export_format == "parquet":
+                schema = pa.Schema.from_pandas(empty_export(categories), preserve_index=False)
+                writer = pq.ParquetWriter(output, schema)
+            for chunk in (chunks if chunks is not None else get_storage().iter_assessment_chunks(chunk_size)):
+                flat = flatten_scores(chunk, categories)
+                if preview is None:
+                    preview = flat.head(PREVIEW_ROWS)
+                elif len(preview) < PREVIEW_ROWS:
+                    preview = pd.concat([preview, flat.head(PREVIEW_ROWS - len(preview))], ignore_index=True)
+                if export_format == "csv":
+                    output.write(flat.to_csv(header=rows == 0, index=False).encode())
+                elif export_format == "jsonl":
+                    output.write(flat.to_json(orient="records", lines=True, force_ascii=False).encode())
+                else:
+                    writer.write_table(pa.Table.from_pandas(flat, schema=schema, preserve_index=False))
+                rows += len(flat)
+            if export_format == "csv" and rows == 0:
+                output.write(empty_export(categories).to_csv(index=False).encode())
+            if writer is not None:
+                writer.close()
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    return ExportResult(path, export_format, rows, preview if preview is not None else empty_export(categories))
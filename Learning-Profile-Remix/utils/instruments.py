@@ -0,0 +1,86 @@
+"""
+Instrument Registry
+Versioned question banks, each compiled once into the matrices and thresholds
+the batch scoring engine needs
+"""
+
+from typing import Dict, Mapping, NamedTuple, Optional
+
+import numpy as np
+
+from utils.questions import QUESTIONS, LIKERT_SCALE, CATEGORIES, QUESTION_BANK, QuestionBank
+
+# Category averages at or below these thresholds fall into the lower band
+LOW_THRESHOLD = 2.5
+MEDIUM_THRESHOLD = 3.75
+
+DEFAULT_INSTRUMENT_ID = "k-readiness-v1"
+
+
+class Instrument(NamedTuple):
+    """A compiled question bank: lookups, question x category matrix and band thresholds."""
+    instrument_id: str
+    name: str
+    question_bank: QuestionBank
+    likert_scale: Mapping[str, int]
+    low_threshold: float
+    medium_threshold: float
+    category_matrix: np.ndarray
+    valid_values: np.ndarray
+
+
+def build_category_matrix(question_bank: QuestionBank) -> np.ndarray:
+    """Build the question x category membership matrix (1 where a question belongs to a category)."""
+    matrix = np.zeros((len(question_bank.ids), len(question_bank.categories)), dtype=np.int32)
+    for q_id in question_bank.ids:
+        matrix[question_bank.position(q_id), question_bank.category_code_of(q_id)] = 1
+    matrix.setflags(write=False)
+    return matrix
+
+
+def compile_instrument(instrument_id, name, questions, categories, likert_scale,
+                       low_threshold=LOW_THRESHOLD, medium_threshold=MEDIUM_THRESHOLD,
+                       question_bank=None) -> Instrument:
+    """Compile a question list into an Instrument ready for batch scoring."""
+    if not low_threshold < medium_threshold:
+        raise ValueError("low_threshold must be below medium_threshold")
+    question_bank = question_bank or QuestionBank(questions, categories)
+    valid_values = np.array(sorted(set(likert_scale.values())), dtype=np.int8)
+    if valid_values.size == 0 or valid_values.min() < 1:
+        raise ValueError("Likert values must be positive (0 marks an unanswered question)")
+    valid_values.setflags(write=False)
+    return Instrument(
+        instrument_id=instrument_id,
+        name=name,
+        question_bank=question_bank,
+        likert_scale=dict(likert_scale),
+        low_threshold=low_threshold,
+        medium_threshold=medium_threshold,
+        category_matrix=build_category_matrix(question_bank),
+        valid_values=valid_values,
+    )
+
+
+INSTRUMENTS: Dict[str, Instrument] = {}
+
+
+def register_instrument(instrument: Instrument) -> Instrument:
+    """Add a compiled instrument to the registry; ids are never reused."""
+    if instrument.instrument_id in INSTRUMENTS:
+        raise ValueError(f"Instrument {instrument.instrument_id!r} is already registered")
+    INSTRUMENTS[instrument.instrument_id] = instrument
+    return instrument
+
+
+def get_instrument(instrument_id: Optional[str] = None) -> Instrument:
+    """Look up a registered instrument; None means the default instrument."""
+    try:
+        return INSTRUMENTS[instrument_id or DEFAULT_INSTRUMENT_ID]
+    except KeyError:
+        raise ValueError(f"Unknown instrument: {instrument_id!r}") from None
+
+
+register_instrument(compile_instrument(
+    DEFAULT_INSTRUMENT_ID, "Kindergarten readiness (v1)",
+    QUESTIONS, CATEGORIES, LIKERT_SCALE, question_bank=QUESTION_BANK,
+))
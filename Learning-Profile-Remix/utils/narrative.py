@@ -0,0 +1,146 @@
+"""
+Results Narrative Builder
+Builds the written results description as plain data, with no Streamlit calls,
+so it can be cached and reused by the results page, emails and background jobs
+"""
+
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils.profiles import encode_profile, decode_profile
+from utils.scoring import get_category_description, get_age_appropriate_activities
+
+VALID_SCORES = {"High", "Medium", "Low"}
+
+# Placeholders for the child's name, filled in after the cached template is built
+_NAME_MID = "{child}"
+_NAME_START = "{Child}"
+
+
+class NarrativeSection(NamedTuple):
+    """One heading of the description with its sentences and per-category activity bullets."""
+    kind: str
+    heading: str
+    sentences: Tuple[str, ...]
+    activity_intro: Optional[str]
+    activities: Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+class Narrative(NamedTuple):
+    """Ordered sections of a results description."""
+    sections: Tuple[NarrativeSection, ...]
+
+
+def get_age_bucket(age):
+    """Group ages that share the same activities (None when no age was given)."""
+    if not age:
+        return None
+    return "young"  # Activities are written for ages 4-5
+
+
+def _join_categories(categories):
+    """Format categories as a bold, comma-separated list with descriptions."""
+    items = [f"**{cat}** ({get_category_description(cat)})" for cat in categories]
+    if len(items) == 2:
+        return " and ".join(items)
+    if len(items) > 2:
+        return ", ".join(items[:-1]) + ", and " + items[-1]
+    return items[0]
+
+
+def _activities_for(categories, age_bucket):
+    # Activities only vary by age bucket, so the bucket stands in for the age
+    if not age_bucket:
+        return ()
+    return tuple((cat, tuple(get_age_appropriate_activities(cat, age_bucket))) for cat in categories)
+
+
+def _build_template(scores, age_bucket):
+    """Build the narrative with name placeholders for a validated scores dict."""
+    strengths = [cat for cat, score in scores.items() if score == "High"]
+    developing = [cat for cat, score in scores.items() if score == "Medium"]
+    growth_areas = [cat for cat, score in scores.items() if score == "Low"]
+
+    sections = []
+    if strengths:
+        sections.append(NarrativeSection(
+            kind="strengths",
+            heading=f"{_NAME_START}'s Superpowers!",
+            sentences=(f"Wow! {_NAME_START} shows amazing abilities in {_join_categories(strengths)}! These natural talents make them truly special and can help them soar in their learning journey! 🌟",),
+            activity_intro="Here are some fun ways to celebrate these superpowers:" if age_bucket else None,
+            activities=_activities_for(strengths, age_bucket),
+        ))
+
+    if developing:
+        sections.append(NarrativeSection(
+            kind="developing",
+            heading="Growing Strengths",
+            sentences=(f"{_NAME_START} is making great progress in {_join_categories(developing)}. These skills are like seeds that are starting to sprout! With a little care and practice, they'll grow into new superpowers! 🌱",),
+            activity_intro="Try these fun activities to help these skills grow:" if age_bucket else None,
+            activities=_activities_for(developing, age_bucket),
+        ))
+
+    if growth_areas:
+        sections.append(NarrativeSection(
+            kind="growth",
+            heading="Adventure Areas",
+            sentences=(f"Every superhero has new powers to discover! Let's explore how {_NAME_MID} can grow in {_join_categories(growth_areas)} through these fun activities:",),
+            activity_intro=None,
+            activities=_activities_for(growth_areas, age_bucket),
+        ))
+
+    return Narrative(sections=tuple(sections))
+
+
+@lru_cache(maxsize=2048)
+def _cached_template(profile_code, age_bucket):
+    return _build_template(decode_profile(profile_code), age_bucket)
+
+
+def _fill_name(text, child_name):
+    child_text = child_name if child_name else "your child"  # lowercase for mid-sentence
+    sentence_start_text = child_name if child_name else "Your child"  # Capitalized for sentence starts
+    return text.replace(_NAME_START, sentence_start_text).replace(_NAME_MID, child_text)
+
+
+def build_narrative(scores: Dict[str, str], child_name: Optional[str] = None, age: Optional[int] = None) -> Narrative:
+    """
+    Build the results description for a scores dict.
+
+    Templates are cached per (profile code, age bucket); the child's name is
+    filled in afterwards. Raises ValueError for missing or invalid scores.
+    """
+    if not isinstance(scores, dict) or not scores:
+        raise ValueError("Invalid scores provided")
+    if not all(score in VALID_SCORES for score in scores.values()):
+        raise ValueError("Invalid score values detected")
+
+    age_bucket = get_age_bucket(age)
+    profile_code = encode_profile(scores)
+    if profile_code is not None:
+        template = _cached_template(profile_code, age_bucket)
+    else:
+        template = _build_template(scores, age_bucket)
+
+    return Narrative(sections=tuple(
+        section._replace(
+            heading=_fill_name(section.heading, child_name),
+            sentences=tuple(_fill_name(sentence, child_name) for sentence in section.sentences),
+        )
+        for section in template.sections
+    ))
+
+
+def narrative_to_markdown(narrative: Narrative) -> str:
+    """Render a narrative as Markdown text for emails, exports and reports."""
+    lines: List[str] = []
+    for section in narrative.sections:
+        lines.append(f"### {section.heading}")
+        lines.extend(section.sentences)
+        if section.activity_intro:
+            lines.append(section.activity_intro)
+        for category, activities in section.activities:
+            lines.append(f"\n**{category}:**")
+            lines.extend(f"• {activity}" for activity in activities)
+        lines.append("")
+    return "\n".join(lines)
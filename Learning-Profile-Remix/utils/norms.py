@@ -0,0 +1,117 @@
+"""
+Population Norms
+Fixed-bin histograms of category averages per cohort, used to place a child among peers
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.batch_scoring import CATEGORY_NAMES, batch_calculate_scores
+
+# Category averages range from 1 to 5; 16 bins of width 0.25
+NORM_MIN = 1.0
+NORM_MAX = 5.0
+NORM_BIN_WIDTH = 0.25
+NORM_BIN_COUNT = int((NORM_MAX - NORM_MIN) / NORM_BIN_WIDTH)
+
+# Smallest cohort we are willing to report percentiles against
+MIN_COHORT_SIZE = 30
+
+# Cohorts each assessment is counted in; "all" uses cohort value 0
+COHORT_TYPES = ("all", "age", "birth_year")
+
+CohortKey = Tuple[str, int]
+
+
+def averages_to_bins(averages: np.ndarray) -> np.ndarray:
+    """Map category averages to bin indexes; NaN (unanswered) maps to -1."""
+    averages = np.asarray(averages, dtype=float)
+    bins = np.full(averages.shape, -1, dtype=np.int16)
+    answered = ~np.isnan(averages)
+    scaled = np.floor((averages[answered] - NORM_MIN) / NORM_BIN_WIDTH)
+    bins[answered] = np.clip(scaled, 0, NORM_BIN_COUNT - 1)
+    return bins
+
+
+def get_cohort_keys(age: Optional[int] = None, birth_year: Optional[int] = None) -> List[CohortKey]:
+    """Return the cohorts an assessment belongs to, broadest first."""
+    keys = [("all", 0)]
+    if age is not None:
+        keys.append(("age", int(age)))
+    if birth_year is not None:
+        keys.append(("birth_year", int(birth_year)))
+    return keys
+
+
+def histogram_rows(averages: np.ndarray, age: Optional[int] = None, birth_year: Optional[int] = None,
+                   categories: Tuple[str, ...] = CATEGORY_NAMES) -> List[Tuple[str, int, str, int]]:
+    """(cohort_type, cohort_value, category, bin) rows to increment for one assessment's averages."""
+    bins = averages_to_bins(averages)
+    return [
+        (cohort_type, cohort_value, category, int(bin_index))
+        for cohort_type, cohort_value in get_cohort_keys(age, birth_year)
+        for category, bin_index in zip(categories, bins)
+        if bin_index >= 0
+    ]
+
+
+def accumulate_histograms(histograms: Dict[Tuple[str, int, str], np.ndarray], averages: np.ndarray,
+                          ages: np.ndarray, birth_years: np.ndarray,
+                          categories: Tuple[str, ...] = CATEGORY_NAMES) -> None:
+    """
+    Add a chunk of assessments (N x categories averages) into histograms in place.
+
+    ages and birth_years are float arrays with NaN where unknown.
+    """
+    bins = averages_to_bins(averages)
+    cohorts = [("all", np.zeros(len(bins)))] + [("age", ages), ("birth_year", birth_years)]
+    for cohort_type, values in cohorts:
+        known = ~np.isnan(values)
+        for cohort_value in np.unique(values[known]).astype(int):
+            rows = bins[known & (values == cohort_value)]
+            for col, category in enumerate(categories):
+                column = rows[:, col]
+                counts = np.bincount(column[column >= 0], minlength=NORM_BIN_COUNT)
+                key = (cohort_type, int(cohort_value), category)
+                if key in histograms:
+                    histograms[key] += counts
+                else:
+                    histograms[key] = counts.astype(np.int64)
+
+
+def percentile_from_histogram(counts: np.ndarray, average: float) -> Optional[float]:
+    """Mid-rank percentile of an average within a histogram, or None if it is empty."""
+    total = counts.sum()
+    if total == 0 or np.isnan(average):
+        return None
+    bin_index = int(averages_to_bins(np.array([average]))[0])
+    below = counts[:bin_index].sum()
+    return float(100.0 * (below + 0.5 * counts[bin_index]) / total)
+
+
+def peer_percentiles(responses: Dict[int, int], age: Optional[int], birth_year: Optional[int],
+                     get_histograms: Callable[[str, int], Dict[str, np.ndarray]]) -> Tuple[Optional[str], Dict[str, float]]:
+    """
+    Each category's percentile among peers, from histograms fetched with get_histograms(cohort_type, cohort_value).
+
+    Uses the narrowest cohort (birth year, then age, then everyone) with at least
+    MIN_COHORT_SIZE assessments. Returns (cohort_type, {category: percentile}).
+    """
+    try:
+        averages = batch_calculate_scores([responses]).averages[0]
+    except ValueError:
+        return None, {}
+
+    for cohort_type, cohort_value in reversed(get_cohort_keys(age, birth_year)):
+        histograms = get_histograms(cohort_type, cohort_value)
+        if not histograms or max(counts.sum() for counts in histograms.values()) < MIN_COHORT_SIZE:
+            continue
+        percentiles = {}
+        for category, average in zip(CATEGORY_NAMES, averages):
+            if category in histograms:
+                percentile = percentile_from_histogram(histograms[category], average)
+                if percentile is not None:
+                    percentiles[category] = percentile
+        return cohort_type, percentiles
+    return None, {}
@@ -0,0 +1,1092 @@
+"""
+PostgreSQL Storage
+The Storage backend for a PostgreSQL server, so several app processes can share
+one database: a bounded psycopg2 connection pool, server-side cursors for the
+full-table reads and COPY for bulk loads
+"""
+
+import csv
+import io
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import psycopg2.extras
+import psycopg2.pool
+import streamlit as st
+
+from utils.database import (ACTIVITY_DAYS, BAND_COUNT_COLUMNS, DEDUPE_JOB, DUPLICATE_WINDOW_MINUTES, MAX_PAGE_SIZE,
+                            QUERY_CACHE, RESCORE_JOB, SCORE_CHUNK_SIZE, _assessment_row, _assessment_tags, _page,
+                            accumulate_norm_rows, assessment_score_rows, band_count_table, daily_activity,
+                            decode_cursor, kept_duplicates, norm_table_rows, packed_updates, rescore_rows,
+                            score_filters, unsaved_submissions)
+from utils.instruments import DEFAULT_INSTRUMENT_ID
+from utils.norms import NORM_BIN_COUNT
+from utils.records import AssessmentRecord, AssignmentRecord, TeacherRecord
+from utils.storage import Storage
+
+# Connections the pool keeps open, and the most it opens; callers beyond the
+# maximum wait up to POOL_TIMEOUT seconds for one to be returned
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 10
+POOL_TIMEOUT = 30.0
+
+# Key of the advisory lock held while a migration is applied
+MIGRATION_LOCK_KEY = 0x4C50
+
+# Timestamps are returned as text in SQLite's CURRENT_TIMESTAMP format, so records,
+# page cursors and exports look the same on both backends
+TIMESTAMP_FORMAT = "YYYY-MM-DD HH24:MI:SS"
+
+# Columns are TIMESTAMP(0) in UTC: whole seconds, like SQLite, so a page cursor's
+# text timestamp compares exactly
+NOW_UTC = "(now() AT TIME ZONE 'UTC')"
+
+ASSESSMENT_COLUMNS = f"""
+    id, child_name, age, scores, personality_label, raw_responses, email, birth_month, birth_year, instrument_id,
+    to_char(created_at, '{TIMESTAMP_FORMAT}') AS created_at"""
+
+ASSIGNMENT_COLUMNS = f"""
+    pa.id, pa.teacher_id, pa.parent_email, pa.child_name, pa.assignment_token, pa.status, pa.assessment_id,
+    to_char(pa.assigned_at, '{TIMESTAMP_FORMAT}') AS assigned_at,
+    to_char(pa.completed_at, '{TIMESTAMP_FORMAT}') AS completed_at,
+    to_char(pa.assigned_at, '{TIMESTAMP_FORMAT}') AS assigned_at_formatted,
+    to_char(pa.completed_at, '{TIMESTAMP_FORMAT}') AS completed_at_formatted"""
+
+EXPORT_QUERY = f"""
+    SELECT id, child_name, age, birth_month, birth_year, email, personality_label, scores, instrument_id,
+           to_char(created_at, '{TIMESTAMP_FORMAT}') AS created_at
+    FROM assessment_results ORDER BY id
+"""
+EXPORT_COLUMNS = ["id", "child_name", "age", "birth_month", "birth_year", "email", "personality_label", "scores",
+                  "instrument_id", "created_at"]
+
+# to_char formats of the periods get_category_trends groups by
+TREND_PERIODS = {"day": "YYYY-MM-DD", "month": "YYYY-MM", "year": "YYYY"}
+
+SCORE_COLUMNS = ("assessment_id", "category", "average", "band", "created_at")
+
+_BASELINE_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS assessment_results (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        child_name TEXT,
+        age INTEGER,
+        scores TEXT,
+        personality_label TEXT,
+        raw_responses TEXT,
+        email TEXT,
+        created_at TIMESTAMP(0) DEFAULT {NOW_UTC},
+        birth_month INTEGER,
+        birth_year INTEGER,
+        instrument_id TEXT,
+        raw_responses_packed BYTEA
+    );
+    CREATE TABLE IF NOT EXISTS teachers (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        email TEXT UNIQUE NOT NULL,
+        name TEXT NOT NULL,
+        school TEXT,
+        grade_level TEXT,
+        ambassador_status BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP(0) DEFAULT {NOW_UTC}
+    );
+    CREATE TABLE IF NOT EXISTS profile_assignments (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        teacher_id BIGINT REFERENCES teachers(id) ON DELETE CASCADE,
+        parent_email TEXT NOT NULL,
+        child_name TEXT,
+        assignment_token TEXT UNIQUE NOT NULL,
+        status TEXT DEFAULT 'sent',
+        assessment_id BIGINT REFERENCES assessment_results(id) ON DELETE SET NULL,
+        assigned_at TIMESTAMP(0) DEFAULT {NOW_UTC},
+        completed_at TIMESTAMP(0)
+    );
+    CREATE TABLE IF NOT EXISTS category_norms (
+        cohort_type TEXT NOT NULL,
+        cohort_value INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        bin INTEGER NOT NULL,
+        count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (cohort_type, cohort_value, category, bin)
+    );
+    CREATE TABLE IF NOT EXISTS job_checkpoints (
+        job TEXT PRIMARY KEY,
+        last_id BIGINT NOT NULL,
+        updated_at TIMESTAMP(0) DEFAULT {NOW_UTC}
+    );
+
+    -- The UNIQUE constraint already indexes assignment_token
+    CREATE INDEX IF NOT EXISTS idx_assignments_parent_email ON profile_assignments(parent_email);
+    CREATE INDEX IF NOT EXISTS idx_assignments_teacher_assigned ON profile_assignments(teacher_id, assigned_at);
+    CREATE INDEX IF NOT EXISTS idx_assignments_assessment ON profile_assignments(assessment_id);
+    CREATE INDEX IF NOT EXISTS idx_assessments_email_created ON assessment_results(email, created_at);
+    CREATE INDEX IF NOT EXISTS idx_assessments_child_created ON assessment_results(child_name, created_at);
+
+    CREATE TABLE IF NOT EXISTS stat_counters (name TEXT PRIMARY KEY, value BIGINT NOT NULL DEFAULT 0);
+    CREATE TABLE IF NOT EXISTS stat_children (child_name TEXT PRIMARY KEY, count BIGINT NOT NULL);
+    CREATE TABLE IF NOT EXISTS stat_accounts (email TEXT PRIMARY KEY, count BIGINT NOT NULL);
+    CREATE TABLE IF NOT EXISTS stat_daily_assessments (day TEXT PRIMARY KEY, count BIGINT NOT NULL);
+
+    -- Count one assessment into (delta = 1) or out of (delta = -1) the admin statistics
+    CREATE OR REPLACE FUNCTION stats_count_assessment(child TEXT, account TEXT, created TIMESTAMP, delta INTEGER)
+    RETURNS void LANGUAGE plpgsql AS $$
+    DECLARE
+        remaining BIGINT;
+    BEGIN
+        UPDATE stat_counters SET value = value + delta WHERE name = 'total_assessments';
+        IF child IS NOT NULL THEN
+            IF delta > 0 THEN
+                INSERT INTO stat_children AS s (child_name, count) VALUES (child, 1)
+                    ON CONFLICT (child_name) DO UPDATE SET count = s.count + 1 RETURNING s.count INTO remaining;
+                IF remaining = 1 THEN
+                    UPDATE stat_counters SET value = value + 1 WHERE name = 'unique_children';
+                END IF;
+            ELSE
+                UPDATE stat_children SET count = count - 1 WHERE child_name = child RETURNING count INTO remaining;
+                IF remaining = 0 THEN
+                    DELETE FROM stat_children WHERE child_name = child;
+                    UPDATE stat_counters SET value = value - 1 WHERE name = 'unique_children';
+                END IF;
+            END IF;
+        END IF;
+        IF account IS NOT NULL THEN
+            IF delta > 0 THEN
+                INSERT INTO stat_accounts AS s (email, count) VALUES (account, 1)
+                    ON CONFLICT (email) DO UPDATE SET count = s.count + 1 RETURNING s.count INTO remaining;
+                IF remaining = 1 THEN
+                    UPDATE stat_counters SET value = value + 1 WHERE name = 'unique_accounts';
+                END IF;
+            ELSE
+                UPDATE stat_accounts SET count = count - 1 WHERE email = account RETURNING count INTO remaining;
+                IF remaining = 0 THEN
+                    DELETE FROM stat_accounts WHERE email = account;
+                    UPDATE stat_counters SET value = value - 1 WHERE name = 'unique_accounts';
+                END IF;
+            END IF;
+        END IF;
+        IF created IS NOT NULL THEN
+            INSERT INTO stat_daily_assessments AS s (day, count) VALUES (to_char(created, 'YYYY-MM-DD'), delta)
+                ON CONFLICT (day) DO UPDATE SET count = s.count + delta;
+        END IF;
+    END $$;
+
+    CREATE OR REPLACE FUNCTION trg_stats_assessment() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM stats_count_assessment(OLD.child_name, OLD.email, OLD.created_at, -1);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM stats_count_assessment(NEW.child_name, NEW.email, NEW.created_at, 1);
+        END IF;
+        RETURN NULL;
+    END $$;
+
+    -- Teacher and assignment totals move once per statement, so a COPY of a whole roster is one update
+    CREATE OR REPLACE FUNCTION trg_stats_inserted() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE stat_counters SET value = value + (SELECT COUNT(*) FROM changed_rows) WHERE name = TG_ARGV[0];
+        RETURN NULL;
+    END $$;
+    CREATE OR REPLACE FUNCTION trg_stats_deleted() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE stat_counters SET value = value - (SELECT COUNT(*) FROM changed_rows) WHERE name = TG_ARGV[0];
+        RETURN NULL;
+    END $$;
+
+    CREATE OR REPLACE TRIGGER trg_stats_assessment
+        AFTER INSERT OR DELETE OR UPDATE OF child_name, email, created_at ON assessment_results
+        FOR EACH ROW EXECUTE FUNCTION trg_stats_assessment();
+    CREATE OR REPLACE TRIGGER trg_stats_teacher_insert AFTER INSERT ON teachers
+        REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION trg_stats_inserted('total_teachers');
+    CREATE OR REPLACE TRIGGER trg_stats_teacher_delete AFTER DELETE ON teachers
+        REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION trg_stats_deleted('total_teachers');
+    CREATE OR REPLACE TRIGGER trg_stats_assignment_insert AFTER INSERT ON profile_assignments
+        REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION trg_stats_inserted('total_assignments');
+    CREATE OR REPLACE TRIGGER trg_stats_assignment_delete AFTER DELETE ON profile_assignments
+        REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION trg_stats_deleted('total_assignments');
+"""
+
+
+def _rebuild_admin_statistics(cursor):
+    """Recompute the admin statistics tables inside an open transaction."""
+    cursor.execute("""
+        DELETE FROM stat_counters;
+        DELETE FROM stat_children;
+        DELETE FROM stat_accounts;
+        DELETE FROM stat_daily_assessments;
+        INSERT INTO stat_children (child_name, count)
+        SELECT child_name, COUNT(*) FROM assessment_results WHERE child_name IS NOT NULL GROUP BY child_name;
+        INSERT INTO stat_accounts (email, count)
+        SELECT email, COUNT(*) FROM assessment_results WHERE email IS NOT NULL GROUP BY email;
+        INSERT INTO stat_daily_assessments (day, count)
+        SELECT to_char(created_at, 'YYYY-MM-DD') AS day, COUNT(*) FROM assessment_results
+        WHERE created_at IS NOT NULL GROUP BY day;
+        INSERT INTO stat_counters (name, value) VALUES
+        ('total_assessments', (SELECT COUNT(*) FROM assessment_results)),
+        ('total_teachers', (SELECT COUNT(*) FROM teachers)),
+        ('total_assignments', (SELECT COUNT(*) FROM profile_assignments)),
+        ('unique_children', (SELECT COUNT(*) FROM stat_children)),
+        ('unique_accounts', (SELECT COUNT(*) FROM stat_accounts));
+    """)
+
+
+def _migrate_baseline(cursor):
+    """Version 1: the SQLite baseline's tables, indexes and admin statistics, with the triggers in PL/pgSQL."""
+    cursor.execute(_BASELINE_SCHEMA)
+    _rebuild_admin_statistics(cursor)
+
+
+def _score_assessments(connection, where="", chunk_size=SCORE_CHUNK_SIZE):
+    """
+    Stream assessments through a server-side cursor and COPY in their assessment_scores rows.
+
+    where narrows assessment_results (aliased a). Returns the number of assessments scored.
+    """
+    scored = 0
+    with connection.cursor(name=f"scores_{uuid.uuid4().hex}") as reader, connection.cursor() as writer:
+        reader.itersize = chunk_size
+        reader.execute(f"""
+            SELECT id, created_at, instrument_id, raw_responses, raw_responses_packed FROM assessment_results a
+            {where} ORDER BY id
+        """)
+        while True:
+            rows = reader.fetchmany(chunk_size)
+            if not rows:
+                return scored
+            score_rows = assessment_score_rows(rows)
+            _copy_rows(writer, "assessment_scores", SCORE_COLUMNS, score_rows)
+            scored += len({row[0] for row in score_rows})
+
+
+def _migrate_assessment_scores(cursor):
+    """Version 2: assessment_scores as in SQLite, filled from the stored answers in the migration's transaction."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS assessment_scores (
+            assessment_id BIGINT NOT NULL REFERENCES assessment_results(id) ON DELETE CASCADE,
+            category TEXT NOT NULL,
+            average DOUBLE PRECISION,
+            band SMALLINT NOT NULL,
+            created_at TIMESTAMP(0),
+            PRIMARY KEY (assessment_id, category)
+        );
+        CREATE INDEX IF NOT EXISTS idx_scores_created ON assessment_scores(created_at, category) INCLUDE (band, average);
+        CREATE INDEX IF NOT EXISTS idx_teachers_school ON teachers(school);
+
+        CREATE OR REPLACE FUNCTION trg_scores_created() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE assessment_scores SET created_at = NEW.created_at WHERE assessment_id = NEW.id;
+            RETURN NULL;
+        END $$;
+        CREATE OR REPLACE TRIGGER trg_scores_assessment_created AFTER UPDATE OF created_at ON assessment_results
+            FOR EACH ROW EXECUTE FUNCTION trg_scores_created();
+    """)
+    _score_assessments(cursor.connection)
+
+
+def _migrate_submission_keys(cursor):
+    """Version 3: the optional, unique-when-set submission_key of queued writes, as in SQLite."""
+    cursor.execute("""
+        ALTER TABLE assessment_results ADD COLUMN IF NOT EXISTS submission_key TEXT;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_assessment_submission_key ON assessment_results(submission_key)
+            WHERE submission_key IS NOT NULL;
+    """)
+
+
+# Ordered schema migrations, numbered like utils.database.MIGRATIONS so both
+# backends report the same version for the same schema
+MIGRATIONS = (
+    (1, "Baseline: assessments, teachers, assignments, norms, job checkpoints, indexes and admin statistics",
+     _migrate_baseline),
+    (2, "Per-category average and band columns in assessment_scores, backfilled from stored answers",
+     _migrate_assessment_scores),
+    (3, "Unique submission_key on assessment_results for idempotent queued writes", _migrate_submission_keys),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _find_duplicates(cursor, after_id, through_id, window_minutes):
+    """(duplicate id, kept id) for the rows with ids in (after_id, through_id], as utils.database.find_duplicates."""
+    cursor.execute("""
+        SELECT d.id, MIN(k.id) FROM assessment_results d
+        JOIN assessment_results k
+          ON k.child_name = d.child_name
+         AND k.created_at BETWEEN d.created_at - make_interval(mins => %s) AND d.created_at
+         AND k.id < d.id
+         AND k.email IS NOT DISTINCT FROM d.email
+         AND k.instrument_id IS NOT DISTINCT FROM d.instrument_id
+         AND k.raw_responses = d.raw_responses
+         AND (k.submission_key IS NULL OR d.submission_key IS NULL)
+        WHERE d.id > %s AND d.id <= %s
+        GROUP BY d.id ORDER BY d.id
+    """, (int(window_minutes), after_id, through_id))
+    return kept_duplicates(cursor.fetchall())
+
+
+def _remove_duplicates(cursor, duplicates):
+    """Point assignments at the kept rows, take the duplicates out of the norms and delete them."""
+    duplicate_ids = [duplicate_id for duplicate_id, _ in duplicates]
+    cursor.execute("""
+        SELECT age, birth_year, instrument_id, raw_responses, raw_responses_packed
+        FROM assessment_results WHERE id = ANY(%s)
+    """, (duplicate_ids,))
+    histograms = {}
+    accumulate_norm_rows(histograms, cursor.fetchall())
+    norm_rows = norm_table_rows(histograms)
+    if norm_rows:
+        psycopg2.extras.execute_values(cursor, """
+            UPDATE category_norms AS n SET count = GREATEST(n.count - v.count, 0)
+            FROM (VALUES %s) AS v (cohort_type, cohort_value, category, bin, count)
+            WHERE n.cohort_type = v.cohort_type AND n.cohort_value = v.cohort_value
+              AND n.category = v.category AND n.bin = v.bin
+        """, norm_rows, template="(%s, %s::integer, %s, %s::integer, %s::bigint)")
+
+    psycopg2.extras.execute_values(cursor, """
+        UPDATE profile_assignments AS pa SET assessment_id = v.kept_id
+        FROM (VALUES %s) AS v (duplicate_id, kept_id) WHERE pa.assessment_id = v.duplicate_id
+    """, duplicates, template="(%s::bigint, %s::bigint)")
+    # The duplicates' score rows cascade and triggers update the admin statistics
+    cursor.execute("DELETE FROM assessment_results WHERE id = ANY(%s)", (duplicate_ids,))
+
+
+def _copy_rows(cursor, table, columns, rows):
+    """Bulk load rows into table with COPY ... FROM STDIN in CSV form."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # COPY reads an unquoted empty field as NULL, and a quoted one as ''
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+class PostgresStorage(Storage):
+    """
+    Storage in a PostgreSQL database, given as a postgresql:// URL.
+
+    At most max_connections connections are open at once; a caller that finds
+    them all in use waits up to pool_timeout seconds before failing.
+    """
+
+    # OperationalError covers a refused, dropped or timed out connection
+    unavailable_errors = Storage.unavailable_errors + (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+    def __init__(self, url, max_connections=POOL_MAX_CONNECTIONS, pool_timeout=POOL_TIMEOUT):
+        super().__init__()
+        self.url = url
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self._pool = psycopg2.pool.ThreadedConnectionPool(min(POOL_MIN_CONNECTIONS, max_connections),
+                                                          max_connections, url)
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._in_use = 0
+        self._in_use_lock = threading.Lock()
+
+    @property
+    def schema_version(self):
+        return SCHEMA_VERSION
+
+    def close(self):
+        """Close every pooled connection."""
+        self._pool.closeall()
+
+    @contextmanager
+    def _connection(self):
+        """
+        Borrow a pooled connection for one transaction: committed if the block
+        succeeds, rolled back if it raises, and returned to the pool either way.
+        """
+        if not self._slots.acquire(timeout=self.pool_timeout):
+            raise TimeoutError(f"No database connection free after {self.pool_timeout:g}s")
+        with self._in_use_lock:
+            self._in_use += 1
+        try:
+            connection = self._pool.getconn()
+            try:
+                with connection:
+                    yield connection
+            finally:
+                # A connection the server dropped is discarded rather than reused
+                self._pool.putconn(connection, close=bool(connection.closed))
+        finally:
+            with self._in_use_lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def _transaction(self, cursor_factory=None):
+        """A cursor on a pooled connection, in one transaction."""
+        with self._connection() as connection:
+            with connection.cursor(cursor_factory=cursor_factory) as cursor:
+                yield cursor
+
+    def _fetch_records(self, record_type, sql, params=()):
+        with self._transaction(psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute(sql, tuple(params))
+            rows = cursor.fetchall()
+        return [record_type.from_row(row) for row in rows]
+
+    def _cached(self, name, params, load, tags):
+        """Read a lookup through QUERY_CACHE, keyed by this database, the lookup's name and its parameters."""
+        return QUERY_CACHE.get_or_load((self.url, name) + tuple(params), load, tags)
+
+    @staticmethod
+    def _completion_tags(cursor, tokens):
+        """Cache tags of the assignments a completion changes, read inside the completing transaction."""
+        tokens = list(tokens)
+        cursor.execute("SELECT DISTINCT teacher_id FROM profile_assignments WHERE assignment_token = ANY(%s)",
+                       (tokens,))
+        return ([('assignment', token) for token in tokens] +
+                [('teacher_assignments', teacher_id) for (teacher_id,) in cursor.fetchall()])
+
+    # Schema
+
+    def _current_version(self, cursor):
+        cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        return cursor.fetchone()[0]
+
+    def init_db(self):
+        """
+        Bring the database schema up to SCHEMA_VERSION.
+
+        Each pending migration runs in its own transaction under an advisory
+        lock; a process that waited on the lock re-reads the version and skips
+        what the holder applied. A database that is already current costs one
+        round trip and no lock.
+        """
+        try:
+            with self._transaction() as cursor:
+                current = self._current_version(cursor)
+            for version, description, migrate in MIGRATIONS:
+                if version <= current:
+                    continue
+                with self._transaction() as cursor:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+                    cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS schema_version (
+                            version INTEGER PRIMARY KEY,
+                            description TEXT,
+                            applied_at TIMESTAMP(0) DEFAULT (now() AT TIME ZONE 'UTC')
+                        )
+                    """)
+                    if self._current_version(cursor) >= version:
+                        continue
+                    migrate(cursor)
+                    cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                                   (version, description))
+            return True
+        except Exception as e:
+            st.error(f"Database initialization error: {e}")
+            return False
+
+    # Assessments
+
+    def _insert_assessments(self, cursor, prepared):
+        """Insert prepared (row, norm_rows, score_rows) assessments in an open transaction; returns ids in order."""
+        ids = [row_id for (row_id,) in psycopg2.extras.execute_values(cursor, """
+            INSERT INTO assessment_results
+            (child_name, age, scores, personality_label, raw_responses, email, birth_month, birth_year, instrument_id,
+             raw_responses_packed, submission_key)
+            VALUES %s RETURNING id
+        """, [row for row, _, _ in prepared], fetch=True)]
+
+        # One row per bin: a single INSERT ... ON CONFLICT may not update a row twice
+        norm_counts = Counter(norm_row for _, rows, _ in prepared for norm_row in rows)
+        if norm_counts:
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO category_norms AS n (cohort_type, cohort_value, category, bin, count) VALUES %s
+                ON CONFLICT (cohort_type, cohort_value, category, bin) DO UPDATE SET count = n.count + EXCLUDED.count
+            """, [norm_row + (count,) for norm_row, count in norm_counts.items()])
+
+        score_rows = [(result_id, category, average, band)
+                      for result_id, (_, _, rows) in zip(ids, prepared) for category, average, band in rows]
+        if score_rows:
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO assessment_scores (assessment_id, category, average, band, created_at)
+                SELECT v.assessment_id, v.category, v.average, v.band, a.created_at
+                FROM (VALUES %s) AS v (assessment_id, category, average, band)
+                JOIN assessment_results a ON a.id = v.assessment_id
+            """, score_rows, template="(%s::bigint, %s, %s::double precision, %s::smallint)")
+        return ids
+
+    def _submission_id(self, cursor, submission_key):
+        """Id of the stored assessment with this submission_key, or None."""
+        if not submission_key:
+            return None
+        cursor.execute("SELECT id FROM assessment_results WHERE submission_key = %s", (submission_key,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def save_assessment_result(self, child_name, age, scores, personality_label, raw_responses, email, birth_month,
+                               birth_year, instrument_id=DEFAULT_INSTRUMENT_ID, submission_key=None):
+        prepared = _assessment_row(child_name, age, scores, personality_label, raw_responses, email, birth_month,
+                                   birth_year, instrument_id, submission_key)
+        try:
+            try:
+                with self._transaction() as cursor:
+                    result_id = self._submission_id(cursor, submission_key)
+                    if result_id is not None:
+                        return result_id
+                    (result_id,) = self._insert_assessments(cursor, [prepared])
+            except psycopg2.IntegrityError:
+                # A concurrent save with the same key committed first
+                with self._transaction() as cursor:
+                    result_id = self._submission_id(cursor, submission_key)
+                if result_id is None:
+                    raise
+                return result_id
+            QUERY_CACHE.invalidate(*_assessment_tags(child_name, email))
+            return result_id
+        except Exception as e:
+            st.error(f"Error saving assessment result: {e}")
+            return None
+
+    def save_pending_writes(self, assessments, completions):
+        with self._transaction() as cursor:
+            saved = {}
+            if assessments:
+                cursor.execute("SELECT submission_key, id FROM assessment_results WHERE submission_key = ANY(%s)",
+                               (list({key for key, _ in assessments}),))
+                saved.update(cursor.fetchall())
+            fresh = unsaved_submissions(assessments, saved)
+            prepared = [_assessment_row(**fields, submission_key=key) for key, fields in fresh]
+            ids = self._insert_assessments(cursor, prepared) if prepared else []
+            saved.update((key, result_id) for (key, _), result_id in zip(fresh, ids))
+            tags = [tag for _, fields in fresh
+                    for tag in _assessment_tags(fields.get('child_name'), fields.get('email'))]
+            if completions:
+                psycopg2.extras.execute_batch(cursor, f"""
+                    UPDATE profile_assignments
+                    SET status = 'completed', assessment_id = %s, completed_at = {NOW_UTC}
+                    WHERE assignment_token = %s
+                """, [(saved.get(assessment_id, assessment_id), token) for token, assessment_id in completions])
+                tags.extend(self._completion_tags(cursor, {token for token, _ in completions}))
+        QUERY_CACHE.invalidate(*tags)
+        return saved
+
+    def get_assessments_page(self, email=None, child_name=None, page_size=20, cursor=None):
+        if email:
+            where, params = "email = %s", [email]
+        elif child_name:
+            where, params = "child_name = %s", [child_name]
+        else:
+            return [], None
+
+        try:
+            page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+            tags = [('assessments_email', email)] if email else [('assessments_child', child_name)]
+            if cursor:
+                where += " AND (created_at, id) < (%s::timestamp, %s)"
+                params.extend(decode_cursor(cursor))
+            params.append(page_size + 1)
+            rows, next_cursor = self._cached(f"assessments:{where}", params, lambda: _page(tuple(self._fetch_records(
+                AssessmentRecord, f"""
+                SELECT {ASSESSMENT_COLUMNS}, to_char(created_at, '{TIMESTAMP_FORMAT}') AS created_at_formatted
+                FROM assessment_results
+                WHERE {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+            """, params)), page_size, 'created_at'), tags)
+            return list(rows), next_cursor
+        except Exception as e:
+            st.error(f"Error retrieving assessments: {e}")
+            return [], None
+
+    def iter_assessment_chunks(self, chunk_size=5000):
+        """
+        Yield every assessment (without raw answers) in id order, as DataFrames of up to chunk_size rows.
+
+        One server-side cursor streams the table, so the whole export reads a
+        single snapshot and only chunk_size rows are held client-side at a time.
+        """
+        with self._connection() as connection:
+            with connection.cursor(name=f"export_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = chunk_size
+                cursor.execute(EXPORT_QUERY)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        return
+                    yield pd.DataFrame(rows, columns=EXPORT_COLUMNS)
+
+    # Teachers and assignments
+
+    def create_teacher_account(self, email, name, school=None, grade_level=None):
+        try:
+            with self._transaction() as cursor:
+                cursor.execute("INSERT INTO teachers (email, name, school, grade_level) VALUES (%s, %s, %s, %s) "
+                               "RETURNING id", (email, name, school, grade_level))
+                teacher_id = cursor.fetchone()[0]
+            QUERY_CACHE.invalidate(('teacher', email))
+            return teacher_id
+        except Exception as e:
+            st.error(f"Error creating teacher account: {e}")
+            return None
+
+    def get_teacher_by_email(self, email):
+        try:
+            rows = self._cached("teacher_by_email", [email], lambda: self._fetch_records(TeacherRecord, f"""
+                SELECT id, email, name, school, grade_level, ambassador_status,
+                       to_char(created_at, '{TIMESTAMP_FORMAT}') AS created_at
+                FROM teachers WHERE email = %s
+            """, [email]), [('teacher', email)])
+            return rows[0] if rows else None
+        except Exception as e:
+            st.error(f"Error retrieving teacher: {e}")
+            return None
+
+    def create_assignment(self, teacher_id, parent_email, child_name, assignment_token):
+        try:
+            with self._transaction() as cursor:
+                cursor.execute("""
+                    INSERT INTO profile_assignments (teacher_id, parent_email, child_name, assignment_token)
+                    VALUES (%s, %s, %s, %s) RETURNING id
+                """, (teacher_id, parent_email, child_name, assignment_token))
+                assignment_id = cursor.fetchone()[0]
+            QUERY_CACHE.invalidate(('assignment', assignment_token), ('teacher_assignments', teacher_id))
+            return assignment_id
+        except Exception as e:
+            st.error(f"Error creating assignment: {e}")
+            return None
+
+    def create_assignments(self, teacher_id, assignments):
+        """
+        Create many profile assignments for one teacher in a single transaction.
+
+        The rows are loaded with COPY and their ids read back by token, so a
+        roster of thousands is two round trips. All or nothing, like SQLite.
+        """
+        if not assignments:
+            return []
+
+        tokens = [token for _, _, token in assignments]
+        try:
+            with self._transaction() as cursor:
+                _copy_rows(cursor, "profile_assignments",
+                           ("teacher_id", "parent_email", "child_name", "assignment_token"),
+                           [(teacher_id, parent_email, child_name, token)
+                            for parent_email, child_name, token in assignments])
+                cursor.execute("SELECT assignment_token, id FROM profile_assignments WHERE assignment_token = ANY(%s)",
+                               (tokens,))
+                ids = dict(cursor.fetchall())
+            QUERY_CACHE.invalidate(('teacher_assignments', teacher_id), *[('assignment', token) for token in tokens])
+            return [ids[token] for token in tokens]
+        except Exception as e:
+            st.error(f"Error creating assignments: {e}")
+            return []
+
+    def get_assignment_by_token(self, assignment_token):
+        try:
+            rows = self._cached("assignment_by_token", [assignment_token], lambda: self._fetch_records(
+                AssignmentRecord, f"""
+                SELECT {ASSIGNMENT_COLUMNS}, t.name AS teacher_name, t.school, t.grade_level
+                FROM profile_assignments pa
+                JOIN teachers t ON pa.teacher_id = t.id
+                WHERE pa.assignment_token = %s
+            """, [assignment_token]), [('assignment', assignment_token)])
+            return rows[0] if rows else None
+        except Exception as e:
+            st.error(f"Error retrieving assignment: {e}")
+            return None
+
+    def get_assignment_results(self, teacher_id, assignment_id):
+        def load():
+            with self._transaction(psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(f"""
+                    SELECT {ASSIGNMENT_COLUMNS}, t.name AS teacher_name, t.school, t.grade_level,
+                           ar.id AS ar_id, ar.child_name AS ar_child_name, ar.age AS ar_age, ar.scores AS ar_scores,
+                           ar.personality_label AS ar_personality_label, ar.email AS ar_email,
+                           ar.birth_month AS ar_birth_month, ar.birth_year AS ar_birth_year,
+                           ar.instrument_id AS ar_instrument_id,
+                           to_char(ar.created_at, '{TIMESTAMP_FORMAT}') AS ar_created_at
+                    FROM profile_assignments pa
+                    JOIN teachers t ON t.id = pa.teacher_id
+                    LEFT JOIN assessment_results ar ON ar.id = pa.assessment_id
+                    WHERE pa.id = %s AND pa.teacher_id = %s
+                """, (int(assignment_id), teacher_id))
+                row = cursor.fetchone()
+            if row is None:
+                return None
+
+            assessment = AssessmentRecord.from_row(row, prefix='ar_') if row['ar_id'] is not None else None
+            return AssignmentRecord.from_row(row, personality_label=row['ar_personality_label'], assessment=assessment)
+
+        try:
+            return self._cached("assignment_results", [teacher_id, int(assignment_id)], load,
+                                [('teacher_assignments', teacher_id)])
+        except Exception as e:
+            st.error(f"Error retrieving assignment: {e}")
+            return None
+
+    def get_teacher_assignments_page(self, teacher_id, page_size=20, cursor=None, status=None):
+        try:
+            page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+            where, params = "pa.teacher_id = %s", [teacher_id]
+            if status:
+                where += " AND pa.status = %s"
+                params.append(status)
+            if cursor:
+                where += " AND (pa.assigned_at, pa.id) < (%s::timestamp, %s)"
+                params.extend(decode_cursor(cursor))
+            params.append(page_size + 1)
+            rows, next_cursor = self._cached(f"teacher_assignments:{where}", params, lambda: _page(tuple(
+                self._fetch_records(AssignmentRecord, f"""
+                SELECT {ASSIGNMENT_COLUMNS}, ar.personality_label
+                FROM profile_assignments pa
+                LEFT JOIN assessment_results ar ON pa.assessment_id = ar.id
+                WHERE {where}
+                ORDER BY pa.assigned_at DESC, pa.id DESC
+                LIMIT %s
+            """, params)), page_size, 'assigned_at'), [('teacher_assignments', teacher_id)])
+            return list(rows), next_cursor
+        except Exception as e:
+            st.error(f"Error retrieving teacher assignments: {e}")
+            return [], None
+
+    def complete_assignment(self, assignment_token, assessment_id):
+        try:
+            with self._transaction() as cursor:
+                cursor.execute(f"""
+                    UPDATE profile_assignments
+                    SET status = 'completed', assessment_id = %s, completed_at = {NOW_UTC}
+                    WHERE assignment_token = %s
+                """, (assessment_id, assignment_token))
+                completed = cursor.rowcount > 0
+                tags = self._completion_tags(cursor, [assignment_token])
+            QUERY_CACHE.invalidate(*tags)
+            return completed
+        except Exception as e:
+            st.error(f"Error completing assignment: {e}")
+            return False
+
+    # Admin, norms and maintenance
+
+    def get_admin_statistics(self):
+        empty = {
+            'total_assessments': 0,
+            'total_teachers': 0,
+            'total_assignments': 0,
+            'unique_children': 0,
+            'unique_accounts': 0,
+            'daily_assessments': [],
+            'daily_activity': [],
+            'latest_assessments': []
+        }
+        try:
+            with self._transaction(psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("SELECT name, value FROM stat_counters")
+                counters = cursor.fetchall()
+                cursor.execute("""
+                    SELECT day, count FROM stat_daily_assessments
+                    WHERE day > to_char((now() AT TIME ZONE 'UTC')::date - %s, 'YYYY-MM-DD') ORDER BY day
+                """, (ACTIVITY_DAYS,))
+                daily = cursor.fetchall()
+                cursor.execute(f"""
+                    SELECT id, child_name, age, personality_label, email,
+                           to_char(created_at, '{TIMESTAMP_FORMAT}') AS created_at
+                    FROM assessment_results ORDER BY id DESC LIMIT 10
+                """)
+                latest = cursor.fetchall()
+
+            stats = dict(empty)
+            stats.update({row['name']: int(row['value']) for row in counters})
+            stats['daily_assessments'] = daily_activity({row['day']: row['count'] for row in daily})
+            stats['daily_activity'] = stats['daily_assessments']
+            stats['latest_assessments'] = [dict(row) for row in latest]
+            return stats
+        except Exception as e:
+            st.error(f"Error getting admin statistics: {e}")
+            return empty
+
+    def rebuild_admin_statistics(self):
+        try:
+            with self._transaction() as cursor:
+                _rebuild_admin_statistics(cursor)
+            return True
+        except Exception as e:
+            st.error(f"Error rebuilding admin statistics: {e}")
+            return False
+
+    def get_db_health(self):
+        """
+        Probe the database: round-trip latency, server version and database
+        size, pool use and the query cache's counters.
+        """
+        try:
+            started = time.perf_counter()
+            with self._transaction() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+                latency_ms = (time.perf_counter() - started) * 1000
+                cursor.execute("SELECT current_setting('server_version'), pg_database_size(current_database())")
+                server_version, database_bytes = cursor.fetchone()
+            with self._in_use_lock:
+                in_use = self._in_use
+            return {'ok': True, 'latency_ms': latency_ms,
+                    'pool': f"{in_use} of {self.max_connections} connections in use",
+                    'query_cache': QUERY_CACHE.stats(), 'server_version': server_version,
+                    'database_bytes': database_bytes}
+        except Exception as e:
+            st.error(f"Database health check failed: {e}")
+            return {'ok': False, 'error': str(e)}
+
+    def get_cohort_histograms(self, cohort_type, cohort_value):
+        try:
+            with self._transaction() as cursor:
+                cursor.execute("""
+                    SELECT category, bin, count FROM category_norms
+                    WHERE cohort_type = %s AND cohort_value = %s
+                """, (cohort_type, int(cohort_value)))
+                rows = cursor.fetchall()
+            histograms = {}
+            for category, bin_index, count in rows:
+                histograms.setdefault(category, np.zeros(NORM_BIN_COUNT, dtype=np.int64))[bin_index] = count
+            return histograms
+        except Exception as e:
+            st.error(f"Error retrieving norms: {e}")
+            return {}
+
+    def rebuild_category_norms(self, chunk_size=5000):
+        """
+        Rebuild the norms histograms from assessment_results.
+
+        Streams the table through a server-side cursor chunk_size rows at a
+        time, then swaps in the new histograms with one COPY in a transaction.
+        """
+        try:
+            histograms = {}
+            counted = 0
+            with self._connection() as connection:
+                with connection.cursor(name=f"norms_{uuid.uuid4().hex}") as cursor:
+                    cursor.itersize = chunk_size
+                    cursor.execute("""
+                        SELECT age, birth_year, instrument_id, raw_responses, raw_responses_packed
+                        FROM assessment_results ORDER BY id
+                    """)
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        counted += accumulate_norm_rows(histograms, rows)
+
+            with self._transaction() as cursor:
+                cursor.execute("DELETE FROM category_norms")
+                _copy_rows(cursor, "category_norms", ("cohort_type", "cohort_value", "category", "bin", "count"),
+                           norm_table_rows(histograms))
+            return counted
+        except Exception as e:
+            st.error(f"Error rebuilding norms: {e}")
+            return 0
+
+    def backfill_packed_responses(self, chunk_size=5000):
+        """
+        Fill raw_responses_packed for rows saved before the packed column existed.
+
+        Each chunk is read by keyset and written in its own transaction, so the
+        job can be stopped and rerun.
+        """
+        try:
+            packed_rows = 0
+            last_id = 0
+            while True:
+                with self._transaction() as cursor:
+                    cursor.execute("""
+                        SELECT id, instrument_id, raw_responses, raw_responses_packed FROM assessment_results
+                        WHERE id > %s AND raw_responses_packed IS NULL ORDER BY id LIMIT %s
+                    """, (last_id, chunk_size))
+                    rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                updates = packed_updates(rows)
+                if updates:
+                    with self._transaction() as cursor:
+                        psycopg2.extras.execute_values(cursor, """
+                            UPDATE assessment_results AS a SET raw_responses_packed = v.packed
+                            FROM (VALUES %s) AS v (packed, id) WHERE a.id = v.id
+                        """, updates, template="(%s::bytea, %s)")
+                packed_rows += len(updates)
+            return packed_rows
+        except Exception as e:
+            st.error(f"Error packing stored responses: {e}")
+            return 0
+
+    def backfill_assessment_scores(self, chunk_size=SCORE_CHUNK_SIZE):
+        """Fill assessment_scores for assessments that have no score rows, in one streamed transaction."""
+        try:
+            with self._connection() as connection:
+                return _score_assessments(connection, """
+                    WHERE NOT EXISTS (SELECT 1 FROM assessment_scores s WHERE s.assessment_id = a.id)
+                """, chunk_size)
+        except Exception as e:
+            st.error(f"Error scoring stored assessments: {e}")
+            return 0
+
+    def rescore_assessments(self, chunk_size=10000, restart=False, progress=None):
+        """
+        Rescore every assessment from its raw_responses after a scoring change.
+
+        As utils.database.rescore_assessments: each keyset chunk is read,
+        rescored and written with the job checkpoint in one transaction, so an
+        interrupted run resumes after the last committed chunk.
+        """
+        with self._transaction() as cursor:
+            if restart:
+                cursor.execute("DELETE FROM job_checkpoints WHERE job = %s", (RESCORE_JOB,))
+            cursor.execute("SELECT last_id FROM job_checkpoints WHERE job = %s", (RESCORE_JOB,))
+            row = cursor.fetchone()
+        last_id = row[0] if row else 0
+
+        stats = {"processed": 0, "updated": 0, "skipped": 0, "last_id": last_id, "seconds": 0.0, "rows_per_second": 0.0}
+        started = time.perf_counter()
+
+        while True:
+            with self._transaction() as cursor:
+                cursor.execute("""
+                    SELECT id, scores, personality_label, instrument_id, raw_responses, raw_responses_packed
+                    FROM assessment_results
+                    WHERE id > %s ORDER BY id LIMIT %s
+                """, (last_id, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                cursor.execute("""
+                    SELECT assessment_id, category, average, band FROM assessment_scores
+                    WHERE assessment_id BETWEEN %s AND %s
+                """, (rows[0][0], rows[-1][0]))
+                stored = {tuple(row[:2]): tuple(row[2:]) for row in cursor.fetchall()}
+                updates, score_updates, changed, scored = rescore_rows(rows, stored)
+
+                last_id = rows[-1][0]
+                if updates:
+                    psycopg2.extras.execute_values(cursor, """
+                        UPDATE assessment_results AS a SET scores = v.scores, personality_label = v.label
+                        FROM (VALUES %s) AS v (scores, label, id) WHERE a.id = v.id
+                    """, updates)
+                if score_updates:
+                    psycopg2.extras.execute_values(cursor, """
+                        INSERT INTO assessment_scores (assessment_id, category, average, band, created_at)
+                        SELECT v.id, v.category, v.average, v.band, a.created_at
+                        FROM (VALUES %s) AS v (id, category, average, band) JOIN assessment_results a ON a.id = v.id
+                        ON CONFLICT (assessment_id, category) DO UPDATE SET average = excluded.average, band = excluded.band
+                    """, score_updates, template="(%s::bigint, %s, %s::double precision, %s::smallint)")
+                cursor.execute(f"""
+                    INSERT INTO job_checkpoints (job, last_id, updated_at) VALUES (%s, %s, {NOW_UTC})
+                    ON CONFLICT (job) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+                """, (RESCORE_JOB, last_id))
+
+            if changed:
+                # Any cached lookup may hold one of the rows; rescoring is rare enough to drop them all
+                QUERY_CACHE.clear()
+
+            stats["processed"] += len(rows)
+            stats["updated"] += changed
+            stats["skipped"] += len(rows) - scored
+            stats["last_id"] = last_id
+            stats["seconds"] = time.perf_counter() - started
+            stats["rows_per_second"] = stats["processed"] / stats["seconds"] if stats["seconds"] else 0.0
+            if progress:
+                progress(stats)
+
+        # Finished: the next run starts from the beginning
+        with self._transaction() as cursor:
+            cursor.execute("DELETE FROM job_checkpoints WHERE job = %s", (RESCORE_JOB,))
+        return stats
+
+    def dedupe_assessments(self, chunk_size=10000, window_minutes=DUPLICATE_WINDOW_MINUTES, restart=False,
+                           dry_run=False, progress=None):
+        """
+        Delete assessments saved more than once, keeping the earliest of each.
+
+        As utils.database.dedupe_assessments: each keyset chunk's duplicates
+        are removed with the job checkpoint in one transaction, so an
+        interrupted run resumes after the last committed chunk.
+        """
+        with self._transaction() as cursor:
+            if restart:
+                cursor.execute("DELETE FROM job_checkpoints WHERE job = %s", (DEDUPE_JOB,))
+            cursor.execute("SELECT last_id FROM job_checkpoints WHERE job = %s", (DEDUPE_JOB,))
+            row = cursor.fetchone()
+        last_id = row[0] if row and not dry_run else 0
+
+        stats = {"processed": 0, "removed": 0, "last_id": last_id, "seconds": 0.0, "rows_per_second": 0.0}
+        started = time.perf_counter()
+
+        while True:
+            with self._transaction() as cursor:
+                cursor.execute("""
+                    SELECT COUNT(*), MAX(id) FROM (
+                        SELECT id FROM assessment_results WHERE id > %s ORDER BY id LIMIT %s
+                    ) AS chunk
+                """, (last_id, chunk_size))
+                processed, through_id = cursor.fetchone()
+                if not processed:
+                    break
+
+                duplicates = _find_duplicates(cursor, last_id, through_id, window_minutes)
+                if not dry_run:
+                    if duplicates:
+                        _remove_duplicates(cursor, duplicates)
+                    cursor.execute(f"""
+                        INSERT INTO job_checkpoints (job, last_id, updated_at) VALUES (%s, %s, {NOW_UTC})
+                        ON CONFLICT (job) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+                    """, (DEDUPE_JOB, through_id))
+            last_id = through_id
+
+            if duplicates and not dry_run:
+                # Any cached lookup may hold a deleted row or a moved assignment
+                QUERY_CACHE.clear()
+
+            stats["processed"] += processed
+            stats["removed"] += len(duplicates)
+            stats["last_id"] = last_id
+            stats["seconds"] = time.perf_counter() - started
+            stats["rows_per_second"] = stats["processed"] / stats["seconds"] if stats["seconds"] else 0.0
+            if progress:
+                progress(stats)
+
+        # Finished: the next run starts from the beginning
+        if not dry_run:
+            with self._transaction() as cursor:
+                cursor.execute("DELETE FROM job_checkpoints WHERE job = %s", (DEDUPE_JOB,))
+        return stats
+
+    def get_band_counts(self, since=None, until=None, teacher_id=None, school=None):
+        try:
+            joins, where, params = score_filters(since, until, teacher_id, school, placeholder="%s")
+            with self._transaction() as cursor:
+                cursor.execute(f"""
+                    SELECT s.category, s.band, COUNT(*) FROM assessment_scores s {joins} {where}
+                    GROUP BY s.category, s.band
+                """, params)
+                return band_count_table(cursor.fetchall())
+        except Exception as e:
+            st.error(f"Error counting score bands: {e}")
+            return {}
+
+    def get_category_trends(self, period="month", since=None, until=None, teacher_id=None, school=None):
+        if period not in TREND_PERIODS:
+            raise ValueError(f"Unknown trend period: {period!r}")
+        try:
+            joins, where, params = score_filters(since, until, teacher_id, school, placeholder="%s")
+            with self._transaction(psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(f"""
+                    SELECT to_char(s.created_at, '{TREND_PERIODS[period]}') AS period, s.category,
+                           COUNT(*) AS assessments, AVG(s.average) AS average, {BAND_COUNT_COLUMNS}
+                    FROM assessment_scores s {joins} {where}
+                    GROUP BY period, s.category ORDER BY period, s.category
+                """, params)
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            st.error(f"Error computing category trends: {e}")
+            return []
@@ -0,0 +1,139 @@
+"""
+Profile Lookup Table
+Every combination of category bands packed into a base-3 profile code, with the
+derived results for each code precomputed once at import
+"""
+
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from utils.batch_scoring import BAND_LABELS, CATEGORY_NAMES
+from utils.scoring import get_personality_label
+
+# 3 bands per category -> 3 ** 6 = 729 possible profiles
+PROFILE_COUNT = len(BAND_LABELS) ** len(CATEGORY_NAMES)
+
+_BAND_CODES = {label: code for code, label in enumerate(BAND_LABELS)}
+_PLACE_VALUES = np.array([len(BAND_LABELS) ** i for i in range(len(CATEGORY_NAMES))], dtype=np.int32)
+
+
+class ProfileEntry(NamedTuple):
+    """Everything the results pages derive from a scores dict."""
+    code: Optional[int]
+    scores: Mapping[str, str]
+    personality_label: str
+    strengths: Tuple[str, ...]
+    developing: Tuple[str, ...]
+    growth_areas: Tuple[str, ...]
+    learning_style: str
+    milestone_focus: Tuple[str, ...]
+
+
+def encode_profile(scores: Dict[str, str]) -> Optional[int]:
+    """
+    Pack a scores dict into its profile code (category i contributes band * 3**i).
+
+    Returns None unless scores has exactly the six categories in canonical order,
+    since the derived lists depend on dict order.
+    """
+    if not isinstance(scores, dict) or tuple(scores) != CATEGORY_NAMES:
+        return None
+    code = 0
+    for place, band in enumerate(scores.values()):
+        band_code = _BAND_CODES.get(band)
+        if band_code is None:
+            return None
+        code += band_code * int(_PLACE_VALUES[place])
+    return code
+
+
+def decode_profile(code: int) -> Dict[str, str]:
+    """Unpack a profile code into a scores dict in canonical category order."""
+    if not 0 <= code < PROFILE_COUNT:
+        raise ValueError(f"Profile code must be between 0 and {PROFILE_COUNT - 1}")
+    scores = {}
+    for category in CATEGORY_NAMES:
+        code, band_code = divmod(code, len(BAND_LABELS))
+        scores[category] = BAND_LABELS[band_code]
+    return scores
+
+
+def encode_bands(bands: np.ndarray) -> np.ndarray:
+    """Vectorized encode_profile for an N x categories matrix of band codes."""
+    return bands.astype(np.int32) @ _PLACE_VALUES
+
+
+def get_learning_style_key(scores: Dict[str, str]) -> str:
+    """Pick the learning style described on the results page."""
+    strengths = [cat for cat, score in scores.items() if score == "High"]
+    developing = [cat for cat, score in scores.items() if score == "Medium"]
+
+    if not strengths and not developing:
+        return "developing"
+    if "Communication" in strengths and "Collaboration" in strengths:
+        return "social"
+    if "Content" in strengths and "Critical Thinking" in strengths:
+        return "analytical"
+    if "Creative Innovation" in strengths:
+        return "creative"
+    if "Confidence" in strengths:
+        return "confident"
+    return "balanced"
+
+
+def get_milestone_categories(scores: Dict[str, str]) -> Tuple[str, ...]:
+    """Choose up to 3 milestone categories: 1-2 strengths, a growth area, then medium areas."""
+    strengths = [cat for cat, score in scores.items() if score == "High"]
+    growth_areas = [cat for cat, score in scores.items() if score == "Low"]
+
+    focus_areas = []
+    # Add 1-2 strengths to build upon
+    if strengths:
+        focus_areas.extend(strengths[:2])
+
+    # Add 1 growth area to develop
+    if growth_areas:
+        focus_areas.append(growth_areas[0])
+
+    # If we don't have 3 areas yet, add from medium areas
+    if len(focus_areas) < 3:
+        medium_areas = [cat for cat, score in scores.items() if score == "Medium"]
+        focus_areas.extend(medium_areas[:3-len(focus_areas)])
+
+    # If still not enough, add more from the remaining categories
+    all_categories = list(scores.keys())
+    while len(focus_areas) < 3 and all_categories:
+        if all_categories[0] not in focus_areas:
+            focus_areas.append(all_categories[0])
+        all_categories.pop(0)
+
+    return tuple(focus_areas[:3])
+
+
+def build_profile(scores: Dict[str, str], code: Optional[int] = None) -> ProfileEntry:
+    """Derive a ProfileEntry from a scores dict (raises ValueError on invalid bands)."""
+    return ProfileEntry(
+        code=code,
+        scores=MappingProxyType(dict(scores)),
+        personality_label=get_personality_label(scores),
+        strengths=tuple(cat for cat, score in scores.items() if score == "High"),
+        developing=tuple(cat for cat, score in scores.items() if score == "Medium"),
+        growth_areas=tuple(cat for cat, score in scores.items() if score == "Low"),
+        learning_style=get_learning_style_key(scores),
+        milestone_focus=get_milestone_categories(scores),
+    )
+
+
+PROFILE_TABLE = tuple(build_profile(decode_profile(code), code) for code in range(PROFILE_COUNT))
+
+
+def get_profile(scores: Dict[str, str]) -> ProfileEntry:
+    """Return the precomputed entry for scores, or derive one for non-canonical dicts."""
+    code = encode_profile(scores)
+    if code is not None:
+        return PROFILE_TABLE[code]
+    if not isinstance(scores, dict):
+        scores = {}
+    return build_profile(scores)
@@ -0,0 +1,116 @@
+"""
+Query Cache
+In-process read-through cache for the hot database lookups, with a TTL, LRU
+eviction and tag-based invalidation by the write functions
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Set, Tuple
+
+# Entries kept before the least recently used is evicted
+DEFAULT_MAX_ENTRIES = 1024
+
+# Seconds an entry is served for; bounds staleness from writes made by other processes
+DEFAULT_TTL = 30.0
+
+
+class QueryCache:
+    """
+    Results of lookups keyed by query and parameters.
+
+    Each entry carries tags naming the rows it was read from, e.g.
+    ("assignment", token). Write functions invalidate the tags of the rows they
+    change, so only the affected entries are dropped. max_entries=0 turns the
+    cache off.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Tuple[Hashable, ...]]]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any], tags: Iterable[Hashable] = ()) -> Any:
+        """
+        Return the cached value for key, or call load() and cache what it returns.
+
+        Exceptions from load are not cached. A result loaded while one of the
+        cache's entries was invalidated is returned but not stored, since it may
+        predate that write.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            generation = self._generation
+
+        value = load()
+
+        with self._lock:
+            if self.max_entries > 0 and generation == self._generation:
+                tags = tuple(tags)
+                self._remove(key)
+                self._entries[key] = (now + self.ttl, value, tags)
+                for tag in tags:
+                    self._tags.setdefault(tag, set()).add(key)
+                while len(self._entries) > self.max_entries:
+                    self._remove(next(iter(self._entries)))
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, *tags: Hashable) -> None:
+        """Drop every entry carrying any of the tags."""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters, for the health check."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        """Drop one entry and its tag references; call with _lock held."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -1,3 +1,5 @@
+from types import MappingProxyType
+
 QUESTIONS = [
     # Communication
     {
@@ -141,4 +143,80 @@ CATEGORIES = {
     "Critical Thinking": "#FFCC99",
     "Creative Innovation": "#FF99CC",
     "Confidence": "#99CCFF"
-}
\ No newline at end of file
+}
+
+
+class QuestionBank:
+    """
+    Read-only index over a question list, built once at import.
+
+    Gives O(1) id -> question and id -> category lookups, the question ids of
+    each category, and contiguous integer codes for categories in their
+    declared order. Question order is frozen to the order of the source list.
+    """
+
+    __slots__ = ("ids", "categories", "category_codes", "_questions", "_category_by_id", "_ids_by_category", "_positions")
+
+    def __init__(self, questions, categories):
+        ids = tuple(q["id"] for q in questions)
+        if len(set(ids)) != len(ids):
+            raise ValueError("Question ids must be unique")
+        unknown = {q["category"] for q in questions} - set(categories)
+        if unknown:
+            raise ValueError(f"Questions reference unknown categories: {sorted(unknown)}")
+
+        setattr_ = object.__setattr__
+        setattr_(self, "ids", ids)
+        setattr_(self, "categories", tuple(categories))
+        setattr_(self, "category_codes", MappingProxyType({cat: code for code, cat in enumerate(categories)}))
+        setattr_(self, "_questions", MappingProxyType({q["id"]: MappingProxyType(dict(q)) for q in questions}))
+        setattr_(self, "_category_by_id", MappingProxyType({q["id"]: q["category"] for q in questions}))
+        setattr_(self, "_ids_by_category", MappingProxyType({
+            cat: tuple(q["id"] for q in questions if q["category"] == cat) for cat in categories
+        }))
+        setattr_(self, "_positions", MappingProxyType({q_id: pos for pos, q_id in enumerate(ids)}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("QuestionBank is immutable")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (self._questions[q_id] for q_id in self.ids)
+
+    def __contains__(self, q_id):
+        return q_id in self._questions
+
+    def get(self, q_id, default=None):
+        """Return the question with this id, or default if there is none."""
+        return self._questions.get(q_id, default)
+
+    def __getitem__(self, q_id):
+        return self._questions[q_id]
+
+    def category_of(self, q_id, default=None):
+        """Return the category name of a question id, or default if unknown."""
+        return self._category_by_id.get(q_id, default)
+
+    def category_code_of(self, q_id):
+        """Return the integer category code of a question id."""
+        return self.category_codes[self._category_by_id[q_id]]
+
+    def ids_for_category(self, category):
+        """Return the ids of the questions in a category, in frozen order."""
+        return self._ids_by_category[category]
+
+    def position(self, q_id):
+        """Return the zero-based position of a question id in the frozen order."""
+        return self._positions[q_id]
+
+    def next_unanswered(self, answered):
+        """Return the first question, in order, whose id is not in answered (or None)."""
+        for q_id in self.ids:
+            if q_id not in answered:
+                return self._questions[q_id]
+        return None
+
+
+QUESTION_BANK = QuestionBank(QUESTIONS, CATEGORIES)
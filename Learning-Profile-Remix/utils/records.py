@@ -0,0 +1,125 @@
+"""
+Typed Records
+Slotted, frozen row types for the small lookups in utils.database, built
+straight from the driver's rows without a DataFrame, with JSON columns decoded
+once as the record is built. Cached records are shared by every caller, so
+they are built complete and never modified afterwards
+"""
+
+import json
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, Mapping, Optional
+
+
+def decode_json_column(value: Optional[str], default: Any = None) -> Any:
+    """Decode a stored JSON column, or return default if it is empty or unreadable."""
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class _Record:
+    """
+    Dict-style access for the record dataclasses.
+
+    Pages and session state were built around the dicts the database functions
+    used to return, so records answer record['key'] and record.get('key').
+    """
+    __slots__ = ()
+
+    # Columns stored as JSON text, decoded with these defaults by from_row
+    json_columns: Mapping[str, Any] = {}
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any], prefix: str = "", **values):
+        """
+        Build a record from a row mapping, taking only the columns the record declares.
+
+        Fields passed as keyword values are taken as given instead of from the row.
+        """
+        for record_field in fields(cls):
+            key = prefix + record_field.name
+            if key in row and record_field.name not in values:
+                value = row[key]
+                if record_field.name in cls.json_columns:
+                    value = decode_json_column(value, cls.json_columns[record_field.name])
+                values[record_field.name] = value
+        return cls(**values)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def keys(self):
+        return [record_field.name for record_field in fields(self)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True, frozen=True)
+class AssessmentRecord(_Record):
+    """One assessment_results row, with scores and raw_responses decoded."""
+    id: int
+    child_name: Optional[str] = None
+    age: Optional[int] = None
+    scores: Dict[str, str] = field(default_factory=dict)
+    personality_label: Optional[str] = None
+    raw_responses: Optional[Dict[str, int]] = None
+    email: Optional[str] = None
+    birth_month: Optional[int] = None
+    birth_year: Optional[int] = None
+    instrument_id: Optional[str] = None
+    created_at: Optional[str] = None
+    created_at_formatted: Optional[str] = None
+
+    json_columns = {"scores": {}, "raw_responses": None}
+
+
+@dataclass(slots=True, frozen=True)
+class TeacherRecord(_Record):
+    """One teachers row."""
+    id: int
+    email: str
+    name: str
+    school: Optional[str] = None
+    grade_level: Optional[str] = None
+    ambassador_status: Optional[bool] = None
+    created_at: Optional[str] = None
+
+
+@dataclass(slots=True, frozen=True)
+class AssignmentRecord(_Record):
+    """
+    One profile_assignments row, with whatever joined columns the query selected.
+
+    teacher_name, school and grade_level come from the teacher, personality_label
+    and assessment from the linked assessment (None until the parent submits).
+    """
+    id: int
+    teacher_id: int
+    parent_email: str
+    child_name: Optional[str]
+    assignment_token: str
+    status: Optional[str] = None
+    assessment_id: Optional[int] = None
+    assigned_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    assigned_at_formatted: Optional[str] = None
+    completed_at_formatted: Optional[str] = None
+    teacher_name: Optional[str] = None
+    school: Optional[str] = None
+    grade_level: Optional[str] = None
+    personality_label: Optional[str] = None
+    assessment: Optional[AssessmentRecord] = None
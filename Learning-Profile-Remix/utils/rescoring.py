@@ -0,0 +1,53 @@
+"""
+Bulk Rescoring Job
+Recomputes stored scores and personality labels from raw_responses after a
+scoring change, streaming assessment_results in resumable chunks through the
+storage backend DATABASE_URL selects
+
+Run with: python -m utils.rescoring [--chunk-size N] [--restart] [--rebuild-norms] [--pack-responses]
+"""
+
+import argparse
+from typing import Callable, Dict, Optional
+
+from utils.database import QUERY_CACHE
+from utils.storage import Storage, open_storage
+
+
+def _print_progress(stats: Dict[str, float]) -> None:
+    print(f"{stats['processed']} rows ({stats['updated']} updated, {stats['skipped']} skipped) "
+          f"through id {stats['last_id']} at {stats['rows_per_second']:.0f} rows/s")
+
+
+def rescore_assessments(chunk_size: int = 10000, restart: bool = False,
+                        progress: Optional[Callable[[Dict[str, float]], None]] = _print_progress,
+                        storage: Optional[Storage] = None) -> Dict[str, float]:
+    """Rescore every assessment in storage, by default the backend DATABASE_URL selects; see Storage.rescore_assessments."""
+    storage = storage or open_storage()
+    return storage.rescore_assessments(chunk_size=chunk_size, restart=restart, progress=progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescore stored assessments from their raw responses.")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows scored and written per transaction")
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint and start from the first row")
+    parser.add_argument("--rebuild-norms", action="store_true", help="rebuild the population norms afterwards")
+    parser.add_argument("--pack-responses", action="store_true",
+                        help="first fill the packed raw_responses column for rows saved before it existed")
+    args = parser.parse_args()
+
+    storage = open_storage()
+    if args.pack_responses:
+        print(f"Packed responses for {storage.backfill_packed_responses(chunk_size=args.chunk_size)} assessments")
+
+    stats = rescore_assessments(chunk_size=args.chunk_size, restart=args.restart, storage=storage)
+    print(f"Done: {stats['processed']} rows in {stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/s)")
+    if args.rebuild_norms:
+        print(f"Norms rebuilt from {storage.rebuild_category_norms()} assessments")
+    if stats["updated"]:
+        # This process's cache is not the app's; running app processes drop their entries as they expire
+        print(f"Running app processes show the new scores within {QUERY_CACHE.ttl:g}s, as their cached lookups expire")
+
+
+if __name__ == "__main__":
+    main()
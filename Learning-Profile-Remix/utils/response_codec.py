@@ -0,0 +1,56 @@
+"""
+Packed Response Codec
+Stores a set of answers as 3 bits per question in the instrument's fixed question
+order (0 = unanswered), so 24 answers fit in 9 bytes
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.batch_scoring import DEFAULT_INSTRUMENT, responses_to_matrix
+from utils.instruments import Instrument
+
+BITS_PER_ANSWER = 3
+
+# Bit weights of one answer, most significant first
+_BIT_WEIGHTS = np.array([4, 2, 1], dtype=np.int8)
+
+
+def packed_size(question_count: int) -> int:
+    """Bytes needed to pack question_count answers."""
+    return (question_count * BITS_PER_ANSWER + 7) // 8
+
+
+def encode_matrix(matrix: np.ndarray) -> List[bytes]:
+    """Pack an N x questions response matrix into one blob per row."""
+    matrix = np.asarray(matrix)
+    if matrix.ndim != 2:
+        raise ValueError("Response matrix must be two-dimensional")
+    if matrix.size and (matrix.min() < 0 or matrix.max() >= 1 << BITS_PER_ANSWER):
+        raise ValueError("Response values must fit in 3 bits")
+    bits = (matrix[:, :, None].astype(np.uint8) >> np.arange(BITS_PER_ANSWER - 1, -1, -1, dtype=np.uint8)) & 1
+    packed = np.packbits(bits.reshape(len(matrix), -1), axis=1)
+    return [row.tobytes() for row in packed]
+
+
+def decode_matrix(blobs: Sequence[bytes], question_count: int) -> np.ndarray:
+    """Unpack blobs written by encode_matrix into an N x questions int8 matrix."""
+    size = packed_size(question_count)
+    if any(len(blob) != size for blob in blobs):
+        raise ValueError(f"Packed responses must be {size} bytes")
+    packed = np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(len(blobs), size)
+    bits = np.unpackbits(packed, axis=1)[:, :question_count * BITS_PER_ANSWER]
+    return (bits.reshape(len(blobs), question_count, BITS_PER_ANSWER).astype(np.int8) @ _BIT_WEIGHTS).astype(np.int8)
+
+
+def encode_responses(responses: Dict[Any, int], instrument: Optional[Instrument] = None) -> bytes:
+    """Pack one response dict; raises ValueError on invalid values like calculate_scores."""
+    return encode_matrix(responses_to_matrix([responses], instrument or DEFAULT_INSTRUMENT))[0]
+
+
+def decode_responses(blob: bytes, instrument: Optional[Instrument] = None) -> Dict[int, int]:
+    """Unpack one blob into {question_id: value}, leaving out unanswered questions."""
+    question_bank = (instrument or DEFAULT_INSTRUMENT).question_bank
+    row = decode_matrix([blob], len(question_bank))[0].tolist()
+    return {q_id: value for q_id, value in zip(question_bank.ids, row) if value}
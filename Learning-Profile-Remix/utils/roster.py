@@ -0,0 +1,105 @@
+"""
+Roster Import
+Reads a teacher's class roster (CSV or XLSX), validates it column-wise and
+generates the assignment tokens for every row at once
+"""
+
+import base64
+import io
+import os
+from pathlib import Path
+from typing import BinaryIO, Dict, Tuple, Union
+
+import pandas as pd
+
+# Same rule as the single-assignment form, applied to a whole column
+EMAIL_PATTERN = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+
+# Header spellings accepted for each roster column, compared lowercased
+COLUMN_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "parent_email": ("parent_email", "parent email", "email", "parent e-mail", "guardian email"),
+    "child_name": ("child_name", "child name", "student name", "student", "child", "name"),
+}
+
+# Largest roster accepted in one upload
+MAX_ROSTER_ROWS = 50000
+
+# Random bytes per token: a multiple of 3, so each token is exactly 44 base64 characters
+TOKEN_BYTES = 33
+TOKEN_LENGTH = TOKEN_BYTES // 3 * 4
+
+
+def read_roster(source: Union[BinaryIO, bytes], filename: str) -> pd.DataFrame:
+    """
+    Read an uploaded roster into a DataFrame of strings.
+
+    Raises ValueError for an unsupported file type, or for XLSX files when
+    openpyxl is not installed.
+    """
+    data = io.BytesIO(source) if isinstance(source, bytes) else source
+    suffix = Path(filename).suffix.lower()
+    if suffix == ".csv":
+        return pd.read_csv(data, dtype=str, keep_default_na=False)
+    if suffix in (".xlsx", ".xlsm"):
+        try:
+            return pd.read_excel(data, dtype=str, keep_default_na=False, engine="openpyxl")
+        except ImportError:
+            raise ValueError("Reading XLSX rosters needs openpyxl; upload a CSV instead") from None
+    raise ValueError(f"Unsupported roster file type: {suffix or filename!r}")
+
+
+def normalize_columns(roster: pd.DataFrame) -> pd.DataFrame:
+    """Rename recognised headers to parent_email and child_name; raises ValueError if either is missing."""
+    renames = {}
+    for column in roster.columns:
+        key = str(column).strip().lower()
+        for name, aliases in COLUMN_ALIASES.items():
+            if key in aliases and name not in renames.values():
+                renames[column] = name
+    missing = [name for name in COLUMN_ALIASES if name not in renames.values()]
+    if missing:
+        raise ValueError(f"Roster is missing column(s): {', '.join(missing)}")
+    return roster.rename(columns=renames)[list(COLUMN_ALIASES)]
+
+
+def validate_roster(roster: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Split a roster into rows ready to assign and rows with problems.
+
+    Every check runs on whole columns. Returns (valid, rejected); rejected keeps
+    the spreadsheet row number and an error message per row.
+    """
+    if len(roster) > MAX_ROSTER_ROWS:
+        raise ValueError(f"Roster has {len(roster)} rows; the limit is {MAX_ROSTER_ROWS}")
+    roster = normalize_columns(roster)
+    roster = pd.DataFrame({
+        "row": roster.index + 2,   # header is line 1
+        "parent_email": roster["parent_email"].astype(str).str.strip(),
+        "child_name": roster["child_name"].astype(str).str.strip(),
+    })
+
+    error = pd.Series("", index=roster.index)
+    error = error.mask(~roster["parent_email"].str.fullmatch(EMAIL_PATTERN), "Invalid parent email")
+    error = error.mask(roster["child_name"] == "", "Missing student name")
+    duplicate = roster.duplicated(["parent_email", "child_name"], keep="first")
+    error = error.mask((error == "") & duplicate, "Duplicate of an earlier row")
+
+    rejected = roster[error != ""].assign(error=error[error != ""])
+    return roster[error == ""].reset_index(drop=True), rejected.reset_index(drop=True)
+
+
+def generate_tokens(count: int) -> list:
+    """
+    Generate count URL-safe assignment tokens from one read of the OS random source.
+
+    Each token carries TOKEN_BYTES random bytes, more than secrets.token_urlsafe(32).
+    """
+    encoded = base64.urlsafe_b64encode(os.urandom(TOKEN_BYTES * count)).decode()
+    return [encoded[start:start + TOKEN_LENGTH] for start in range(0, len(encoded), TOKEN_LENGTH)]
+
+
+def links_csv(assignments: pd.DataFrame) -> bytes:
+    """The downloadable links file: one row per created assignment with its link."""
+    links = assignments[["parent_email", "child_name", "assignment_token"]].assign(
+        assignment_link="?token=" + assignments["assignment_token"])
+    return links.to_csv(index=False).encode()
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from utils.questions import QUESTIONS, LIKERT_SCALE, CATEGORIES
+from utils.questions import QUESTION_BANK, LIKERT_SCALE, CATEGORIES
+from utils.batch_scoring import LOW_THRESHOLD, MEDIUM_THRESHOLD
 
 def get_personality_label(scores):
     """Generate a fun personality label based on top scoring categories."""
@@ -61,10 +62,9 @@ def calculate_scores(responses):
 
     # Calculate total scores per category
     for q_id, response in responses.items():
-        question = next((q for q in QUESTIONS if q["id"] == q_id), None)
-        if question is None:
+        category = QUESTION_BANK.category_of(q_id)
+        if category is None:
             continue
-        category = question["category"]
         category_scores[category] += response
         category_counts[category] += 1
 
@@ -73,17 +73,76 @@ def calculate_scores(responses):
     for category in category_scores:
         if category_counts[category] > 0:
             avg_score = category_scores[category] / category_counts[category]
-            if avg_score <= 2.5:
-                final_scores[category] = "Low"
-            elif avg_score <= 3.75:
-                final_scores[category] = "Medium"
-            else:
-                final_scores[category] = "High"
+            final_scores[category] = get_score_band(avg_score)
         else:
             final_scores[category] = "Low"  # Default to low if no responses
 
     return final_scores
 
+def get_score_band(avg_score):
+    """Map a category average to its High/Medium/Low band."""
+    if avg_score <= LOW_THRESHOLD:
+        return "Low"
+    elif avg_score <= MEDIUM_THRESHOLD:
+        return "Medium"
+    return "High"
+
+class RunningScores:
+    """Per-category sums and counts kept current as quiz answers are added or undone."""
+
+    def __init__(self):
+        self.answers = {}
+        self.sums = {category: 0 for category in CATEGORIES}
+        self.counts = {category: 0 for category in CATEGORIES}
+
+    @classmethod
+    def from_responses(cls, responses):
+        """Rebuild running scores from a responses dict."""
+        if not isinstance(responses, dict):
+            raise ValueError("Responses must be a dictionary")
+        running = cls()
+        for q_id, response in responses.items():
+            running.record(q_id, response)
+        return running
+
+    def __len__(self):
+        return len(self.answers)
+
+    def record(self, q_id, response):
+        """Add an answer, replacing any earlier answer to the same question."""
+        if response not in LIKERT_SCALE.values():
+            raise ValueError("Invalid response values detected")
+        category = QUESTION_BANK.category_of(q_id)
+        if category is None:
+            return
+        self.remove(q_id)
+        self.answers[q_id] = response
+        self.sums[category] += response
+        self.counts[category] += 1
+
+    def remove(self, q_id):
+        """Undo the answer to a question, if there is one."""
+        response = self.answers.pop(q_id, None)
+        if response is None:
+            return
+        category = QUESTION_BANK.category_of(q_id)
+        self.sums[category] -= response
+        self.counts[category] -= 1
+
+    def scores(self):
+        """Return the same category bands calculate_scores gives for the recorded answers."""
+        return {
+            category: get_score_band(self.sums[category] / self.counts[category]) if self.counts[category] > 0 else "Low"
+            for category in CATEGORIES
+        }
+
+    def answered_scores(self):
+        """Return bands only for categories that have at least one answer."""
+        return {
+            category: get_score_band(self.sums[category] / self.counts[category])
+            for category in CATEGORIES if self.counts[category] > 0
+        }
+
 def get_category_description(category):
     """Get the description for a category."""
     descriptions = {
@@ -97,90 +156,31 @@ def get_category_description(category):
     return descriptions.get(category, "")
 
 def generate_description(scores, child_name=None, age=None):
-    """Generate a written description of the results."""
-    try:
-        # Validate inputs
-        if not isinstance(scores, dict) or not scores:
-            raise ValueError("Invalid scores provided")
-
-        # Convert individual ratings into a narrative
-        strengths = [cat for cat, score in scores.items() if score == "High"]
-        developing = [cat for cat, score in scores.items() if score == "Medium"]
-        growth_areas = [cat for cat, score in scores.items() if score == "Low"]
-
-        # Format name properly for sentence starts
-        child_text = child_name if child_name else "your child"  # lowercase for mid-sentence
-        sentence_start_text = child_name if child_name else "Your child"  # Capitalized for sentence starts
-
-        # Display results sections
-        if strengths:
-            strength_list = []
-            for cat in strengths:
-                desc = get_category_description(cat)
-                strength_list.append(f"**{cat}** ({desc})")
-
-            strength_text = " and ".join(strength_list) if len(strength_list) == 2 else \
-                          ", ".join(strength_list[:-1]) + ", and " + strength_list[-1] if len(strength_list) > 2 else \
-                          strength_list[0]
-
-            st.subheader(f"{sentence_start_text}'s Superpowers!")
-            st.write(f"Wow! {sentence_start_text} shows amazing abilities in {strength_text}! These natural talents make them truly special and can help them soar in their learning journey! 🌟")
-
-            if age:
-                st.write("Here are some fun ways to celebrate these superpowers:")
-                for category in strengths:
-                    activities = get_age_appropriate_activities(category, age)
-                    st.write(f"\n**{category}:**")
-                    for activity in activities:
-                        st.write(f"• {activity}")
-
-        if developing:
-            developing_list = []
-            for cat in developing:
-                desc = get_category_description(cat)
-                developing_list.append(f"**{cat}** ({desc})")
-
-            developing_text = " and ".join(developing_list) if len(developing_list) == 2 else \
-                            ", ".join(developing_list[:-1]) + ", and " + developing_list[-1] if len(developing_list) > 2 else \
-                            developing_list[0]
-
-            st.subheader("Growing Strengths")
-            st.write(f"{sentence_start_text} is making great progress in {developing_text}. These skills are like seeds that are starting to sprout! With a little care and practice, they'll grow into new superpowers! 🌱")
-
-            if age:
-                st.write("Try these fun activities to help these skills grow:")
-                for category in developing:
-                    activities = get_age_appropriate_activities(category, age)
-                    st.write(f"\n**{category}:**")
-                    for activity in activities:
-                        st.write(f"• {activity}")
-
-        if growth_areas:
-            growth_list = []
-            for cat in growth_areas:
-                desc = get_category_description(cat)
-                growth_list.append(f"**{cat}** ({desc})")
-
-            growth_text = " and ".join(growth_list) if len(growth_list) == 2 else \
-                         ", ".join(growth_list[:-1]) + ", and " + growth_list[-1] if len(growth_list) > 2 else \
-                         growth_list[0]
-
-            st.subheader("Adventure Areas")
-            st.write(f"Every superhero has new powers to discover! Let's explore how {child_text} can grow in {growth_text} through these fun activities:")
-
-            if age:
-                for category in growth_areas:
-                    activities = get_age_appropriate_activities(category, age)
-                    st.write(f"\n**{category}:**")
-                    for activity in activities:
-                        st.write(f"• {activity}")
+    """Render the written description of the results."""
+    from utils.narrative import build_narrative
 
+    try:
+        render_narrative(build_narrative(scores, child_name, age))
         return True
 
     except Exception as e:
         st.error(f"An error occurred while generating the description: {str(e)}")
         return False
 
+def render_narrative(narrative):
+    """Write a narrative built by utils.narrative to the Streamlit page."""
+    for section in narrative.sections:
+        st.subheader(section.heading)
+        for sentence in section.sentences:
+            st.write(sentence)
+
+        if section.activity_intro:
+            st.write(section.activity_intro)
+        for category, activities in section.activities:
+            st.write(f"\n**{category}:**")
+            for activity in activities:
+                st.write(f"• {activity}")
+
 def get_age_appropriate_activities(category, age):
     """Get age-appropriate activities for a category."""
     activities = {
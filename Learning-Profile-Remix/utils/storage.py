@@ -0,0 +1,286 @@
+"""
+Storage Backends
+The interface the app stores assessments, teachers and assignments through,
+with the SQLite implementation and the choice of backend from DATABASE_URL
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import sqlalchemy.exc
+import streamlit as st
+
+from utils import database
+from utils.instruments import DEFAULT_INSTRUMENT_ID
+from utils.norms import peer_percentiles
+
+# Environment variable naming the database; a postgres:// or postgresql:// URL selects PostgreSQL
+DATABASE_URL_ENV = "DATABASE_URL"
+
+POSTGRES_SCHEMES = ("postgres://", "postgresql://")
+
+
+class Storage(ABC):
+    """
+    Everything the app reads and writes, whatever database holds it.
+
+    Methods mirror the functions in utils.database and follow the same
+    conventions: lookups return records (see utils.records), failures are
+    reported with st.error and return None, [] or False, and the batch
+    methods save_pending_writes, iter_assessment_chunks,
+    rescore_assessments and dedupe_assessments raise instead.
+    """
+
+    # Errors meaning the database could not be reached, as opposed to a write it rejected
+    unavailable_errors: Tuple[type, ...] = (ConnectionError, TimeoutError)
+
+    def __init__(self):
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    # Schema
+
+    @abstractmethod
+    def init_db(self) -> bool:
+        """Bring the schema up to the backend's latest migration."""
+
+    def ensure_schema(self) -> int:
+        """Run init_db once for this storage; raises if it fails, so the next call retries."""
+        with self._schema_lock:
+            if not self._schema_ready:
+                if not self.init_db():
+                    raise RuntimeError("Database schema could not be brought up to date")
+                self._schema_ready = True
+        return self.schema_version
+
+    @property
+    @abstractmethod
+    def schema_version(self) -> int:
+        """Version of the backend's latest migration."""
+
+    # Assessments
+
+    @abstractmethod
+    def save_assessment_result(self, child_name, age, scores, personality_label, raw_responses, email, birth_month,
+                               birth_year, instrument_id=DEFAULT_INSTRUMENT_ID, submission_key=None) -> Optional[int]:
+        """Save one assessment and return its id; a submission_key already stored returns that row's id instead."""
+
+    @abstractmethod
+    def save_pending_writes(self, assessments, completions) -> Dict[str, int]:
+        """Write queued saves and completions in one transaction; returns {key: id} and raises on failure."""
+
+    @abstractmethod
+    def get_assessments_page(self, email=None, child_name=None, page_size=20, cursor=None) -> Tuple[List, Optional[str]]:
+        """One page of assessments by email or child name, newest first, and the next page's cursor."""
+
+    def get_previous_assessments(self, email=None, child_name=None, limit=50) -> List:
+        """The first page of assessments by email or child name."""
+        rows, _ = self.get_assessments_page(email=email, child_name=child_name, page_size=limit)
+        return rows
+
+    @abstractmethod
+    def iter_assessment_chunks(self, chunk_size=5000) -> Iterator[pd.DataFrame]:
+        """Every assessment, without raw answers, in id order as DataFrames; raises on failure."""
+
+    # Teachers and assignments
+
+    @abstractmethod
+    def create_teacher_account(self, email, name, school=None, grade_level=None) -> Optional[int]:
+        """Create a teacher and return their id, or None if the email is taken."""
+
+    @abstractmethod
+    def get_teacher_by_email(self, email):
+        """A TeacherRecord, or None."""
+
+    @abstractmethod
+    def create_assignment(self, teacher_id, parent_email, child_name, assignment_token) -> Optional[int]:
+        """Create one assignment and return its id."""
+
+    @abstractmethod
+    def create_assignments(self, teacher_id, assignments) -> List[int]:
+        """Create (parent_email, child_name, assignment_token) assignments all or nothing; returns their ids."""
+
+    @abstractmethod
+    def get_assignment_by_token(self, assignment_token):
+        """An AssignmentRecord with its teacher's details, or None."""
+
+    @abstractmethod
+    def get_assignment_results(self, teacher_id, assignment_id):
+        """One of a teacher's assignments with its teacher and assessment, or None."""
+
+    @abstractmethod
+    def get_teacher_assignments_page(self, teacher_id, page_size=20, cursor=None, status=None) -> Tuple[List, Optional[str]]:
+        """One page of a teacher's assignments, newest first, and the next page's cursor."""
+
+    def get_teacher_assignments(self, teacher_id, limit=50) -> List:
+        """The first page of a teacher's assignments."""
+        rows, _ = self.get_teacher_assignments_page(teacher_id, page_size=limit)
+        return rows
+
+    @abstractmethod
+    def complete_assignment(self, assignment_token, assessment_id) -> bool:
+        """Mark an assignment completed with its assessment."""
+
+    # Admin, norms and maintenance
+
+    @abstractmethod
+    def get_admin_statistics(self) -> Dict[str, Any]:
+        """Counters, daily activity and the latest assessments for the admin dashboard."""
+
+    @abstractmethod
+    def rebuild_admin_statistics(self) -> bool:
+        """Recompute the admin statistics from the tables."""
+
+    @abstractmethod
+    def get_db_health(self) -> Dict[str, Any]:
+        """Probe the database; includes ok, latency_ms, pool and query_cache."""
+
+    @abstractmethod
+    def get_cohort_histograms(self, cohort_type, cohort_value) -> Dict[str, Any]:
+        """The norms histogram of every category for one cohort."""
+
+    def get_peer_percentiles(self, responses, age=None, birth_year=None):
+        """(cohort_type, {category: percentile}) against the narrowest cohort large enough."""
+        return peer_percentiles(responses, age, birth_year, self.get_cohort_histograms)
+
+    @abstractmethod
+    def rebuild_category_norms(self, chunk_size=5000) -> int:
+        """Rebuild the norms histograms; returns the number of assessments counted."""
+
+    @abstractmethod
+    def backfill_packed_responses(self, chunk_size=5000) -> int:
+        """Pack the answers of rows saved before the packed column; returns the number packed."""
+
+    @abstractmethod
+    def backfill_assessment_scores(self, chunk_size=5000) -> int:
+        """Fill assessment_scores for assessments without score rows; returns the number scored."""
+
+    @abstractmethod
+    def rescore_assessments(self, chunk_size=10000, restart=False,
+                            progress: Optional[Callable[[Dict[str, float]], None]] = None) -> Dict[str, float]:
+        """Rescore every assessment from its answers in resumable chunks; returns the job's stats and raises on failure."""
+
+    @abstractmethod
+    def dedupe_assessments(self, chunk_size=10000, window_minutes=database.DUPLICATE_WINDOW_MINUTES, restart=False,
+                           dry_run=False,
+                           progress: Optional[Callable[[Dict[str, float]], None]] = None) -> Dict[str, float]:
+        """Delete repeated assessments in resumable chunks, keeping the earliest; returns the job's stats and raises on failure."""
+
+    # Score rollups, grouped in the database over assessment_scores
+
+    @abstractmethod
+    def get_band_counts(self, since=None, until=None, teacher_id=None, school=None) -> Dict[str, Dict[str, int]]:
+        """{category: {band label: count}}, optionally bounded by date, teacher or school."""
+
+    @abstractmethod
+    def get_category_trends(self, period="month", since=None, until=None, teacher_id=None, school=None) -> List[Dict]:
+        """Assessments, mean average and band counts per period and category."""
+
+
+class SQLiteStorage(Storage):
+    """The local SQLite file behind utils.database's st.connection."""
+
+    # OperationalError covers a locked, missing or full database file
+    unavailable_errors = Storage.unavailable_errors + (sqlalchemy.exc.OperationalError,
+                                                       sqlalchemy.exc.DisconnectionError, sqlalchemy.exc.TimeoutError)
+
+    @property
+    def schema_version(self) -> int:
+        return database.SCHEMA_VERSION
+
+    def init_db(self):
+        return database.init_db()
+
+    def ensure_schema(self):
+        return database.ensure_schema()
+
+    def save_assessment_result(self, child_name, age, scores, personality_label, raw_responses, email, birth_month,
+                               birth_year, instrument_id=DEFAULT_INSTRUMENT_ID, submission_key=None):
+        return database.save_assessment_result(child_name, age, scores, personality_label, raw_responses, email,
+                                               birth_month, birth_year, instrument_id, submission_key)
+
+    def save_pending_writes(self, assessments, completions):
+        return database.save_pending_writes(assessments, completions)
+
+    def get_assessments_page(self, email=None, child_name=None, page_size=20, cursor=None):
+        return database.get_assessments_page(email, child_name, page_size, cursor)
+
+    def iter_assessment_chunks(self, chunk_size=5000):
+        return database.iter_assessment_chunks(chunk_size)
+
+    def create_teacher_account(self, email, name, school=None, grade_level=None):
+        return database.create_teacher_account(email, name, school, grade_level)
+
+    def get_teacher_by_email(self, email):
+        return database.get_teacher_by_email(email)
+
+    def create_assignment(self, teacher_id, parent_email, child_name, assignment_token):
+        return database.create_assignment(teacher_id, parent_email, child_name, assignment_token)
+
+    def create_assignments(self, teacher_id, assignments):
+        return database.create_assignments(teacher_id, assignments)
+
+    def get_assignment_by_token(self, assignment_token):
+        return database.get_assignment_by_token(assignment_token)
+
+    def get_assignment_results(self, teacher_id, assignment_id):
+        return database.get_assignment_results(teacher_id, assignment_id)
+
+    def get_teacher_assignments_page(self, teacher_id, page_size=20, cursor=None, status=None):
+        return database.get_teacher_assignments_page(teacher_id, page_size, cursor, status)
+
+    def complete_assignment(self, assignment_token, assessment_id):
+        return database.complete_assignment(assignment_token, assessment_id)
+
+    def get_admin_statistics(self):
+        return database.get_admin_statistics()
+
+    def rebuild_admin_statistics(self):
+        return database.rebuild_admin_statistics()
+
+    def get_db_health(self):
+        return database.get_db_health()
+
+    def get_cohort_histograms(self, cohort_type, cohort_value):
+        return database.get_cohort_histograms(cohort_type, cohort_value)
+
+    def rebuild_category_norms(self, chunk_size=5000):
+        return database.rebuild_category_norms(chunk_size)
+
+    def backfill_packed_responses(self, chunk_size=5000):
+        return database.backfill_packed_responses(chunk_size)
+
+    def backfill_assessment_scores(self, chunk_size=5000):
+        return database.backfill_assessment_scores(chunk_size)
+
+    def rescore_assessments(self, chunk_size=10000, restart=False, progress=None):
+        return database.rescore_assessments(chunk_size, restart, progress)
+
+    def dedupe_assessments(self, chunk_size=10000, window_minutes=database.DUPLICATE_WINDOW_MINUTES, restart=False,
+                           dry_run=False, progress=None):
+        return database.dedupe_assessments(chunk_size, window_minutes, restart, dry_run, progress)
+
+    def get_band_counts(self, since=None, until=None, teacher_id=None, school=None):
+        return database.get_band_counts(since, until, teacher_id, school)
+
+    def get_category_trends(self, period="month", since=None, until=None, teacher_id=None, school=None):
+        return database.get_category_trends(period, since, until, teacher_id, school)
+
+
+def open_storage(url: Optional[str] = None) -> Storage:
+    """The backend for a database URL, by default DATABASE_URL; SQLite unless it names PostgreSQL."""
+    url = url if url is not None else os.environ.get(DATABASE_URL_ENV, "")
+    if url.startswith(POSTGRES_SCHEMES):
+        # Imported only when selected, so SQLite deployments don't need psycopg2
+        from utils.postgres_storage import PostgresStorage
+        return PostgresStorage(url)
+    return SQLiteStorage()
+
+
+@st.cache_resource
+def get_storage() -> Storage:
+    """The app's storage backend, opened once per process."""
+    return open_storage()
@@ -5,6 +5,8 @@ Provides classroom-focused recommendations based on learning profiles
 
 from typing import Dict, List, Any
 
+from utils.profiles import get_profile
+
 CLASSROOM_STRATEGIES = {
     "Communication": {
         "high": {
@@ -383,9 +385,10 @@ CLASSROOM_STRATEGIES = {
 def get_teacher_insights(scores: Dict[str, str], child_name: str, child_age: int) -> Dict[str, Any]:
     """Generate teacher-specific insights for classroom use"""
     
-    strengths = [cat for cat, score in scores.items() if score == "High"]
-    growth_areas = [cat for cat, score in scores.items() if score == "Low"]
-    developing_areas = [cat for cat, score in scores.items() if score == "Medium"]
+    profile = get_profile(scores)
+    strengths = list(profile.strengths)
+    growth_areas = list(profile.growth_areas)
+    developing_areas = list(profile.developing)
     
     # Generate classroom behavior summary
     behavior_summary = generate_classroom_behavior_summary(scores, child_name)
@@ -0,0 +1,333 @@
+"""
+Write-Behind Queue
+Takes assessment saves and assignment completions off the request path: each is
+appended to a durable local spool file and given a provisional id at once, and a
+background thread writes them to the database in batched transactions, backing
+off while the database is unavailable
+"""
+
+import atexit
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import streamlit as st
+
+from utils.storage import get_storage
+
+DEFAULT_SPOOL_PATH = "learning_profiles.spool.jsonl"
+
+# Provisional ids look like "pending:<hex>" until their batch is written
+PROVISIONAL_PREFIX = "pending:"
+
+
+class WriteBehindQueue:
+    """
+    In-process queue of pending database writes, backed by an append-only spool.
+
+    Every submission is appended to the spool and fsynced before it is
+    acknowledged, so a restart or a power cut replays anything not yet written.
+    Submissions arriving together share one fsync. After each successful batch
+    the spool is rewritten with only the writes still pending. A crash between
+    a batch commit and that rewrite replays the batch on the next start; each
+    assessment is saved with its provisional id as submission key, so the
+    replay finds the rows already written instead of duplicating them.
+
+    While the database is unavailable the flusher retries with exponential
+    backoff, from flush_interval up to max_retry_interval, and submissions keep
+    going to the spool without waiting on it. A batch the database rejects for
+    any other reason is written one entry at a time; entries that still fail
+    are moved to the dead-letter spool next to the spool, so one bad entry
+    cannot hold up everything queued behind it.
+
+    The database ids of written submissions are remembered for resolve(),
+    keeping only the max_resolved most recent so a long-running process does
+    not grow without bound.
+    """
+
+    def __init__(self, spool_path: Union[str, Path] = DEFAULT_SPOOL_PATH, flush_interval: float = 0.5,
+                 max_batch: int = 500, max_retry_interval: float = 30.0, max_resolved: int = 10000):
+        self.spool_path = Path(spool_path)
+        self.dead_letter_path = self.spool_path.with_suffix(".dead.jsonl")
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_retry_interval = max_retry_interval
+        self.max_resolved = max_resolved
+        self.resolved: "OrderedDict[str, int]" = OrderedDict()
+        self.last_error: Optional[str] = None
+        self.dead_letter_error: Optional[str] = None
+        self.dead_letters = 0
+        if self.dead_letter_path.exists():
+            with self.dead_letter_path.open(encoding="utf-8") as dead:
+                self.dead_letters = sum(1 for _ in dead)
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Group commit: lines appended so far, and how many of them an fsync has covered
+        self._spool = None
+        self._appended = 0
+        self._synced = 0
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._replay()
+
+    def _replay(self) -> None:
+        """Load writes left in the spool by a previous run."""
+        if not self.spool_path.exists():
+            return
+        torn = False
+        with self.spool_path.open(encoding="utf-8") as spool:
+            for line in spool:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A partly written last line from a crash mid-append
+                    torn = True
+                    continue
+                if entry.get("op") == "assessment":
+                    # JSON turned the question ids into strings; a malformed entry is
+                    # kept as is and dead-lettered when its batch is written
+                    try:
+                        fields = entry["fields"]
+                        fields["raw_responses"] = {int(q_id): value for q_id, value in fields["raw_responses"].items()}
+                    except (KeyError, TypeError, ValueError, AttributeError):
+                        pass
+                self._pending.append(entry)
+        if torn:
+            # Appending after a torn line would run the next entry into it
+            with self._lock:
+                self._rewrite_spool()
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            if self._spool is None:
+                self._spool = self.spool_path.open("a", encoding="utf-8")
+            self._spool.write(line)
+            self._spool.flush()
+            self._pending.append(entry)
+            self._appended += 1
+            appended = self._appended
+            backlog = len(self._pending)
+        self._sync(appended)
+        if backlog >= self.max_batch:
+            self._wake.set()
+
+    def _sync(self, appended: int) -> None:
+        """
+        Return once the first appended spool lines are on disk.
+
+        One fsync covers every line written before it starts, so callers that
+        queue behind a running fsync usually find their line already covered.
+        """
+        with self._sync_lock:
+            if self._synced >= appended:
+                return
+            with self._lock:
+                target = self._appended
+                # A rewrite since the append has already fsynced a spool holding the line
+                descriptor = os.dup(self._spool.fileno()) if self._spool is not None else None
+            if descriptor is not None:
+                try:
+                    os.fsync(descriptor)
+                finally:
+                    os.close(descriptor)
+            self._synced = max(self._synced, target)
+
+    def submit_assessment(self, submission_key: Optional[str] = None, **fields) -> str:
+        """
+        Queue a save_assessment_result call and return its provisional id.
+
+        The provisional id is saved as the row's submission key. Submitting the
+        same client-generated submission_key again returns the same id, and the
+        assessment is still saved only once.
+        """
+        provisional_id = f"{PROVISIONAL_PREFIX}{submission_key or uuid.uuid4().hex}"
+        self._append({"op": "assessment", "id": provisional_id, "fields": fields})
+        return provisional_id
+
+    def submit_completion(self, assignment_token: str, assessment_id: Union[int, str]) -> None:
+        """Queue a complete_assignment call; assessment_id may be a provisional id."""
+        self._append({"op": "complete", "token": assignment_token, "assessment_id": assessment_id})
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def resolve(self, assessment_id: Union[int, str]) -> Optional[int]:
+        """
+        Return the database id for an id, or None while it is still provisional.
+
+        Also None once a written id is older than the max_resolved most recent.
+        """
+        if isinstance(assessment_id, str) and assessment_id.startswith(PROVISIONAL_PREFIX):
+            return self.resolved.get(assessment_id)
+        return assessment_id
+
+    def status(self) -> Dict[str, Any]:
+        """Pending and dead-lettered writes and the latest errors, for the health display."""
+        return {"pending": self.pending_count(), "last_error": self.last_error, "dead_letters": self.dead_letters,
+                "dead_letter_path": str(self.dead_letter_path), "dead_letter_error": self.dead_letter_error}
+
+    def flush(self) -> int:
+        """
+        Write everything pending in batches of max_batch; returns the number of writes flushed.
+
+        Raises, keeping the writes queued, if the database is unavailable.
+        """
+        flushed = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.max_batch]
+                if not batch:
+                    return flushed
+
+                storage = get_storage()
+                try:
+                    self._write(storage, batch)
+                except storage.unavailable_errors:
+                    raise
+                except Exception as e:
+                    print(f"Write-behind batch rejected, writing its {len(batch)} entries one at a time: {e}")
+                    self._write_singly(storage, batch)
+                else:
+                    self._remove_written(len(batch))
+                flushed += len(batch)
+
+    def _write(self, storage, entries: List[Dict[str, Any]]) -> None:
+        """Write entries in one transaction and record the ids their assessments got."""
+        assessments = [(entry["id"], entry["fields"]) for entry in entries if entry["op"] == "assessment"]
+        completions = [(entry["token"], self.resolved.get(entry["assessment_id"], entry["assessment_id"]))
+                       for entry in entries if entry["op"] == "complete"]
+        keys = {key for key, _ in assessments}
+        for token, assessment_id in completions:
+            if isinstance(assessment_id, str) and assessment_id not in keys:
+                raise ValueError(f"Completion of {token} refers to an assessment that was not saved")
+        self.resolved.update(storage.save_pending_writes(assessments, completions))
+
+    def _write_singly(self, storage, batch: List[Dict[str, Any]]) -> None:
+        """
+        Write a rejected batch entry by entry and dead-letter the entries that fail.
+
+        A completion whose assessment was dead-lettered is never resolved, so it
+        follows. If the database becomes unavailable part way, the entries not
+        yet tried stay queued and the error is raised.
+        """
+        dead = []
+        for position, entry in enumerate(batch):
+            try:
+                self._write(storage, [entry])
+            except storage.unavailable_errors:
+                self._dead_letter(dead)
+                self._remove_written(position)
+                raise
+            except Exception as e:
+                dead.append((entry, f"{type(e).__name__}: {e}"))
+        self._dead_letter(dead)
+        self._remove_written(len(batch))
+
+    def _dead_letter(self, dead: List) -> None:
+        """Append (entry, error) pairs to the dead-letter spool, on disk before they leave the spool."""
+        if not dead:
+            return
+        failed_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.dead_letter_path.open("a", encoding="utf-8") as spool:
+            spool.writelines(json.dumps({"entry": entry, "error": error, "failed_at": failed_at}, default=str) + "\n"
+                             for entry, error in dead)
+            spool.flush()
+            os.fsync(spool.fileno())
+        self.dead_letters += len(dead)
+        self.dead_letter_error = dead[-1][1]
+        print(f"Write-behind moved {len(dead)} writes to {self.dead_letter_path}: {self.dead_letter_error}")
+
+    def _remove_written(self, count: int) -> None:
+        """Drop the first count pending writes, now written or dead-lettered, and rewrite the spool."""
+        with self._lock:
+            del self._pending[:count]
+            # Completions still queued now point at real ids, so the spool never
+            # holds a provisional id whose assessment was already written
+            for entry in self._pending:
+                if entry.get("op") == "complete" and entry.get("assessment_id") in self.resolved:
+                    entry["assessment_id"] = self.resolved[entry["assessment_id"]]
+            # Nothing queued refers to a provisional id any more, so the oldest can go
+            while len(self.resolved) > self.max_resolved:
+                self.resolved.popitem(last=False)
+            self._rewrite_spool()
+
+    def _rewrite_spool(self) -> None:
+        """Replace the spool with the writes still pending; call with _lock held."""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        if not self._pending:
+            self.spool_path.unlink(missing_ok=True)
+            return
+        tmp_path = self.spool_path.with_name(self.spool_path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as spool:
+            spool.writelines(json.dumps(entry) + "\n" for entry in self._pending)
+            spool.flush()
+            os.fsync(spool.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    def _run(self) -> None:
+        retry_interval = None
+        while not self._stopped.is_set():
+            if retry_interval is None:
+                self._wake.wait(self.flush_interval)
+            else:
+                # Backing off: a full batch does not wake the flusher early
+                self._stopped.wait(retry_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep the writes queued and retry after a longer pause each time
+                retry_interval = min(2 * (retry_interval or self.flush_interval), self.max_retry_interval)
+                if self.last_error is None:
+                    print(f"Write-behind flush failed, {self.pending_count()} writes spooled, will retry: {e}")
+                self.last_error = str(e)
+            else:
+                if self.last_error is not None:
+                    print("Write-behind flush recovered")
+                retry_interval = None
+                self.last_error = None
+
+    def start(self) -> "WriteBehindQueue":
+        """Start the background flusher, which first writes anything replayed from the spool."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            self._wake.set()
+        return self
+
+    def stop(self) -> None:
+        """Stop the flusher and make a last attempt to write what is pending."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Write-behind flush failed, {self.pending_count()} writes left in {self.spool_path}: {e}")
+        with self._lock:
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+
+
+@st.cache_resource
+def get_write_queue() -> WriteBehindQueue:
+    """The app's write-behind queue, started once per process."""
+    queue = WriteBehindQueue().start()
+    atexit.register(queue.stop)
+    return queue
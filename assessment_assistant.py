@@ -5,11 +5,12 @@ Converts natural teacher observations into Learning Profile assessment scores
 
 import re
 from typing import Dict, List, Tuple, Optional
-from utils.questions import QUESTIONS, LIKERT_SCALE, CATEGORIES
+from utils.questions import QUESTIONS, LIKERT_SCALE, CATEGORIES, QUESTION_BANK
 
 class AssessmentAssistant:
     def __init__(self):
         self.questions = QUESTIONS
+        self.question_bank = QUESTION_BANK
         self.categories = CATEGORIES
         self.keyword_patterns = self._build_keyword_patterns()
     
@@ -192,7 +193,7 @@ class AssessmentAssistant:
     
     def _match_patterns(self, observation: str, question_id: int, patterns: Dict[str, List[str]], child_name: str) -> Tuple[int, str, float]:
         """Match observation against patterns for a specific question"""
-        question_text = next(q["text"] for q in self.questions if q["id"] == question_id)
+        question_text = self.question_bank[question_id]["text"]
         
         # Check each confidence level (highest to lowest)
         for level in ["strong_agree", "agree", "disagree", "strong_disagree"]:
@@ -292,7 +293,7 @@ def demo_assessment_assistant():
                       if draft['confidence_scores'][q_id] > 0.5]
     
     for q_id, explanation in high_confidence:
-        question = next(q for q in assistant.questions if q["id"] == q_id)
+        question = assistant.question_bank[q_id]
         score = draft['responses'][q_id]
         confidence = draft['confidence_scores'][q_id]
         